@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utility.env_loader import load_environment
+from utility.schedule import ACTION_TYPES, get_day_schedule, find_due_action, DEFAULT_WINDOW
+from utility.env_check import check_env_variable
+from eportem_action import EPortemAction
+
+load_environment()
+
+DEFAULT_ACCOUNTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "accounts.json")
+
+
+def load_accounts(path):
+    """
+    Load the accounts file.
+
+    Each account has a name, username, password (or password_env naming an
+    environment variable), an optional default location, an optional
+    "notify" flag and a schedule in the config.json format. Accounts
+    without a schedule use the one in config/config.json.
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    accounts = data.get("accounts", data) if isinstance(data, dict) else data
+
+    default_schedule = None
+    for account in accounts:
+        if not account.get("username"):
+            raise ValueError(f"Account {account.get('name', '?')} has no username")
+        account.setdefault("name", account["username"])
+        if not account.get("password") and account.get("password_env"):
+            account["password"] = os.getenv(account["password_env"])
+        if not account.get("schedule"):
+            if default_schedule is None:
+                config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "config.json")
+                with open(config_path, "r") as f:
+                    default_schedule = json.load(f)["schedule"]
+            account["schedule"] = default_schedule
+    return accounts
+
+
+class BatchRunner:
+    """
+    Run ePortem actions for many accounts on a bounded worker pool.
+
+    Every job goes through EPortemAction, so selectors, engines and
+    notifications behave exactly as for a single account.
+    """
+
+    def __init__(self, accounts, workers=4, per_account_limit=1, engine=None, pool=None, window=DEFAULT_WINDOW):
+        self.accounts = accounts
+        self.workers = max(1, int(workers))
+        self.engine = engine or os.getenv('EPORTEM_ENGINE', 'selenium')
+        self.window = window
+        self.pool = pool
+        self._account_limits = {
+            account["name"]: threading.BoundedSemaphore(max(1, int(per_account_limit)))
+            for account in accounts
+        }
+
+    def due_jobs(self, now=None, action_type=None):
+        """Return the (account, action_type, location) jobs due at `now`, or for a forced action"""
+        now = now or datetime.datetime.now()
+        jobs = []
+        for account in self.accounts:
+            day = get_day_schedule(account["schedule"], now)
+            action = action_type or find_due_action(day, now, self.window)
+            if not action:
+                continue
+            location = account.get("location") or (day or {}).get("location", "office")
+            jobs.append((account, action, location))
+        return jobs
+
+    def run(self, jobs):
+        """Run the jobs concurrently and return one result dict per job, in job order"""
+        if not jobs:
+            return []
+        own_pool = None
+        if self.pool is None and self.engine != "http":
+            from utility.driver_pool import DriverPool
+            own_pool = self.pool = DriverPool(max_size=min(self.workers, len(jobs)))
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+                return list(executor.map(self._run_job, jobs))
+        finally:
+            if own_pool is not None:
+                own_pool.close()
+                self.pool = None
+
+    def _run_job(self, job):
+        account, action_type, location = job
+        result = {
+            "account": account["name"],
+            "action": action_type,
+            "location": location,
+            "success": False,
+            "error": None,
+        }
+        with self._account_limits[account["name"]]:
+            start = time.monotonic()
+            try:
+                action = EPortemAction(
+                    action_type, location,
+                    pool=self.pool,
+                    engine=self.engine,
+                    credentials=(account["username"], account.get("password")),
+                    notify=account.get("notify", False),
+                )
+                result["success"] = bool(action.perform())
+            except (Exception, SystemExit) as e:
+                result["error"] = str(e) or e.__class__.__name__
+            result["duration"] = round(time.monotonic() - start, 3)
+        return result
+
+
+def summarize(results):
+    """Print a per-job table and return the aggregated counts"""
+    for r in results:
+        status = "OK    " if r["success"] else "FAILED"
+        line = f"{status} {r['account']:<20} {r['action']:<12} {r['location']:<7} {r['duration']:>7.2f}s"
+        if r["error"]:
+            line += f"  {r['error']}"
+        print(line)
+    ok = sum(1 for r in results if r["success"])
+    summary = {"total": len(results), "succeeded": ok, "failed": len(results) - ok}
+    print(f"{summary['succeeded']}/{summary['total']} actions succeeded")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run due ePortem actions for many accounts.")
+    parser.add_argument("--accounts", default=DEFAULT_ACCOUNTS_PATH, help="Path to the accounts JSON file")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('BATCH_WORKERS', '4')),
+                        help="Number of actions run at the same time")
+    parser.add_argument("--per-account", type=int, default=1,
+                        help="Maximum concurrent actions for a single account")
+    parser.add_argument("--engine", choices=["selenium", "http"], default=None,
+                        help="Action engine (default: EPORTEM_ENGINE or selenium)")
+    parser.add_argument("--action", choices=sorted(ACTION_TYPES.values()),
+                        help="Run this action for every account now instead of following the schedules")
+    parser.add_argument("--report", help="Write the results as JSON to this file")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the due actions")
+    args = parser.parse_args()
+
+    if os.getenv('USE_MOCK_SERVER', 'NO') != 'YES':
+        check_env_variable()
+
+    runner = BatchRunner(load_accounts(args.accounts), workers=args.workers,
+                         per_account_limit=args.per_account, engine=args.engine)
+    jobs = runner.due_jobs(action_type=args.action)
+    if not jobs:
+        print("No action scheduled for the current time.")
+        return
+    if args.dry_run:
+        for account, action_type, location in jobs:
+            print(f"{account['name']}: {action_type} at {location}")
+        return
+
+    started = time.monotonic()
+    results = runner.run(jobs)
+    summary = {**summarize(results), "elapsed": round(time.monotonic() - started, 3)}
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"summary": summary, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
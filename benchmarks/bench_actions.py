@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+End-to-end action benchmark against the local mock stack.
+
+Starts the Flask mock server (utility/server.py) on a free port and runs
+N actions on M concurrent workers, through MockWebDriver browsers from a
+DriverPool (engine "mock-driver") and/or through the HTTP engine against
+the mock server (engine "http"). Each worker logs in with its own mock
+account and walks the day in order (start, lunch, back, stop), since the
+mock rejects clock events that do not fit the account's state. Reports
+p50/p95/p99 latency, actions per second and peak RSS, and writes the
+results as JSON.
+
+    python benchmarks/bench_actions.py -n 500 -w 8
+    python benchmarks/bench_actions.py --compare benchmarks/results/<earlier run>.json
+
+With --compare, a drop in throughput or a rise in p95 latency beyond
+--threshold is reported as a regression and the exit code is 1.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ENGINES = ("mock-driver", "http")
+ACTIONS = ("start_day", "lunch_break", "after_lunch", "stop_day")
+LOCATIONS = ("office", "home")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values, p):
+    """Linear interpolation between the closest ranks, p in 0..100"""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+class MockStack:
+    """The Flask mock server on a free local port, in a background thread"""
+
+    def __init__(self, host="127.0.0.1"):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+        from utility.server import app, mock
+
+        self.mock = mock
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server(host, 0, app, threaded=True, request_handler=QuietHandler)
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name="mock-server")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@contextlib.contextmanager
+def mock_environment(base_url):
+    """Point the action path at the mock stack for the duration of the run"""
+    overrides = {"USE_MOCK_SERVER": "YES", "EPORTEM_BASE_URL": base_url, "SESSION_CACHE": "NO"}
+    saved = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def run_engine(engine, actions, workers, warmup=None):
+    """Run `actions` actions on `workers` threads and return the stats dict"""
+    from eportem_action import EPortemAction
+    from mock_server.clock import mock_account
+    from utility.driver_pool import DriverPool
+
+    pool = DriverPool(max_size=workers) if engine == "mock-driver" else None
+    action_engine = "http" if engine == "http" else "selenium"
+    # One account per worker thread, each with its own position in the day
+    worker = threading.local()
+    worker_ids = iter(range(workers))
+    worker_ids_lock = threading.Lock()
+
+    def run_one(i):
+        if not hasattr(worker, "account"):
+            with worker_ids_lock:
+                worker.account = mock_account(next(worker_ids))
+            worker.step = 0
+        action_type = ACTIONS[worker.step % len(ACTIONS)]
+        worker.step += 1
+        action = EPortemAction(action_type, LOCATIONS[i % len(LOCATIONS)], pool=pool, engine=action_engine,
+                               notify=False, credentials=worker.account)
+        start = time.perf_counter()
+        try:
+            action.perform()
+            error = None
+        except (Exception, SystemExit) as e:
+            error = str(e) or e.__class__.__name__
+        return time.perf_counter() - start, error
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bench") as executor:
+            # Warm up browsers, connections and imports before measuring
+            list(executor.map(run_one, range(workers if warmup is None else warmup)))
+            started = time.perf_counter()
+            outcomes = list(executor.map(run_one, range(actions)))
+            elapsed = time.perf_counter() - started
+    finally:
+        if pool is not None:
+            pool.close()
+
+    latencies = sorted(latency for latency, error in outcomes)
+    errors = [error for latency, error in outcomes if error]
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        "actions": actions,
+        "workers": workers,
+        "failures": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(actions / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(engines=ENGINES, actions=200, workers=4, warmup=None, quiet=True):
+    """Run every engine against a fresh mock stack and return the result document"""
+    results = {}
+    with MockStack() as stack, mock_environment(stack.url):
+        stack.mock.add_generated_users(workers)
+        for engine in engines:
+            stack.mock.reset()
+            # The action path prints a lot; keep it out of the report
+            output = io.StringIO() if quiet else sys.stdout
+            with contextlib.redirect_stdout(output):
+                results[engine] = run_engine(engine, actions, workers, warmup)
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compare two result documents and return a list of regression messages.
+
+    Throughput lower than (1 - threshold) times the baseline, or p95
+    latency higher than (1 + threshold) times the baseline, is a regression.
+    """
+    regressions = []
+    for engine, now in current["results"].items():
+        before = baseline.get("results", {}).get(engine)
+        if not before:
+            continue
+        if before["throughput"] and now["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(f"{engine}: throughput {now['throughput']}/s, was {before['throughput']}/s")
+        p95_before, p95_now = before["latency_ms"]["p95"], now["latency_ms"]["p95"]
+        if p95_before and p95_now > p95_before * (1 + threshold):
+            regressions.append(f"{engine}: p95 {p95_now} ms, was {p95_before} ms")
+    return regressions
+
+
+def print_report(document):
+    print(f"{'engine':<12} {'actions':>7} {'workers':>7} {'fail':>5} {'act/s':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>7}")
+    for engine, r in document["results"].items():
+        lat = r["latency_ms"]
+        print(f"{engine:<12} {r['actions']:>7} {r['workers']:>7} {r['failures']:>5} {r['throughput']:>9} "
+              f"{lat['p50']:>9} {lat['p95']:>9} {lat['p99']:>9} {str(r['peak_rss_mb']):>7}")
+        if r["first_error"]:
+            print(f"  first error: {r['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ePortem actions against the local mock stack.")
+    parser.add_argument("--engine", choices=ENGINES + ("all",), default="all", help="Action path to measure")
+    parser.add_argument("-n", "--actions", type=int, default=200, help="Actions per engine")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Concurrent workers")
+    parser.add_argument("--warmup", type=int, help="Unmeasured actions before the run (default: one per worker)")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_DIR, help="Directory for the JSON results")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative change counted as a regression (default 0.1 = 10%%)")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the actions")
+    args = parser.parse_args()
+
+    engines = ENGINES if args.engine == "all" else (args.engine,)
+    document = run_benchmark(engines, args.actions, args.workers, args.warmup, quiet=not args.verbose)
+    print_report(document)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{document['commit'] or 'local'}.json")
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, document, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
-import time
 import argparse
 import os
-from selenium.webdriver.common.by import By
+import time
+from utility.locators import By
 from utility.login_and_navigate import login_and_navigate
-from utility.notification_send import NotificationManager, TelegramChannel, SlackChannel
+from utility.waits import wait_for_element, wait_for_registration
 from utility.env_check import check_env_variable
+from utility import metrics, tracing
 
 class EPortemAction:
-    def __init__(self, action_type, location="office", driver=None):
+    def __init__(self, action_type, location="office", driver=None, pool=None, engine=None,
+                 credentials=None, notify=True, telegram=None, slack=None, slack_status=None):
         """
         Initialize the EPortem action
 
@@ -16,10 +18,25 @@ class EPortemAction:
         - action_type: start_day, lunch_break, after_lunch, stop_day
         - location: office, home
         - driver: optional selenium webdriver instance
+        - pool: optional DriverPool to lease a warm driver from (ignored if driver is given)
+        - engine: "selenium" (default) or "http"; defaults to EPORTEM_ENGINE.
+          The http engine falls back to the browser if the clock event never
+          reached ePortem (login failure, connection refused).
+        - credentials: optional (username, password), defaults to EPORTEM_USERNAME/PASSWORD
+        - notify: send Telegram/Slack notifications and Slack status afterwards
+        - telegram, slack, slack_status: override TELEGRAM_NOTIFY, SLACK_NOTIFY and
+          SLACK_STATUS for this action only (None keeps the environment setting)
         """
         self.action_type = action_type
         self.location = location
         self.driver = driver
+        self.pool = pool
+        self.engine = engine or os.getenv('EPORTEM_ENGINE', 'selenium')
+        self.credentials = credentials
+        self.notify = notify
+        self.telegram = telegram
+        self.slack = slack
+        self.slack_status = slack_status
         self.selectors = self._get_selectors()
 
     def _get_selectors(self):
@@ -80,102 +97,236 @@ class EPortemAction:
 
     def perform(self):
         """Perform the action"""
+        start = time.monotonic()
+        result = "failed"
+        try:
+            with tracing.span("action", action=self.action_type, location=self.location, engine=self.engine):
+                self._perform()
+            result = "succeeded"
+            return True
+        finally:
+            labels = {"action": self.action_type, "location": self.location}
+            metrics.ACTION_SECONDS.observe(time.monotonic() - start, **labels)
+            metrics.ACTIONS_TOTAL.inc(result=result, **labels)
+
+    def _perform(self):
         use_mock = os.getenv('USE_MOCK_SERVER', 'NO') == 'YES'
 
         # Check if we should run (unless using mock server)
         if not use_mock:
             check_env_variable()
 
-        # Log in to ePortem
-        self.driver = login_and_navigate(self.driver)
+        if self.engine == "http":
+            from utility.http_engine import ClockEventRejected, ClockEventUncertain
+            try:
+                self._perform_http()
+            except ClockEventRejected:
+                # ePortem understood the request and said no; clicking would not help
+                raise
+            except ClockEventUncertain:
+                # The event may have registered; clicking could clock in a second time
+                raise
+            except Exception as e:
+                print(f"HTTP engine failed ({e}), falling back to the browser")
+                self._perform_browser(use_mock)
+        else:
+            self._perform_browser(use_mock)
 
+        self._notify(use_mock)
+
+    def _perform_http(self):
+        """Send the clock event directly over HTTP, without a browser"""
+        from utility.http_engine import HttpActionEngine
+        from utility.session_store import get_default_store
+        engine = HttpActionEngine(session_store=get_default_store(), credentials=self.credentials)
         try:
-            # Find and click the first button
-            button1 = self.driver.find_element(By.XPATH, self.selectors["button1"])
+            with metrics.phase("http_clock"):
+                result = engine.perform(self.action_type, self.location)
+            print(f"HTTP engine: {result.get('message') or self.action_type + ' done'}")
+        finally:
+            engine.close()
+
+    def _perform_browser(self, use_mock):
+        """Click through the ePortem dashboard with Selenium"""
+        # Lease a warm browser from the pool if we don't have one yet
+        pool = self.pool if self.driver is None else None
+        succeeded = False
+        try:
+            if pool is not None:
+                with metrics.phase("driver_acquire"):
+                    self.driver = pool.acquire()
+
+            # Log in to ePortem
+            driver = login_and_navigate(self.driver, navigate=pool is not None, credentials=self.credentials)
+            self.driver = driver
+
+            try:
+                self._click_through(driver, use_mock)
+            except Exception as e:
+                if not use_mock:
+                    raise
+                else:
+                    print(f"Mock driver encountered an error: {e}")
+                    print("Continuing with mock test...")
+            succeeded = True
+        finally:
+            if self.driver is not None:
+                if pool is not None:
+                    # Hand the browser back warm instead of closing it, unless it
+                    # failed halfway (e.g. during login) and may be in any state
+                    pool.release(self.driver, discard=not succeeded)
+                    self.driver = None
+                else:
+                    # Close the browser window
+                    self.driver.quit()
+
+    def _click_through(self, driver, use_mock):
+        """Click the action's button(s) and wait for ePortem to register the event"""
+        # The buttons box is re-rendered once the event is registered
+        marker = wait_for_element(driver, By.ID, "buttonsRegBox", visible=False)
+
+        # Find and click the first button
+        with metrics.phase("click"):
+            button1 = wait_for_element(driver, By.XPATH, self.selectors["button1"])
             print("Clicking button 1")
-            button1.click()
+            with tracing.span("element_click", button="button1"):
+                button1.click()
+        clicked = button1
 
-            # Click the second button if needed
-            if self.selectors["button2"]:
-                time.sleep(1)  # Small delay to ensure dropdown is visible
-                try:
-                    button2 = self.driver.find_element(By.XPATH, self.selectors["button2"])
+        # Click the second button if needed
+        if self.selectors["button2"]:
+            try:
+                # Wait for the dropdown entry to become visible
+                with metrics.phase("dropdown"):
+                    button2 = wait_for_element(driver, By.XPATH, self.selectors["button2"])
                     print("Clicking button 2")
-                    button2.click()
-                except Exception as e:
-                    if use_mock:
-                        print(f"Mock driver couldn't find second button: {e}")
-                        print(f"Attempting alternative approach for mock driver...")
-                        try:
-                            # Try finding by ID instead of full XPath in mock mode
-                            button_id = self.selectors["button2"].split("'")[-2] if "'" in self.selectors["button2"] else None
-                            if button_id:
-                                button2 = self.driver.find_element(By.ID, button_id)
+                    with tracing.span("element_click", button="button2"):
+                        button2.click()
+                clicked = button2
+            except Exception as e:
+                if use_mock:
+                    print(f"Mock driver couldn't find second button: {e}")
+                    print(f"Attempting alternative approach for mock driver...")
+                    try:
+                        # Try finding by ID instead of full XPath in mock mode
+                        button_id = self.selectors["button2"].split("'")[-2] if "'" in self.selectors["button2"] else None
+                        if button_id:
+                            with tracing.span("find_element", by=By.ID, value=button_id):
+                                button2 = driver.find_element(By.ID, button_id)
+                            with tracing.span("element_click", button="button2"):
                                 button2.click()
-                        except Exception as e2:
-                            print(f"Alternative approach also failed: {e2}")
-                            if not use_mock:
-                                raise
-                    else:
-                        raise
-
-            time.sleep(3)
-        except Exception as e:
-            if not use_mock:
-                raise
-            else:
-                print(f"Mock driver encountered an error: {e}")
-                print("Continuing with mock test...")
-        finally:
-            # Close the browser window
-            self.driver.quit()
+                            clicked = button2
+                    except Exception as e2:
+                        print(f"Alternative approach also failed: {e2}")
+                        if not use_mock:
+                            raise
+                else:
+                    raise
 
+        # Don't hand the browser back before the event has registered, but wait no longer than needed
+        with metrics.phase("confirmation"):
+            registered = wait_for_registration(driver, marker, clicked)
+        if not registered:
+            print("No registration detected after the click")
+
+    def _notify(self, use_mock):
+        """Send notifications and update the Slack status"""
+        if not self.notify:
+            return
         # Send notification (unless using mock server)
-        if not use_mock:
-            manager = NotificationManager()
-            if os.getenv('TELEGRAM_NOTIFY') == "YES":
-                manager.register_channel(TelegramChannel())
-            if os.getenv('SLACK_NOTIFY') == "YES":
-                manager.register_channel(SlackChannel())
-            manager.notify(self._get_message())
-
-            # Slack status update
-            if os.getenv('SLACK_STATUS', 'NO') == 'YES':
-                from utility.slack_status import SlackStatusUpdater
-                status_updater = SlackStatusUpdater()
-                if self.action_type == "start_day":
-                    status_text = f"Working at {self.location}"
-                    emoji = ":house:" if self.location == "home" else ":office:"
-                elif self.action_type == "lunch_break":
-                    status_text = "Away for lunch"
-                    emoji = ":fork_and_knife:"
-                elif self.action_type == "after_lunch":
-                    status_text = f"Working at {self.location}"
-                    emoji = ":house:" if self.location == "home" else ":office:"
-                elif self.action_type == "stop_day":
-                    status_text = "Done for the day"
-                    emoji = ":palm_tree:"
-                else:
-                    status_text = "Working"
-                    emoji = ":computer:"
-                status_updater.set_status(status_text, emoji)
-        else:
+        if use_mock:
             print(f"MOCK NOTIFICATION: {self._get_message()}")
+            return
+
+        channels = []
+        if self._enabled(self.telegram, 'TELEGRAM_NOTIFY'):
+            channels.append("telegram")
+        if self._enabled(self.slack, 'SLACK_NOTIFY'):
+            channels.append("slack")
+        status = self._get_status() if self._enabled(self.slack_status, 'SLACK_STATUS') else None
+
+        # With NOTIFY_OUTBOX=YES the events are queued and delivered in the background
+        from utility.outbox import get_default_outbox
+        default_outbox = get_default_outbox()
+        if default_outbox is not None:
+            self._enqueue(*default_outbox, channels, status)
+            return
+
+        # requests is only imported when a notification is actually sent
+        from utility.notification_send import NotificationManager, TelegramChannel, SlackChannel
+        manager = NotificationManager()
+        if "telegram" in channels:
+            manager.register_channel(TelegramChannel())
+        if "slack" in channels:
+            manager.register_channel(SlackChannel())
+        for result in manager.notify(self._get_message()):
+            if result.success:
+                print(f"{result.channel.capitalize()} notification sent.")
+            else:
+                print(f"{result.channel.capitalize()} notification failed: {result.error}")
+
+        # Slack status update
+        if status:
+            from utility.slack_status import SlackStatusUpdater
+            with metrics.phase("slack_status"):
+                result = SlackStatusUpdater().set_status(*status)
+            if not result.success:
+                print(f"Failed to update Slack status: {result.error}")
+
+    def _enqueue(self, outbox, drainer, channels, status):
+        """Queue the notifications and status update in the outbox"""
+        # One event per account, action and minute, however often the action is retried
+        account = self.credentials[0] if self.credentials else os.getenv('EPORTEM_USERNAME', '')
+        key = f"{account}:{self.action_type}:{self.location}:{time.strftime('%Y-%m-%d %H:%M')}"
+        for channel in channels:
+            outbox.enqueue(channel, {"text": self._get_message()}, dedup_key=f"{channel}:{key}")
+        if status:
+            outbox.enqueue("slack_status", {"text": status[0], "emoji": status[1]}, dedup_key=f"slack_status:{key}")
+        drainer.wake()
+        print(f"Queued {len(channels) + bool(status)} notification(s)")
+
+    def _get_status(self):
+        """Return the Slack (status_text, emoji) for this action"""
+        if self.action_type in ("start_day", "after_lunch"):
+            return f"Working at {self.location}", ":house:" if self.location == "home" else ":office:"
+        if self.action_type == "lunch_break":
+            return "Away for lunch", ":fork_and_knife:"
+        if self.action_type == "stop_day":
+            return "Done for the day", ":palm_tree:"
+        return "Working", ":computer:"
+
+    @staticmethod
+    def _enabled(override, env_key):
+        """Explicit per-action flag if given, else the YES/NO environment setting"""
+        if override is not None:
+            return bool(override)
+        return os.getenv(env_key, 'NO') == 'YES'
+
+
+def execute_action(action_type, location="office", mock=False, use_mock_server=False, pool=None, engine=None):
+    """
+    Helper function to execute an action with proper setup
 
-        return True
+    When a DriverPool is passed in, the browser is leased from it (the pool's
+    factory decides between real and mock drivers) and returned warm afterwards.
+    With engine="http" no browser is started unless the HTTP request fails.
+    """
+    with tracing.span("execute_action", action=action_type, location=location):
+        return _execute_action(action_type, location, mock, use_mock_server, pool, engine)
 
 
-def execute_action(action_type, location="office", mock=False, use_mock_server=False):
-    """Helper function to execute an action with proper setup"""
+def _execute_action(action_type, location, mock, use_mock_server, pool, engine):
     driver = None
     use_mock = use_mock_server or os.getenv('USE_MOCK_SERVER', 'NO') == 'YES'
+    engine = engine or os.getenv('EPORTEM_ENGINE', 'selenium')
 
-    if mock or use_mock:
+    if pool is None and engine != "http" and (mock or use_mock):
         if use_mock:
             # Use our custom MockWebDriver
             try:
                 from mock_server.mock_driver import create_mock_driver
-                driver = create_mock_driver()
+                with metrics.phase("driver_start"):
+                    driver = create_mock_driver()
                 print(f"Using mock driver for {action_type} action at {location}")
             except ImportError as e:
                 print(f"Warning: Could not import mock driver: {e}")
@@ -189,9 +340,10 @@ def execute_action(action_type, location="office", mock=False, use_mock_server=F
             from selenium.webdriver.chrome.options import Options as ChromeOptions
             chrome_options = ChromeOptions()
             chrome_options.add_argument("--headless")
-            driver = webdriver.Chrome(options=chrome_options)
+            with metrics.phase("driver_start"):
+                driver = webdriver.Chrome(options=chrome_options)
 
-    action = EPortemAction(action_type, location, driver)
+    action = EPortemAction(action_type, location, driver, pool=pool, engine=engine)
     return action.perform()
 
 
@@ -203,6 +355,8 @@ if __name__ == "__main__":
                       help="Location (home or office)")
     parser.add_argument("--mock", action="store_true", help="Run with a mock driver.")
     parser.add_argument("--use-mock-server", action="store_true", help="Use the mock server instead of real ePortem.")
+    parser.add_argument("--engine", choices=["selenium", "http"], default=None,
+                      help="Drive the browser (selenium) or send the clock event over HTTP (default: EPORTEM_ENGINE or selenium).")
     args = parser.parse_args()
 
     if args.action == "help":
@@ -220,10 +374,11 @@ if __name__ == "__main__":
             "OPTIONS:\n"
             "  --mock             Run with a mock driver\n"
             "  --use-mock-server  Use the mock server instead of real ePortem\n"
+            "  --engine http      Send the clock event over HTTP, falling back to the browser\n"
             "\n"
             "ACTIONS:\n"
             "  start_day, lunch_break, after_lunch, stop_day\n"
             "  (use --location to specify 'office' or 'home')\n"
         )
     else:
-        execute_action(args.action, args.location, args.mock, args.use_mock_server)
+        execute_action(args.action, args.location, args.mock, args.use_mock_server, engine=args.engine)
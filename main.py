@@ -1,77 +1,105 @@
 #!/usr/bin/env python3
+"""
+Run the scheduled ePortem actions from config/config.json.
+
+Without arguments it is meant for cron: it runs the action due within 15
+minutes of now, if any, and exits. With --daemon it keeps running and
+fires every action at its time (see utility/daemon.py). Either way the
+actions that ran are recorded in the action ledger, so none runs twice on
+the same day.
+"""
+import argparse
 import datetime
 import os
 import json
+import signal
+import sys
 from utility.env_loader import load_environment
-from eportem_action import execute_action
+from utility.ledger import ActionLedger
+from utility.schedule import get_day_schedule, find_due_action
 
 load_environment()
 
-def determine_location():
+CONFIG_FILE = "config/config.json"
+OVERRIDE_FILE = "location_override.txt"
+
+def load_config(path=CONFIG_FILE):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def determine_location(config=None, now=None):
     """Determine the current location (from override file or config)"""
-    override_file = "location_override.txt"
-    if os.path.exists(override_file):
-        with open(override_file, "r") as f:
+    now = now or datetime.datetime.now()
+    if os.path.exists(OVERRIDE_FILE):
+        with open(OVERRIDE_FILE, "r") as f:
             try:
                 override_location, override_date = f.read().strip().split(",")
-                if override_date == str(datetime.date.today()):
+                if override_date == str(now.date()):
                     return override_location
             except ValueError:
                 print("Invalid override file format.")
-    
+
     # Get from config
-    with open("config/config.json", "r") as f:
-        config = json.load(f)
-        weekday_num = str(datetime.datetime.now().weekday())
-        schedule = config["schedule"].get(weekday_num)
-        if schedule:
-            return schedule.get("location", "office")
-            
+    config = config if config is not None else load_config()
+    schedule = config["schedule"].get(str(now.weekday()))
+    if schedule:
+        return schedule.get("location", "office")
+
     return "office"  # Default to office if not specified
 
-def main():
+def run_action(action_type, location):
+    # Imported only now: most runs never get here, and the action imports the browser stack
+    from eportem_action import execute_action
+    return execute_action(action_type, location)
+
+def start_outbox():
+    """Deliver notifications earlier runs left in the outbox, without waiting for an action"""
+    if os.getenv('NOTIFY_OUTBOX', 'NO') == 'YES':
+        from utility.outbox import get_default_outbox
+        get_default_outbox()
+
+def main(ledger=None):
     now = datetime.datetime.now()
-    hour = now.hour
-    minute = now.minute
+    start_outbox()
+    config = load_config()
 
-    # Get location (from override or config)
-    location = determine_location()
-    
     # Get today's schedule
-    weekday_num = str(now.weekday())
-    with open("config/config.json", "r") as f:
-        config = json.load(f)
-        
-    schedule = config["schedule"].get(weekday_num)
+    schedule = get_day_schedule(config["schedule"], now)
     if not schedule:
         print("No schedule for today.")
         return
-        
-    # Check if any action should be performed based on current time
-    action_performed = False
-    for task, time_str in schedule.items():
-        if task in ["location", "day"]:  # Skip non-time entries
-            continue
-            
-        task_hour, task_minute = map(int, time_str.split(":"))
-        
-        # Allow a 15-minute window
-        if abs((hour * 60 + minute) - (task_hour * 60 + task_minute)) <= 15:
-            # Map task names to action types
-            action_types = {
-                "start_the_day": "start_day",
-                "lunch_break": "lunch_break",
-                "after_lunch_break": "after_lunch",
-                "stop_the_day": "stop_day"
-            }
-            
-            # Create and perform the action
-            execute_action(action_types[task], location)
-            action_performed = True
-            break
-            
-    if not action_performed:
+
+    # Check if any action should be performed based on current time (15-minute window)
+    action_type = find_due_action(schedule, now)
+    if not action_type:
         print("No action scheduled for the current time.")
+        return
+
+    # Cron may fire more than once inside the window, or while the previous run is still going
+    ledger = ledger or ActionLedger()
+    with ledger.claim(now.date(), action_type) as claimed:
+        if not claimed:
+            print(f"{action_type} already ran today.")
+            return
+
+        # Create and perform the action
+        run_action(action_type, determine_location(config, now))
+
+def run_daemon():
+    from utility.daemon import ScheduleDaemon
+    # docker stop sends SIGTERM
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    start_outbox()
+    try:
+        ScheduleDaemon(CONFIG_FILE, run_action, determine_location).run()
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run the ePortem action scheduled for now.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running and fire each scheduled action at its time instead of exiting")
+    if parser.parse_args().daemon:
+        run_daemon()
+    else:
+        main()
@@ -0,0 +1,171 @@
+"""
+Accounts, sessions and per-user clock state for the mock ePortem server.
+
+Each user's clock is a small state machine:
+
+    stopped --start_day--> working --lunch_break--> paused
+    paused --after_lunch--> working
+    working/paused --stop_day--> stopped
+
+Clock events that do not fit the current state (a second start_day, a
+lunch break while stopped...) are rejected, like the real site does. Every
+accepted event is appended to the clock log. All state sits behind one
+lock, so the server can run with many request threads.
+"""
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+STOPPED, WORKING, PAUSED = "stopped", "working", "paused"
+
+# action -> (states it is allowed from, state it leads to)
+TRANSITIONS = {
+    "start_day": ((STOPPED,), WORKING),
+    "lunch_break": ((WORKING,), PAUSED),
+    "after_lunch": ((PAUSED,), WORKING),
+    "stop_day": ((WORKING, PAUSED), STOPPED),
+}
+
+# Clock event ids and work place ids sent by the dashboard links (see utility/http_engine.py)
+STAMP_ACTIONS = {"_ststart": "start_day", "_stpause": "lunch_break", "_stini": "after_lunch", "_ststop": "stop_day"}
+PLACE_LOCATIONS = {"1": "office", "1293": "home"}
+
+
+def mock_account(i):
+    """Credentials of the i-th generated account (see MockEportem.add_generated_users)"""
+    return f"mock_user_{i}", f"mock_password_{i}"
+
+
+class ClockError(Exception):
+    """A clock event the mock refuses"""
+    pass
+
+
+class UnknownAction(ClockError):
+    pass
+
+
+class InvalidTransition(ClockError):
+    def __init__(self, username, action, state):
+        super().__init__(f"Cannot {action.replace('_', ' ')} while {state}")
+        self.username = username
+        self.action = action
+        self.state = state
+
+
+class MockEportem:
+    """The server-side state of the mock: accounts, live sessions, clock states and the clock log"""
+
+    def __init__(self, users=None, session_ttl=8 * 3600.0, max_log=100000):
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._users = dict(users or {})
+        self._sessions = {}
+        self._states = {}
+        self._log = deque(maxlen=max_log)
+        self._ids = itertools.count(1)
+
+    # Accounts and sessions
+
+    def add_user(self, username, password):
+        with self._lock:
+            self._users[username] = password
+
+    def add_generated_users(self, count):
+        """Register mock_account(0) .. mock_account(count - 1)"""
+        with self._lock:
+            for i in range(count):
+                username, password = mock_account(i)
+                self._users[username] = password
+
+    def users(self):
+        with self._lock:
+            return sorted(self._users)
+
+    def authenticate(self, username, password):
+        with self._lock:
+            return bool(username) and self._users.get(username) == password
+
+    def create_session(self, username):
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = (username, time.monotonic())
+        return session_id
+
+    def session_user(self, session_id):
+        """The user a session id belongs to, or None if it is unknown or expired"""
+        if not session_id:
+            return None
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            username, created = entry
+            if time.monotonic() - created > self.session_ttl:
+                del self._sessions[session_id]
+                return None
+            return username
+
+    def end_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def expire_sessions(self, username=None):
+        """Drop every live session, or only those of one user; returns how many were dropped"""
+        with self._lock:
+            doomed = [sid for sid, (user, _) in self._sessions.items() if username is None or user == username]
+            for sid in doomed:
+                del self._sessions[sid]
+            return len(doomed)
+
+    # Clock
+
+    def state(self, username):
+        with self._lock:
+            return self._states.get(username, STOPPED)
+
+    def clock(self, username, action, location="office"):
+        """Apply a clock event and return its log entry; raises ClockError if it is refused"""
+        if action not in TRANSITIONS:
+            raise UnknownAction(f"Unknown action: {action}")
+        allowed, target = TRANSITIONS[action]
+        with self._lock:
+            state = self._states.get(username, STOPPED)
+            if state not in allowed:
+                raise InvalidTransition(username, action, state)
+            self._states[username] = target
+            entry = {
+                "id": next(self._ids),
+                "user": username,
+                "action": action,
+                "location": location,
+                "from": state,
+                "to": target,
+                "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            }
+            self._log.append(entry)
+            return dict(entry)
+
+    def clock_log(self, username=None, since=0, limit=None):
+        """Accepted clock events with an id above `since`, oldest first"""
+        with self._lock:
+            entries = [dict(e) for e in self._log if e["id"] > since and (username is None or e["user"] == username)]
+        return entries[:limit] if limit else entries
+
+    def states(self):
+        with self._lock:
+            return dict(self._states)
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._users), "sessions": len(self._sessions), "clock_events": len(self._log)}
+
+    def reset(self):
+        """Forget sessions, clock states and the log; accounts stay"""
+        with self._lock:
+            self._sessions.clear()
+            self._states.clear()
+            self._log.clear()
@@ -0,0 +1,170 @@
+"""
+Latency and fault injection for the mock ePortem server.
+
+A profile is a JSON document (a file in MOCK_PROFILE, one of the named
+PROFILES, or a POST to /admin/profile):
+
+    {
+      "seed": 42,
+      "endpoints": {
+        "*":      {"latency": {"dist": "fixed", "value": 0.05}},
+        "login":  {"latency": {"dist": "normal", "mean": 0.4, "stddev": 0.15}, "error_rate": 0.02},
+        "action": {"latency": {"dist": "longtail", "median": 0.2, "sigma": 1.2, "max": 8},
+                   "error_rate": 0.05, "error_statuses": [500, 502, 503], "timeout_rate": 0.01}
+      },
+      "session_expiry_rate": 0.03,
+      "dropdown_delay": {"dist": "normal", "mean": 1.0, "stddev": 0.5},
+      "timeout_seconds": 30
+    }
+
+Endpoints are login, dashboard, action and clock_log; "*" applies to
+those not listed. Latencies are in seconds. "longtail" is log-normal
+around its median, capped at max. A timeout holds the request for
+timeout_seconds and then answers 504. Session expiry drops the caller's
+session before the request is handled, so it gets the login page or a
+401. dropdown_delay slows the dashboard's dropdown menus.
+
+Every endpoint draws from its own random generator seeded from the
+profile seed, so a run with the same seed and the same request order per
+endpoint makes the same decisions.
+"""
+import json
+import math
+import random
+import threading
+from collections import namedtuple
+
+ENDPOINTS = ("login", "dashboard", "action", "clock_log")
+DISTRIBUTIONS = ("fixed", "normal", "longtail")
+
+# What to do with one request
+Decision = namedtuple("Decision", "delay status timeout expire_session")
+NO_FAULT = Decision(0.0, None, False, False)
+
+PROFILES = {
+    "none": {},
+    # The real site on a bad morning: slow logins, a long tail on clock events, some 5xx
+    "bad_morning": {
+        "seed": 1,
+        "endpoints": {
+            "*": {"latency": {"dist": "normal", "mean": 0.15, "stddev": 0.05}},
+            "login": {"latency": {"dist": "longtail", "median": 0.6, "sigma": 0.8, "max": 10}, "error_rate": 0.03},
+            "action": {"latency": {"dist": "longtail", "median": 0.3, "sigma": 1.0, "max": 15},
+                       "error_rate": 0.05, "error_statuses": [500, 502, 503], "timeout_rate": 0.01},
+        },
+        "session_expiry_rate": 0.02,
+        "dropdown_delay": {"dist": "longtail", "median": 0.5, "sigma": 0.7, "max": 5},
+        "timeout_seconds": 30,
+    },
+}
+
+
+class Latency:
+    """A latency distribution in seconds"""
+
+    def __init__(self, config=None):
+        config = dict(config or {"dist": "fixed", "value": 0})
+        self.config = config
+        self.dist = config.get("dist", "fixed")
+        if self.dist not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {self.dist!r}, expected one of {DISTRIBUTIONS}")
+        try:
+            if self.dist == "fixed":
+                self.value = float(config.get("value", 0))
+            elif self.dist == "normal":
+                self.mean = float(config["mean"])
+                self.stddev = float(config.get("stddev", 0))
+            else:
+                self.mu = math.log(float(config["median"]))
+                self.sigma = float(config.get("sigma", 1))
+            self.max = float(config["max"]) if config.get("max") is not None else None
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Bad {self.dist} latency {config}: {e}")
+
+    def sample(self, rng):
+        if self.dist == "fixed":
+            value = self.value
+        elif self.dist == "normal":
+            value = rng.gauss(self.mean, self.stddev)
+        else:
+            value = rng.lognormvariate(self.mu, self.sigma)
+        value = max(value, 0.0)
+        return min(value, self.max) if self.max is not None else value
+
+
+class EndpointFaults:
+    def __init__(self, config):
+        self.latency = Latency(config.get("latency"))
+        self.error_rate = _rate(config, "error_rate")
+        self.error_statuses = tuple(config.get("error_statuses", (500, 503)))
+        self.timeout_rate = _rate(config, "timeout_rate")
+
+
+def _rate(config, key):
+    rate = float(config.get(key, 0))
+    if not 0 <= rate <= 1:
+        raise ValueError(f"{key} must be between 0 and 1, got {rate}")
+    return rate
+
+
+class FaultProfile:
+    """A parsed profile; decide() is safe to call from many request threads"""
+
+    def __init__(self, config=None, name=None):
+        config = dict(config or {})
+        self.name = name
+        self.config = config
+        self.seed = config.get("seed", 0)
+        endpoints = config.get("endpoints", {})
+        unknown = set(endpoints) - set(ENDPOINTS) - {"*"}
+        if unknown:
+            raise ValueError(f"Unknown endpoints {sorted(unknown)}, expected {ENDPOINTS} or *")
+        default = endpoints.get("*", {})
+        self.endpoints = {name: EndpointFaults(endpoints.get(name, default)) for name in ENDPOINTS}
+        self.session_expiry_rate = _rate(config, "session_expiry_rate")
+        self.dropdown_delay = Latency(config.get("dropdown_delay"))
+        self.timeout_seconds = float(config.get("timeout_seconds", 30))
+        self.active = bool(config)
+        self._lock = threading.Lock()
+        self._rngs = {name: random.Random(f"{self.seed}:{name}") for name in ENDPOINTS + ("dropdown",)}
+        self.injected = {"delays": 0, "errors": 0, "timeouts": 0, "expired_sessions": 0}
+
+    @classmethod
+    def load(cls, source):
+        """A profile from a PROFILES name or a JSON file path"""
+        if source in PROFILES:
+            return cls(PROFILES[source], name=source)
+        with open(source) as f:
+            return cls(json.load(f), name=source)
+
+    def decide(self, endpoint):
+        """What to do to one request to endpoint"""
+        faults = self.endpoints.get(endpoint)
+        if faults is None or not self.active:
+            return NO_FAULT
+        with self._lock:
+            rng = self._rngs[endpoint]
+            # Always draw the same number of values so one decision never shifts the next
+            delay = faults.latency.sample(rng)
+            roll_expire, roll_timeout, roll_error, pick = rng.random(), rng.random(), rng.random(), rng.random()
+            expire = roll_expire < self.session_expiry_rate and endpoint != "login"
+            timeout = roll_timeout < faults.timeout_rate
+            status = None
+            if not timeout and roll_error < faults.error_rate and faults.error_statuses:
+                status = faults.error_statuses[int(pick * len(faults.error_statuses))]
+            self.injected["delays"] += delay > 0
+            self.injected["timeouts"] += timeout
+            self.injected["errors"] += status is not None
+            self.injected["expired_sessions"] += expire
+        return Decision(delay, status, timeout, expire)
+
+    def dropdown_delay_seconds(self):
+        if not self.active:
+            return 0.0
+        with self._lock:
+            return self.dropdown_delay.sample(self._rngs["dropdown"])
+
+    def to_dict(self):
+        with self._lock:
+            injected = dict(self.injected)
+        return {"name": self.name, "profile": self.config, "injected": injected}
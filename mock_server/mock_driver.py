@@ -1,8 +1,17 @@
 #!/usr/bin/env python3
 
-from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
+import functools
+import time
+import uuid
+from mock_server.xpath import compile_xpath, is_below, XPathSyntaxError
+from utility.locators import By
+
+
+def _selenium_error(name, message):
+    # selenium is only imported when a lookup fails, so the mock path runs without it
+    from selenium.common import exceptions
+    return getattr(exceptions, name)(message)
+
 
 # Mock Keys class
 class Keys:
@@ -13,435 +22,626 @@ class Keys:
     ESCAPE = '\ue00c'
     SPACE = ' '
 
-class MockWebElement(WebDriver):
-    """A mock implementation of Selenium's WebElement."""
-    
-    def __init__(self, element_id, tag_name, attributes=None, text=None):
-        self.id = element_id
+
+class MockNode:
+    """
+    One node of a mock page.
+
+    The login and dashboard pages are built once per process and shared by
+    every MockWebDriver, so nodes of a shared page are never changed;
+    per-driver state (visibility, attribute values, clicks) lives in the
+    driver's overlay.
+    """
+    __slots__ = ('element_id', 'tag_name', 'attributes', 'text', 'displayed',
+                 '_children', '_parent', '_order', '_index')
+
+    def __init__(self, element_id, tag_name, attributes=None, text=None, children=(), displayed=True):
+        self.element_id = element_id
         self.tag_name = tag_name
         self.attributes = attributes or {}
-        self._text = text
-        self._is_displayed = True
-        self._is_enabled = True
-        self._children = []
+        self.text = text
+        self.displayed = displayed
+        self._children = list(children)
         self._parent = None
-        self._mock_clicks = 0
-        self._mock_driver = None
-        
+        # Set when the page is indexed: the page's MockDomIndex and document position
+        self._order = 0
+        self._index = None
+
+
+class MockWebElement:
+    """A mock implementation of Selenium's WebElement: one page node as seen by one driver."""
+    __slots__ = ('_node', '_driver', '_generation')
+
+    def __init__(self, node, driver):
+        self._node = node
+        self._driver = driver
+        self._generation = driver._generation
+
+    def __repr__(self):
+        return f"<MockWebElement {self._node.tag_name}#{self._node.element_id}>"
+
+    @property
+    def id(self):
+        return self._node.element_id
+
+    @property
+    def tag_name(self):
+        return self._node.tag_name
+
+    def _live(self):
+        """The driver, or StaleElementReferenceException if the page was re-rendered since this was found"""
+        driver = self._driver
+        driver._settle()
+        if self._generation != driver._generation:
+            raise StaleElementReferenceException(f"Element {self.id} is no longer attached")
+        return driver
+
+    @property
+    def text(self):
+        """Get the element's text."""
+        self._live()
+        return self._node.text
+
     def get_attribute(self, name, default=None):
         """Get an attribute value."""
-        return self.attributes.get(name, default)
-    
+        value = self._live()._attribute(self._node, name)
+        return default if value is None else value
+
     def click(self):
         """Simulate clicking on the element."""
-        if not self._is_displayed:
+        self._live()
+        if not self.is_displayed():
             raise ElementNotVisibleException(f"Element {self.id} is not visible")
-        if not self._is_enabled:
+        if not self.is_enabled():
             raise ElementNotInteractableException(f"Element {self.id} is not interactable")
-        self._mock_clicks += 1
-        
-        # If this is a dropdown toggle, simulate showing the dropdown
-        if 'dropdown-toggle' in (self.get_attribute('class') or ''):
-            # Find dropdown menu
-            for child in self._children:
-                if child.tag_name == 'ul' and 'dropdown-menu' in (child.get_attribute('class') or ''):
-                    child._is_displayed = True
-                    # Also add 'open' to parent's class
-                    if self._parent:
-                        classes = (self._parent.get_attribute('class') or '').split()
-                        if 'open' not in classes:
-                            classes.append('open')
-                            self._parent.attributes['class'] = ' '.join(classes)
-        
+        driver, node = self._driver, self._node
+        driver._clicks[node] = driver._clicks.get(node, 0) + 1
+
+        # Clicks bubble up: clicking inside a dropdown toggle opens its menu
+        toggle = node
+        while toggle is not None and 'dropdown-toggle' not in (driver._attribute(toggle, 'class') or ''):
+            toggle = toggle._parent
+        if toggle is not None:
+            driver._open_dropdown(toggle)
+
+        # Clicking a clock action link closes the menu at once, like the real page, and
+        # submits the event; the page is re-rendered once the submission lands
+        if node.tag_name == 'a' and (self.get_attribute('id') or '').startswith('_st'):
+            menu = node._parent
+            while menu is not None and 'dropdown-menu' not in (driver._attribute(menu, 'class') or ''):
+                menu = menu._parent
+            if menu is not None:
+                driver._close_dropdown(menu)
+            driver._submit_clock_event((self.get_attribute('id'), self.get_attribute('name')))
+
     def send_keys(self, *value):
         """Simulate typing into the element."""
-        if not self._is_displayed:
+        self._live()
+        if not self.is_displayed():
             raise ElementNotVisibleException(f"Element {self.id} is not visible")
-        if not self._is_enabled:
+        if not self.is_enabled():
             raise ElementNotInteractableException(f"Element {self.id} is not interactable")
-        
+
         # Combine all values
         input_text = ''.join(str(v) for v in value)
-        
+
         # Update the element's value attribute
-        self.attributes['value'] = input_text
-        
+        self._driver._set_attribute(self._node, 'value', input_text)
+
         # If this is a password field with "password" in the name, save it for later
         if self.tag_name == 'input' and self.get_attribute('type') == 'password':
             print(f"Mock password entered: {input_text}")
-            
+
         # Handle special keys
         if Keys.RETURN in input_text or Keys.ENTER in input_text:
             # If this is an input in a form, simulate form submission
-            parent = self._parent
-            while parent and parent.tag_name != 'form':
-                parent = parent._parent
-                
-            if parent and parent.tag_name == 'form':
-                print(f"Mock form submission: {parent.get_attribute('action') or 'unknown'}")
+            form = self._node._parent
+            while form is not None and form.tag_name != 'form':
+                form = form._parent
+
+            if form is not None:
+                print(f"Mock form submission: {self._driver._attribute(form, 'action') or 'unknown'}")
                 # Simulate form submission by redirecting to dashboard
-                if self._mock_driver:
-                    self._mock_driver.get("http://localhost:8000/aplicaciones")
-        
-    @property
-    def text(self):
-        """Get the element's text."""
-        return self._text
-    
+                self._driver._submit_login(form)
+
     def is_displayed(self):
-        """Check if element is visible."""
-        return self._is_displayed
-    
+        """Check if element is visible (hidden ancestors hide their children)."""
+        return self._live()._is_displayed(self._node)
+
     def is_enabled(self):
         """Check if element is enabled."""
-        return self._is_enabled
-    
+        return self.get_attribute('disabled') is None
+
     def find_element(self, by, value):
-        """Find an element among children."""
-        for child in self._children:
-            if self._matches_selector(child, by, value):
-                return child
-        raise NoSuchElementException(f"Cannot find element with {by}={value}")
-    
+        """Find the first matching element below this one."""
+        found = self.find_elements(by, value)
+        if not found:
+            raise _selenium_error('NoSuchElementException', f"Cannot find element with {by}={value}")
+        return found[0]
+
     def find_elements(self, by, value):
-        """Find all matching elements among children."""
-        return [child for child in self._children if self._matches_selector(child, by, value)]
-    
-    def _matches_selector(self, element, by, value):
-        """Check if element matches the selector."""
-        if by == By.ID:
-            return element.get_attribute('id') == value
-        elif by == By.TAG_NAME:
-            return element.tag_name == value
-        elif by == By.CLASS_NAME:
-            classes = (element.get_attribute('class') or '').split()
-            return value in classes
-        elif by == By.NAME:
-            return element.get_attribute('name') == value
-        elif by == By.XPATH:
-            # Robust XPath handling for new selectors
-            # Start Day Office/Home button1: //*[@id="buttonsRegBox"]/div/div/button/div/div[2]/h2
-            if value == '//*[@id="buttonsRegBox"]/div/div/button/div/div[2]/h2':
-                return (
-                    element.tag_name == 'h2'
-                    and element._parent
-                    and element._parent.tag_name == 'div'
-                    and element._parent._parent
-                    and element._parent._parent.tag_name == 'div'
-                    and element._parent._parent._parent
-                    and element._parent._parent._parent.tag_name == 'button'
-                    and element._parent._parent._parent._parent
-                    and element._parent._parent._parent._parent.tag_name == 'div'
-                    and element._parent._parent._parent._parent.get_attribute('id') == 'buttonsRegBox'
-                )
-            # Start Day Home button1: //*[@id="buttonsRegBox"]/div/button/i
-            if value == '//*[@id="buttonsRegBox"]/div/button/i':
-                return (
-                    element.tag_name == 'i'
-                    and element._parent
-                    and element._parent.tag_name == 'button'
-                    and element._parent._parent
-                    and element._parent._parent.tag_name == 'div'
-                    and element._parent._parent.get_attribute('id') == 'buttonsRegBox'
-                )
-            # Lunch Break/After Lunch/Stop Day button2: //*[@id="_stpause"]/h2, //*[@id="_stini"]/h2, //*[@id="_ststop"]/h2, //*[@id="_ststart"]/h2
-            import re
-            m = re.match(r'\*\[@id="(_stpause|_stini|_ststop|_ststart)"\]/h2', value.replace('/', ''))
-            if value == '//*[@id="_stpause"]/h2':
-                return (
-                    element.tag_name == 'h2'
-                    and element._parent
-                    and element._parent.tag_name == 'a'
-                    and element._parent.get_attribute('id') == '_stpause'
-                )
-            if value == '//*[@id="_stini"]/h2':
-                return (
-                    element.tag_name == 'h2'
-                    and element._parent
-                    and element._parent.tag_name == 'a'
-                    and element._parent.get_attribute('id') == '_stini'
-                )
-            if value == '//*[@id="_ststop"]/h2':
-                return (
-                    element.tag_name == 'h2'
-                    and element._parent
-                    and element._parent.tag_name == 'a'
-                    and element._parent.get_attribute('id') == '_ststop'
-                )
-            if value == '//*[@id="_ststart"]/h2':
-                return (
-                    element.tag_name == 'h2'
-                    and element._parent
-                    and element._parent.tag_name == 'a'
-                    and element._parent.get_attribute('id') == '_ststart'
-                )
-            return False
-
-class MockWebDriver(WebDriver):
+        """Find all matching elements below this one."""
+        driver = self._live()
+        view = _PageView(self._node._index, driver)
+        return [driver._element(node) for node in view.find(by, value, context=self._node)]
+
+
+class MockDomIndex:
+    """
+    id, name, class and tag lookups for one page tree.
+
+    Built once per page. Lists are in document order, so the first entry
+    is what Selenium would return. A shared index (a page template) is
+    never added to; a driver that needs to change the page structure
+    works on a clone().
+    """
+
+    INDEXED = ('id', 'name', 'class')
+
+    def __init__(self, root, shared=False):
+        self.root = root
+        self.shared = shared
+        self._tables = {name: {} for name in self.INDEXED}
+        self._tags = {}
+        self._all = []
+        self.add(root)
+
+    def add(self, node, parent=None):
+        """Index node and its subtree, attaching it to parent if given."""
+        if self.shared and node is not self.root:
+            raise RuntimeError("Shared page templates are read-only; clone() the index first")
+        if parent is not None:
+            node._parent = parent
+            parent._children.append(node)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            node._index = self
+            node._order = len(self._all)
+            self._all.append(node)
+            self._tags.setdefault(node.tag_name, []).append(node)
+            for name in self.INDEXED:
+                for key in self.keys(name, node.attributes.get(name)):
+                    self._tables[name].setdefault(key, []).append(node)
+            for child in reversed(node._children):
+                child._parent = node
+                stack.append(child)
+
+    def clone(self):
+        """Return a private copy of this page and the {old node: new node} mapping."""
+        mapping = {}
+        for node in self._all:
+            mapping[node] = MockNode(node.element_id, node.tag_name, node.attributes, node.text,
+                                     displayed=node.displayed)
+        for node in self._all:
+            mapping[node]._children = [mapping[child] for child in node._children]
+        return MockDomIndex(mapping[self.root]), mapping
+
+    @staticmethod
+    def keys(name, value):
+        if value is None:
+            return ()
+        return value.split() if name == 'class' else (value,)
+
+    def lookup(self, name, value):
+        return self._tables[name].get(value, ())
+
+    def ids(self, value):
+        return self.lookup('id', value)
+
+    def tags(self, name):
+        return self._tags.get(name, ())
+
+    def all(self):
+        return self._all
+
+    def attribute(self, node, name):
+        return node.attributes.get(name)
+
+    def text(self, node):
+        return node.text
+
+
+class _PageView:
+    """A page index seen through one driver's overlay; this is what lookups and XPath run against."""
+    __slots__ = ('index', 'driver', 'root')
+
+    BY_ATTRIBUTE = {By.ID: 'id', By.NAME: 'name', By.CLASS_NAME: 'class'}
+
+    def __init__(self, index, driver):
+        self.index = index
+        self.driver = driver
+        self.root = index.root
+
+    def attribute(self, node, name):
+        return self.driver._attribute(node, name)
+
+    def text(self, node):
+        return node.text
+
+    def tags(self, name):
+        return self.index.tags(name)
+
+    def all(self):
+        return self.index.all()
+
+    def ids(self, value):
+        return self.lookup('id', value)
+
+    def lookup(self, name, value):
+        found = self.index.lookup(name, value)
+        changed = [node for node, overrides in self.driver._attributes.items()
+                   if name in overrides and node._index is self.index]
+        if not changed:
+            return found
+        # The driver changed this attribute on some nodes (e.g. "open" on a dropdown)
+        matches = [node for node in found if node not in changed]
+        matches += [node for node in changed if value in MockDomIndex.keys(name, self.attribute(node, name))]
+        return sorted(matches, key=lambda node: node._order)
+
+    def find(self, by, value, context=None):
+        """All nodes matching a Selenium locator, below context if given, in document order."""
+        if by == By.XPATH:
+            try:
+                path = compile_xpath(value)
+            except XPathSyntaxError as e:
+                raise _selenium_error('InvalidSelectorException', str(e))
+            return path.evaluate(context if context is not None else self.root, self)
+        if by == By.TAG_NAME:
+            found = self.tags(value)
+        elif by in self.BY_ATTRIBUTE:
+            found = self.lookup(self.BY_ATTRIBUTE[by], value)
+        else:
+            # CSS selectors and link text are not supported by the mock
+            return []
+        if context is not None:
+            return [node for node in found if is_below(node, context)]
+        return list(found)
+
+
+class MockWebDriver:
     """A mock implementation of Selenium's WebDriver."""
-    
+
+    SESSION_COOKIE = 'ASP.NET_SessionId'
+    # Seconds between clicking a clock action and the page showing it registered
+    registration_delay = 0.0
+    # Live session ids the "server" has issued, shared by all drivers like a real backend;
+    # each driver's sessions end when it quits, so the set only holds those of live drivers
+    _issued_sessions = set()
+
     def __init__(self):
-        # We don't call super().__init__() because we're mocking
         self._current_url = 'about:blank'
-        self._mock_pages = self._build_mock_pages()
-        self._current_page = None
-        
-        # Set the driver reference in all elements
-        for page_name, page in self._mock_pages.items():
-            for element in self._iterate_elements(page):
-                element._mock_driver = self
-        
+        # Shared page templates, replaced by a private copy once this driver adds to a page
+        self._pages = _page_templates()
+        self._page_name = None
+        self._page = None
+        self._cookies = {}
+        # Session ids issued to this driver, revoked by quit()
+        self._sessions = set()
+        # (id, name) of every clock action registered, for test assertions
+        self.clock_events = []
+        # Bumped when the page is re-rendered; elements found before then are stale
+        self._generation = 0
+        # (event, time it lands) of a clock event submitted but not registered yet
+        self._pending = None
+
+        # Overlay over the shared pages: {node: {attribute: value}}, {node: displayed}, {node: clicks}
+        self._attributes = {}
+        self._displayed = {}
+        self._clicks = {}
+        # One MockWebElement per node, so repeated lookups return the same object
+        self._elements = {}
+
     @property
     def current_url(self):
         """Get the current URL."""
+        self._settle()
         return self._current_url
-    
+
     @current_url.setter
     def current_url(self, value):
         """Set the current URL."""
         self._current_url = value
-        
+
     def get(self, url):
         """Navigate to a URL."""
         self._current_url = url
-        
+
         # Determine which mock page to load
         if '/Usuario/Login' in url:
-            self._current_page = self._mock_pages['login']
+            self._load('login')
         elif '/aplicaciones' in url:
-            self._current_page = self._mock_pages['dashboard']
+            if not self._has_session():
+                # Like the real site, bounce unauthenticated visitors to the login form
+                self._current_url = url.split('/aplicaciones')[0] + '/Usuario/Login?ReturnUrl=%2faplicaciones'
+                self._load('login')
+                return
+            page = self._load('dashboard')
+            # A fresh page load starts with every dropdown closed
+            for menu in page.find(By.CLASS_NAME, 'dropdown-menu'):
+                self._close_dropdown(menu)
         else:
-            # Create a default page for any URL
-            body = MockWebElement('default-body', 'body', text='Page not implemented')
-            html = MockWebElement('default-page', 'html')
-            html._children = [body]
-            self._current_page = html
-    
+            # A default page for any URL
+            self._load('not_found')
+
+    def _load(self, name):
+        self._page_name = name
+        self._page = _PageView(self._pages[name], self)
+        return self._page
+
+    def get_cookies(self):
+        """Return all cookies as Selenium-style dicts."""
+        return [dict(cookie) for cookie in self._cookies.values()]
+
+    def get_cookie(self, name):
+        cookie = self._cookies.get(name)
+        return dict(cookie) if cookie else None
+
+    def add_cookie(self, cookie_dict):
+        self._cookies[cookie_dict['name']] = dict(cookie_dict)
+
+    def delete_cookie(self, name):
+        self._cookies.pop(name, None)
+
+    def delete_all_cookies(self):
+        self._cookies.clear()
+
+    def _has_session(self):
+        cookie = self._cookies.get(self.SESSION_COOKIE)
+        return bool(cookie) and cookie.get('value') in self._issued_sessions
+
+    def _submit_login(self, form):
+        """Simulate the login POST: issue a session cookie and land on the dashboard."""
+        fields = {self._attribute(el, 'name'): self._attribute(el, 'value')
+                  for el in _PageView(form._index, self).find(By.TAG_NAME, 'input', context=form)}
+        base_url = self._current_url.split('/Usuario/Login')[0] if '/Usuario/Login' in self._current_url \
+            else 'http://localhost:8000'
+        if fields.get('usuario') and fields.get('password'):
+            session_id = uuid.uuid4().hex
+            self._sessions.add(session_id)
+            self._issued_sessions.add(session_id)
+            self.add_cookie({'name': self.SESSION_COOKIE, 'value': session_id, 'path': '/', 'httpOnly': True})
+        self.get(f"{base_url}/aplicaciones")
+
+    @classmethod
+    def expire_sessions(cls):
+        """Forget every issued session, as if the server had restarted."""
+        cls._issued_sessions.clear()
+
+    def _submit_clock_event(self, event):
+        self._pending = (event, time.monotonic() + self.registration_delay)
+        self._settle()
+
+    def _settle(self):
+        """Register a submitted clock event once it has landed: record it and re-render the page"""
+        if self._pending is None or time.monotonic() < self._pending[1]:
+            return
+        event, self._pending = self._pending[0], None
+        self.clock_events.append(event)
+        self._generation += 1
+        self._elements.clear()
+
+    # Overlay: this driver's view of the shared page nodes
+
+    def _element(self, node):
+        element = self._elements.get(node)
+        if element is None:
+            element = self._elements[node] = MockWebElement(node, self)
+        return element
+
+    def _attribute(self, node, name):
+        overrides = self._attributes.get(node)
+        if overrides is not None and name in overrides:
+            return overrides[name]
+        return node.attributes.get(name)
+
+    def _set_attribute(self, node, name, value):
+        self._attributes.setdefault(node, {})[name] = value
+
+    def _is_displayed(self, node):
+        while node is not None:
+            if not self._displayed.get(node, node.displayed):
+                return False
+            node = node._parent
+        return True
+
+    def _open_dropdown(self, toggle):
+        """Show the dropdown menu belonging to this toggle (a child or sibling ul)."""
+        candidates = list(toggle._children) + (list(toggle._parent._children) if toggle._parent else [])
+        for menu in candidates:
+            if menu.tag_name == 'ul' and 'dropdown-menu' in (self._attribute(menu, 'class') or ''):
+                self._displayed[menu] = True
+                # Also add 'open' to parent's class
+                if menu._parent:
+                    classes = (self._attribute(menu._parent, 'class') or '').split()
+                    if 'open' not in classes:
+                        classes.append('open')
+                        self._set_attribute(menu._parent, 'class', ' '.join(classes))
+                return
+
+    def _close_dropdown(self, menu):
+        self._displayed[menu] = False
+        if menu._parent:
+            classes = (self._attribute(menu._parent, 'class') or '').split()
+            if 'open' in classes:
+                classes.remove('open')
+                self._set_attribute(menu._parent, 'class', ' '.join(classes))
+
+    def _writable_page(self, page):
+        """The index of the current page view, copied from the shared template first if needed (copy on write)."""
+        index = page.index
+        if index.shared:
+            index, mapping = index.clone()
+            for overlay in (self._attributes, self._displayed, self._clicks):
+                for node in [node for node in overlay if node in mapping]:
+                    overlay[mapping[node]] = overlay.pop(node)
+            for node in [node for node in self._elements if node in mapping]:
+                element = self._elements[mapping[node]] = self._elements.pop(node)
+                element._node = mapping[node]
+            self._pages = {**self._pages, self._page_name: index}
+            self._page = _PageView(index, self)
+        return index
+
+    def _page_view(self):
+        self._settle()
+        if self._page is None:
+            # If no page is loaded, use a default empty page
+            page = self._load('empty')
+            print("Warning: Auto-created default page since no page was loaded")
+            return page
+        return self._page
+
     def find_element(self, by, value):
         """Find an element in the current page."""
-        if self._current_page is None:
-            # If no page is loaded, create a default empty page
-            body = MockWebElement('default-body', 'body', text='Empty page')
-            html = MockWebElement('default-page', 'html')
-            html._children = [body]
-            self._current_page = html
-            print("Warning: Auto-created default page since no page was loaded")
-        
-        if by == By.NAME and value in ['user', 'password']:
-            # Special case for login form fields
-            for element in self._iterate_elements(self._current_page):
-                if element.get_attribute('name') == value:
-                    return element
-            
+        page = self._page_view()
+        found = page.find(by, value)
+        if found:
+            return self._element(found[0])
+
+        if by == By.NAME and value in ['usuario', 'user', 'password']:
             # If the login fields aren't found, create them
             print(f"Auto-creating missing form field: {value}")
-            form = MockWebElement('login-form', 'form', {'action': '/Usuario/Login', 'method': 'post'})
-            input_field = MockWebElement(value, 'input', {'name': value, 'type': value})
-            form._children.append(input_field)
-            self._current_page._children.append(form)
-            return input_field
-        
-        try:
-            return self._current_page.find_element(by, value)
-        except NoSuchElementException:
-            # Try searching deeper in the DOM tree
-            for element in self._iterate_elements(self._current_page):
-                try:
-                    if self._current_page._matches_selector(element, by, value):
-                        return element
-                except:
-                    pass
-            
-            # If element is not found and we're looking for a button, create a mock button
-            # This helps with the testing flow
-            if 'btn' in value or 'button' in value:
-                print(f"Auto-creating missing button element: {value}")
-                mock_button = MockWebElement(f'mock-{value}', 'button', 
-                                            {'class': 'btn btn-mock', 'id': value}, 
-                                            text='Mock Button')
-                self._current_page._children.append(mock_button)
-                return mock_button
-            
-            # If we're looking for a link with ID, create it
-            if by == By.ID and ('_st' in value):
-                print(f"Auto-creating missing action element: {value}")
-                mock_link = MockWebElement(value, 'a', {'id': value}, text=f"Mock Action: {value}")
-                li = MockWebElement(f'li-{value}', 'li')
-                li._children = [mock_link]
-                ul = MockWebElement(f'ul-{value}', 'ul')
-                ul._children = [li]
-                self._current_page._children.append(ul)
-                return mock_link
-                
-            raise NoSuchElementException(f"Cannot find element with {by}={value}")
-    
-    def _iterate_elements(self, element):
-        """Recursively iterate through all elements in the DOM tree."""
-        yield element
-        for child in element._children:
-            yield from self._iterate_elements(child)
-    
+            input_field = MockNode(value, 'input', {'name': value, 'type': value})
+            form = MockNode('login-form', 'form', {'action': '/Usuario/Login', 'method': 'post'},
+                            children=[input_field])
+            index = self._writable_page(page)
+            index.add(form, index.root)
+            return self._element(input_field)
+
+        # If element is not found and we're looking for a button, create a mock button
+        # This helps with the testing flow
+        if 'btn' in value or 'button' in value:
+            print(f"Auto-creating missing button element: {value}")
+            mock_button = MockNode(f'mock-{value}', 'button', {'class': 'btn btn-mock', 'id': value},
+                                   text='Mock Button')
+            index = self._writable_page(page)
+            index.add(mock_button, index.root)
+            return self._element(mock_button)
+
+        # If we're looking for a link with ID, create it
+        if by == By.ID and ('_st' in value):
+            print(f"Auto-creating missing action element: {value}")
+            mock_link = MockNode(value, 'a', {'id': value}, text=f"Mock Action: {value}")
+            ul = MockNode(f'ul-{value}', 'ul', children=[MockNode(f'li-{value}', 'li', children=[mock_link])])
+            index = self._writable_page(page)
+            index.add(ul, index.root)
+            return self._element(mock_link)
+
+        raise _selenium_error('NoSuchElementException', f"Cannot find element with {by}={value}")
+
     def find_elements(self, by, value):
         """Find all matching elements in the current page."""
-        if self._current_page is None:
-            # If no page is loaded, create a default empty page
-            body = MockWebElement('default-body', 'body', text='Empty page')
-            html = MockWebElement('default-page', 'html')
-            html._children = [body]
-            self._current_page = html
-        
-        results = []
-        for element in self._iterate_elements(self._current_page):
-            try:
-                if element._matches_selector(element, by, value):
-                    results.append(element)
-            except:
-                pass
-        return results
-    
+        return [self._element(node) for node in self._page_view().find(by, value)]
+
     def quit(self):
         """Quit the driver."""
         print("MockWebDriver: Session ended")
-        self._current_page = None
-    
-    def _build_mock_pages(self):
-        """Build the mock DOM for our test pages."""
-        pages = {}
-        
-        # Login page
-        login_page = MockWebElement('login-page', 'html')
-        login_body = MockWebElement('login-body', 'body')
-        login_form = MockWebElement('login-form', 'form', {'action': '/Usuario/Login', 'method': 'post'})
-        username_input = MockWebElement('username', 'input', {'name': 'user', 'type': 'text'})
-        password_input = MockWebElement('password', 'input', {'name': 'password', 'type': 'password'})
-        login_button = MockWebElement('login-button', 'button', {'type': 'submit'}, 'Login')
-        
-        login_form._children = [username_input, password_input, login_button]
-        login_body._children = [login_form]
-        login_page._children = [login_body]
-        pages['login'] = login_page
-        
-        # Dashboard page
-        dashboard = MockWebElement('dashboard', 'html')
-        body = MockWebElement('body', 'body', {'class': 'pace-done skin-1 fixed-sidebar'})
-        wrapper = MockWebElement('wrapper', 'div', {'id': 'wrapper'})
-        page_wrapper = MockWebElement('page-wrapper', 'div', {'id': 'page-wrapper'})
-        wrapper_content = MockWebElement('wrapper-content', 'div', {'class': 'wrapper wrapper-content'})
-        row = MockWebElement('row', 'div', {'class': 'row'})
-        col = MockWebElement('col', 'div', {'class': 'col-lg-6 col-sm-12'})
-        ibox = MockWebElement('ibox', 'div', {'class': 'ibox'})
-        ibox_content = MockWebElement('ibox-content', 'div', {'class': 'ibox-content'})
-        row2 = MockWebElement('row2', 'div', {'class': 'row'})
-        buttons_box = MockWebElement('buttons-box', 'div', {'id': 'buttonsRegBox'})
-        btn_group1 = MockWebElement('btn-group1', 'div', {'class': 'btn-group'})
-        btn_group2 = MockWebElement('btn-group2', 'div', {'class': 'btn-group'})
-        
-        # Primary dropdown (Start/Stop)
-        primary_button = MockWebElement('primary-button', 'button', {
-            'class': 'btn btn-outline btn-block btn-primary dropdown-toggle',
-            'data-toggle': 'dropdown'
-        }, 'Start / Stop')
-        primary_menu = MockWebElement('primary-menu', 'ul', {'class': 'dropdown-menu scrollable-menu'})
-        primary_menu._is_displayed = False
-        li1 = MockWebElement('li1', 'li')
-        ul1 = MockWebElement('ul1', 'ul')
-        li_start = MockWebElement('li-start', 'li')
-        a_start = MockWebElement('a-start', 'a', {'id': '_ststart'}, None)
-        h2_start = MockWebElement('h2-start', 'h2', {}, 'Start Work (Office)')
-        a_start._children = [h2_start]
-        h2_start._parent = a_start
-
-        li_pause = MockWebElement('li-pause', 'li')
-        a_pause = MockWebElement('a-pause', 'a', {'id': '_stpause'}, None)
-        h2_pause = MockWebElement('h2-pause', 'h2', {}, 'Pause for Lunch')
-        a_pause._children = [h2_pause]
-        h2_pause._parent = a_pause
-
-        li_stop = MockWebElement('li-stop', 'li')
-        a_stop = MockWebElement('a-stop', 'a', {'id': '_ststop'}, None)
-        h2_stop = MockWebElement('h2-stop', 'h2', {}, 'End Workday')
-        a_stop._children = [h2_stop]
-        h2_stop._parent = a_stop
-
-        # Home button (for start_day at home)
-        home_button = MockWebElement('home-button', 'button', {'class': 'btn btn-outline-primary m-l-xs'}, 'Home Options')
-        i_home = MockWebElement('i-home', 'i', {}, '')
-        home_button._children = [i_home]
-        i_home._parent = home_button
-
-        # Main button for all actions (office/home)
-        main_button = MockWebElement('main-button', 'button', {'class': 'btn btn-outline btn-block btn-primary dropdown-toggle'}, None)
-        div1 = MockWebElement('div1', 'div', {})
-        div2 = MockWebElement('div2', 'div', {})
-        div3 = MockWebElement('div3', 'div', {})
-        h2_main = MockWebElement('h2-main', 'h2', {}, 'Main Action')
-        div3._children = [h2_main]
-        h2_main._parent = div3
-        div2._children = [div3]
-        div3._parent = div2
-        div1._children = [div2]
-        div2._parent = div1
-        main_button._children = [div1]
-        div1._parent = main_button
-
-        # Warning dropdown (Resume)
-        btn_group3 = MockWebElement('btn-group3', 'div', {'class': 'btn-group'})
-        btn_group4 = MockWebElement('btn-group4', 'div', {'class': 'btn-group'})
-        warning_button = MockWebElement('warning-button', 'button', {
-            'class': 'btn btn-outline btn-block btn-warning dropdown-toggle',
-            'data-toggle': 'dropdown'
-        }, 'Resume Work')
-        warning_menu = MockWebElement('warning-menu', 'ul', {'class': 'dropdown-menu scrollable-menu'})
-        warning_menu._is_displayed = False
-        li2 = MockWebElement('li2', 'li')
-        ul2 = MockWebElement('ul2', 'ul')
-        li_resume_office = MockWebElement('li-resume-office', 'li')
-        a_resume_office = MockWebElement('a-resume-office', 'a', {'id': '_stini'}, None)
-        h2_resume_office = MockWebElement('h2-resume-office', 'h2', {}, 'Resume (Office)')
-        a_resume_office._children = [h2_resume_office]
-        h2_resume_office._parent = a_resume_office
-        li_resume_home = MockWebElement('li-resume-home', 'li')
-        a_resume_home = MockWebElement('a-resume-home', 'a', {'id': '_stini'}, None)
-        h2_resume_home = MockWebElement('h2-resume-home', 'h2', {}, 'Resume (Home)')
-        a_resume_home._children = [h2_resume_home]
-        h2_resume_home._parent = a_resume_home
-
-        # Build DOM structure
-        li_start._children = [a_start]
-        li_pause._children = [a_pause]
-        li_stop._children = [a_stop]
-        ul1._children = [li_start, li_pause]
-        li1._children = [ul1]
-        primary_menu._children = [li1, li_stop]
-        btn_group2._children = [main_button, primary_menu]
-
-        li_resume_office._children = [a_resume_office]
-        li_resume_home._children = [a_resume_home]
-        ul2._children = [li_resume_office, li_resume_home]
-        li2._children = [ul2]
-        warning_menu._children = [li2]
-        btn_group4._children = [warning_button, warning_menu]
-
-        # Set parent references
-        primary_menu._parent = btn_group2
-        warning_menu._parent = btn_group4
-
-        btn_group1._children = [btn_group2, home_button]
-        btn_group3._children = [btn_group4]
-        buttons_box._children = [btn_group1, btn_group3]
-        row2._children = [buttons_box]
-        ibox_content._children = [row2]
-        ibox._children = [ibox_content]
-        col._children = [ibox]
-        row._children = [col]
-        wrapper_content._children = [row]
-        page_wrapper._children = [wrapper_content]
-        wrapper._children = [page_wrapper]
-        body._children = [wrapper]
-        dashboard._children = [body]
-        pages['dashboard'] = dashboard
-        
-        return pages
+        self._issued_sessions.difference_update(self._sessions)
+        self._sessions.clear()
+        self._page = None
+
+
+@functools.lru_cache(maxsize=None)
+def _page_templates():
+    """The mock pages, built and indexed once per process and shared by all drivers."""
+    return {name: MockDomIndex(root, shared=True) for name, root in _build_mock_pages().items()}
+
+
+def _build_mock_pages():
+    """Build the mock DOM for our test pages."""
+    pages = {}
+
+    # Pages for URLs the mock doesn't know, and for lookups before any get()
+    pages['not_found'] = MockNode('default-page', 'html',
+                                  children=[MockNode('default-body', 'body', text='Page not implemented')])
+    pages['empty'] = MockNode('default-page', 'html', children=[MockNode('default-body', 'body', text='Empty page')])
+
+    # Login page
+    username_input = MockNode('username', 'input', {'name': 'usuario', 'type': 'text'})
+    password_input = MockNode('password', 'input', {'name': 'password', 'type': 'password'})
+    login_button = MockNode('login-button', 'button', {'type': 'submit'}, 'Login')
+    login_form = MockNode('login-form', 'form', {'action': '/Usuario/Login', 'method': 'post'},
+                          children=[username_input, password_input, login_button])
+    login_body = MockNode('login-body', 'body', children=[login_form])
+    pages['login'] = MockNode('login-page', 'html', children=[login_body])
+
+    # Dashboard page
+    # Primary dropdown (Start/Stop): the main button for all actions (office/home)
+    main_button = MockNode('main-button', 'button', {
+        'class': 'btn btn-outline btn-block btn-primary dropdown-toggle',
+        'data-toggle': 'dropdown'
+    }, children=[
+        MockNode('div1', 'div', {}, children=[
+            MockNode('div-icon', 'div', {}),
+            MockNode('div2', 'div', {}, children=[MockNode('h2-main', 'h2', {}, 'Main Action')]),
+        ]),
+    ])
+    ul1 = MockNode('ul1', 'ul', children=[
+        MockNode('li-start', 'li', children=[
+            MockNode('a-start', 'a', {'id': '_ststart', 'name': '1'},
+                     children=[MockNode('h2-start', 'h2', {}, 'Start Work (Office)')])]),
+        MockNode('li-pause', 'li', children=[
+            MockNode('a-pause', 'a', {'id': '_stpause'},
+                     children=[MockNode('h2-pause', 'h2', {}, 'Pause for Lunch')])]),
+        # Resume entries in the primary menu (office = name 1, home = name 1293)
+        MockNode('li-resume', 'li', children=[
+            MockNode('a-resume', 'a', {'id': '_stini', 'name': '1'},
+                     children=[MockNode('h2-resume', 'h2', {}, 'Resume (Office)')])]),
+        MockNode('li-resume-home-main', 'li', children=[
+            MockNode('a-resume-home-main', 'a', {'id': '_stini', 'name': '1293'},
+                     children=[MockNode('h2-resume-home-main', 'h2', {}, 'Resume (Home)')])]),
+    ])
+    li_stop = MockNode('li-stop', 'li', children=[
+        MockNode('a-stop', 'a', {'id': '_ststop'}, children=[MockNode('h2-stop', 'h2', {}, 'End Workday')])])
+    primary_menu = MockNode('primary-menu', 'ul', {'class': 'dropdown-menu scrollable-menu'},
+                            children=[MockNode('li1', 'li', children=[ul1]), li_stop], displayed=False)
+    btn_group2 = MockNode('btn-group2', 'div', {'class': 'btn-group'}, children=[main_button, primary_menu])
+
+    # Home button (for start_day at home)
+    home_button = MockNode('home-button', 'button', {
+        'class': 'btn btn-outline-primary m-l-xs dropdown-toggle',
+        'data-toggle': 'dropdown'
+    }, 'Home Options', children=[MockNode('i-home', 'i', {}, '')])
+    home_menu = MockNode('home-menu', 'ul', {'class': 'dropdown-menu'}, children=[
+        MockNode('li-start-home', 'li', children=[
+            MockNode('a-start-home', 'a', {'id': '_ststart', 'name': '1293'},
+                     children=[MockNode('h2-start-home', 'h2', {}, 'Start Work (Home)')])]),
+    ], displayed=False)
+    btn_group1 = MockNode('btn-group1', 'div', {'class': 'btn-group'}, children=[btn_group2, home_button, home_menu])
+
+    # Warning dropdown (Resume)
+    warning_button = MockNode('warning-button', 'button', {
+        'class': 'btn btn-outline btn-block btn-warning dropdown-toggle',
+        'data-toggle': 'dropdown'
+    }, 'Resume Work')
+    ul2 = MockNode('ul2', 'ul', children=[
+        MockNode('li-resume-office', 'li', children=[
+            MockNode('a-resume-office', 'a', {'id': '_stini', 'name': '1'},
+                     children=[MockNode('h2-resume-office', 'h2', {}, 'Resume (Office)')])]),
+        MockNode('li-resume-home', 'li', children=[
+            MockNode('a-resume-home', 'a', {'id': '_stini', 'name': '1293'},
+                     children=[MockNode('h2-resume-home', 'h2', {}, 'Resume (Home)')])]),
+    ])
+    warning_menu = MockNode('warning-menu', 'ul', {'class': 'dropdown-menu scrollable-menu'},
+                            children=[MockNode('li2', 'li', children=[ul2])], displayed=False)
+    btn_group3 = MockNode('btn-group3', 'div', {'class': 'btn-group'}, children=[
+        MockNode('btn-group4', 'div', {'class': 'btn-group'}, children=[warning_button, warning_menu])])
+
+    # Build DOM structure
+    buttons_box = MockNode('buttons-box', 'div', {'id': 'buttonsRegBox'}, children=[btn_group1, btn_group3])
+    row2 = MockNode('row2', 'div', {'class': 'row'}, children=[buttons_box])
+    ibox = MockNode('ibox', 'div', {'class': 'ibox'}, children=[
+        MockNode('ibox-content', 'div', {'class': 'ibox-content'}, children=[row2])])
+    row = MockNode('row', 'div', {'class': 'row'}, children=[
+        MockNode('col', 'div', {'class': 'col-lg-6 col-sm-12'}, children=[ibox])])
+    wrapper = MockNode('wrapper', 'div', {'id': 'wrapper'}, children=[
+        MockNode('page-wrapper', 'div', {'id': 'page-wrapper'}, children=[
+            MockNode('wrapper-content', 'div', {'class': 'wrapper wrapper-content'}, children=[row])])])
+    body = MockNode('body', 'body', {'class': 'pace-done skin-1 fixed-sidebar'}, children=[wrapper])
+    pages['dashboard'] = MockNode('dashboard', 'html', children=[body])
+
+    return pages
+
 
 class ElementNotVisibleException(Exception):
     """Exception raised when interacting with an element that isn't visible."""
@@ -451,6 +651,10 @@ class ElementNotInteractableException(Exception):
     """Exception raised when interacting with an element that isn't interactable."""
     pass
 
+class StaleElementReferenceException(Exception):
+    """Exception raised when using an element found before the page was re-rendered."""
+    pass
+
 def create_mock_driver():
     """Create and return a new MockWebDriver instance."""
     driver = MockWebDriver()
@@ -460,32 +664,32 @@ if __name__ == "__main__":
     # Example usage
     driver = create_mock_driver()
     driver.get("https://eportem.es/Usuario/Login")
-    
+
     # Find and fill username and password
-    username = driver.find_element(By.NAME, "user")
+    username = driver.find_element(By.NAME, "usuario")
     password = driver.find_element(By.NAME, "password")
-    
+
     username.send_keys("test_user")
     password.send_keys("test_password")
-    
+
     # Submit the form
-    password.submit()
-    
+    password.send_keys(Keys.RETURN)
+
     # Navigate to dashboard
     driver.get("https://eportem.es/aplicaciones")
-    
+
     # Test finding elements
     try:
         start_button = driver.find_element(By.XPATH, "//button[contains(@class, 'btn-primary')]")
         print(f"Found start button: {start_button.text}")
         start_button.click()
-        
+
         start_action = driver.find_element(By.ID, "_ststart")
         print(f"Found start action: {start_action.text}")
         start_action.click()
-        
+
         print("Test successful!")
     except Exception as e:
         print(f"Test failed: {e}")
-    
-    driver.quit()
\ No newline at end of file
+
+    driver.quit()
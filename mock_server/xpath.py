@@ -0,0 +1,322 @@
+"""
+A small XPath evaluator for the mock DOM.
+
+Covers the subset the action selectors use, and a little more:
+
+    //*[@id="_ststart" and @name="1293"]
+    //*[@id="buttonsRegBox"]/div/div/button/div/div[2]/h2
+    .//a[contains(@class, "btn") or text()="Go"]
+
+Paths are absolute (/, //) or relative to the context element (., ./,
+.//, or a bare step). Steps are a tag name or *, with predicates made of
+@attr, string and number literals, text(), contains(), starts-with(),
+not(), =, !=, and, or, and positions like [2]. Anything else raises
+XPathSyntaxError.
+
+Expressions are compiled once and cached. Nodes only need tag_name,
+_children, _parent and _order (document order). Everything else comes
+from the document passed to evaluate(): its root, attribute(node, name)
+and text(node), and ids(), tags() and all() to find the first step of
+a // path without walking the tree.
+"""
+import functools
+import re
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>"[^"]*"|'[^']*')
+      | (?P<number>\d+)
+      | (?P<op>//|/|\[|\]|\(|\)|@|!=|=|,|\.)
+      | (?P<name>\*|[A-Za-z_][\w.-]*)
+    )""", re.VERBOSE)
+
+
+class XPathSyntaxError(ValueError):
+    """The expression is not valid XPath or uses something this evaluator does not support"""
+    pass
+
+
+def _tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        m = _TOKEN.match(expression, pos)
+        if not m:
+            raise XPathSyntaxError(f"Unexpected {expression[pos:]!r} in {expression!r}")
+        kind = m.lastgroup
+        # The match is leading whitespace plus the one named group that matched
+        value = m.group().lstrip()
+        tokens.append((kind, value[1:-1] if kind == "string" else value))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    FUNCTIONS = {"contains": 2, "starts-with": 2, "not": 1, "text": 0}
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+
+    def peek(self, value=None):
+        if self.pos >= len(self.tokens):
+            return None
+        token = self.tokens[self.pos]
+        if value is not None and token[1] != value:
+            return None
+        return token
+
+    def take(self, value=None):
+        token = self.peek(value)
+        if token is None:
+            expected = f"{value!r}" if value else "more input"
+            raise XPathSyntaxError(f"Expected {expected} in {self.expression!r}")
+        self.pos += 1
+        return token
+
+    def error(self):
+        token = self.peek()
+        found = repr(token[1]) if token else "end of expression"
+        return XPathSyntaxError(f"Unexpected {found} in {self.expression!r}")
+
+    def path(self):
+        absolute = False
+        steps = []
+        if self.peek("."):
+            # "." alone selects the context element
+            self.take()
+        elif self.peek("/") or self.peek("//"):
+            absolute = True
+        else:
+            steps.append(self.step("child"))
+        while self.peek("/") or self.peek("//"):
+            axis = "descendant" if self.take()[1] == "//" else "child"
+            steps.append(self.step(axis))
+        if self.peek() is not None:
+            raise self.error()
+        if absolute and not steps:
+            raise XPathSyntaxError(f"Missing step in {self.expression!r}")
+        return _Path(absolute, steps)
+
+    def step(self, axis):
+        kind, value = self.take()
+        if kind != "name":
+            raise XPathSyntaxError(f"Expected a tag name or * in {self.expression!r}, got {value!r}")
+        if self.peek("("):
+            raise XPathSyntaxError(f"Node tests like {value}() are not supported in {self.expression!r}")
+        predicates = []
+        while self.peek("["):
+            self.take()
+            predicates.append(self.predicate())
+            self.take("]")
+        return _Step(axis, value, predicates)
+
+    def predicate(self):
+        token = self.peek()
+        if token and token[0] == "number" and self.tokens[self.pos + 1:self.pos + 2] == [("op", "]")]:
+            self.take()
+            position = int(token[1])
+            return _Predicate(lambda node, pos, doc: pos == position, uses_position=True)
+        expr = self.or_expr()
+        test = _boolean(expr)
+        return _Predicate(lambda node, pos, doc: test(node, doc), id_value=getattr(expr, "id_value", None))
+
+    def or_expr(self):
+        terms = [self.and_expr()]
+        while self.peek("or"):
+            self.take()
+            terms.append(self.and_expr())
+        if len(terms) == 1:
+            return terms[0]
+        tests = [_boolean(term) for term in terms]
+        return lambda node, doc: any(test(node, doc) for test in tests)
+
+    def and_expr(self):
+        terms = [self.comparison()]
+        while self.peek("and"):
+            self.take()
+            terms.append(self.comparison())
+        if len(terms) == 1:
+            return terms[0]
+        tests = [_boolean(term) for term in terms]
+
+        def all_of(node, doc):
+            return all(test(node, doc) for test in tests)
+        # @id="x" anywhere in an "and" lets the index narrow the candidates
+        all_of.id_value = next((t.id_value for t in terms if getattr(t, "id_value", None)), None)
+        return all_of
+
+    def comparison(self):
+        left = self.primary()
+        if not (self.peek("=") or self.peek("!=")):
+            return left
+        equal = self.take()[1] == "="
+        right = self.primary()
+
+        def compare(node, doc):
+            a, b = left(node, doc), right(node, doc)
+            return a is not None and b is not None and (a == b) is equal
+        if equal and getattr(left, "attribute", None) == "id" and getattr(right, "literal", None) is not None:
+            compare.id_value = right.literal
+        return compare
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "op" and value == "@":
+            name = self.take()[1]
+
+            def attribute(node, doc):
+                return doc.attribute(node, name)
+            attribute.attribute = name
+            return attribute
+        if kind in ("string", "number"):
+            def literal(node, doc):
+                return value
+            literal.literal = value
+            return literal
+        if kind == "op" and value == "(":
+            expr = self.or_expr()
+            self.take(")")
+            return expr
+        if kind == "name" and value in self.FUNCTIONS and self.peek("("):
+            self.take("(")
+            args = []
+            while not self.peek(")"):
+                if args:
+                    self.take(",")
+                args.append(self.or_expr())
+            self.take(")")
+            if len(args) != self.FUNCTIONS[value]:
+                raise XPathSyntaxError(f"{value}() takes {self.FUNCTIONS[value]} arguments in {self.expression!r}")
+            return _function(value, args)
+        self.pos -= 1
+        raise self.error()
+
+
+def _boolean(expr):
+    """An expression as a condition: attributes by presence, strings by being non-empty"""
+    if getattr(expr, "attribute", None) is not None:
+        return lambda node, doc: expr(node, doc) is not None
+    return lambda node, doc: bool(expr(node, doc))
+
+
+def _function(name, args):
+    if name == "text":
+        return lambda node, doc: doc.text(node) or ""
+    if name == "not":
+        test = _boolean(args[0])
+        return lambda node, doc: not test(node, doc)
+    haystack, needle = args
+    if name == "contains":
+        return lambda node, doc: (needle(node, doc) or "") in (haystack(node, doc) or "")
+    return lambda node, doc: (haystack(node, doc) or "").startswith(needle(node, doc) or "")
+
+
+class _Predicate:
+    __slots__ = ("test", "uses_position", "id_value")
+
+    def __init__(self, test, uses_position=False, id_value=None):
+        self.test = test
+        self.uses_position = uses_position
+        self.id_value = id_value
+
+
+class _Step:
+    def __init__(self, axis, name, predicates):
+        self.axis = axis
+        self.name = name
+        self.predicates = predicates
+        self.uses_position = any(p.uses_position for p in predicates)
+        self.id_value = next((p.id_value for p in predicates if p.id_value), None)
+
+    def matches_name(self, node):
+        return self.name == "*" or node.tag_name == self.name
+
+    def children(self, parent, doc):
+        """The children of parent selected by this step, in document order"""
+        return self._filter([child for child in parent._children if self.matches_name(child)], doc)
+
+    def matches(self, node, doc):
+        """Whether node itself is selected by this step (position checked against its siblings)"""
+        if not self.matches_name(node):
+            return False
+        if self.uses_position:
+            parent = node._parent
+            selected = self.children(parent, doc) if parent is not None else self._filter([node], doc)
+            return any(n is node for n in selected)
+        return all(predicate.test(node, 1, doc) for predicate in self.predicates)
+
+    def _filter(self, selected, doc):
+        for predicate in self.predicates:
+            selected = [node for pos, node in enumerate(selected, 1) if predicate.test(node, pos, doc)]
+        return selected
+
+
+class _Path:
+    def __init__(self, absolute, steps):
+        self.absolute = absolute
+        self.steps = steps
+
+    def evaluate(self, context, doc):
+        """Return the matching nodes in document order"""
+        steps = self.steps
+        if not steps:
+            return [context]
+        nodes = self._first_step(steps[0], None if self.absolute else context, doc)
+        for step in steps[1:]:
+            nodes = self._apply(step, nodes, doc)
+            if not nodes:
+                break
+        return nodes
+
+    def _first_step(self, step, context, doc):
+        if context is None:
+            # The document node has the root element as its only child
+            if step.axis == "child":
+                return [doc.root] if step.matches(doc.root, doc) else []
+            return self._from_index(step, doc, within=None)
+        return self._apply(step, [context], doc)
+
+    def _apply(self, step, contexts, doc):
+        if step.axis == "child":
+            if len(contexts) == 1:
+                return step.children(contexts[0], doc)
+            return _in_order(node for parent in contexts for node in step.children(parent, doc))
+        # "//step" from each context: the index finds candidates, ancestry filters them
+        if len(contexts) == 1:
+            return self._from_index(step, doc, within=contexts[0])
+        return _in_order(node for context in contexts for node in self._from_index(step, doc, within=context))
+
+    @staticmethod
+    def _from_index(step, doc, within):
+        if step.id_value is not None:
+            candidates = doc.ids(step.id_value)
+        elif step.name != "*":
+            candidates = doc.tags(step.name)
+        else:
+            candidates = doc.all()
+        return [node for node in candidates
+                if (within is None or is_below(node, within)) and step.matches(node, doc)]
+
+
+def is_below(node, ancestor):
+    """Whether ancestor is a proper ancestor of node"""
+    node = node._parent
+    while node is not None:
+        if node is ancestor:
+            return True
+        node = node._parent
+    return False
+
+
+def _in_order(nodes):
+    unique = {id(node): node for node in nodes}
+    return sorted(unique.values(), key=lambda node: node._order)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_xpath(expression):
+    """Parse an expression once; the result has evaluate(context, doc)"""
+    return _Parser(expression).path()
@@ -5,6 +5,11 @@ import subprocess
 import time
 import pytest
 import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Keep the web UI state created by importing web_ui.server out of the working tree
+os.environ.setdefault("WEB_UI_DB_PATH", os.path.join(tempfile.mkdtemp(), "web_ui_state.db"))
 
 def find_free_port():
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -83,3 +88,46 @@ def flask_server_with_empty_env():
     proc.terminate()
     proc.wait(timeout=5)
     shutil.rmtree(temp_dir)
+
+class StubServer(ThreadingHTTPServer):
+    """Local HTTP server; set plans[path] = [(status, delay), ...] to script responses"""
+
+    def __init__(self, address):
+        super().__init__(address, StubHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.plans = {}
+        self.url = f"http://{address[0]}:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StubServer
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        with server.lock:
+            server.requests.append((self.path, self.client_address[1], body))
+            plan = server.plans.get(self.path, [])
+            status, delay = plan.pop(0) if plan else (200, 0)
+        time.sleep(delay)
+        reply = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_http():
+    server = StubServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
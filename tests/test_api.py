@@ -1,6 +1,8 @@
 import os
+import json
 import tempfile
 import shutil
+import time
 import pytest
 from flask import Flask
 from eportem.web_ui import server as webui
@@ -12,7 +14,6 @@ def client(monkeypatch):
     env_path = os.path.join(temp_dir, ".env")
     # Patch ENV_PATH in server
     monkeypatch.setattr(webui, "ENV_PATH", env_path)
-    webui.CONFIG_ERROR = webui.validate_basic_config()
 
     app = webui.app
     app.config["TESTING"] = True
@@ -62,11 +63,26 @@ def test_env_read_write_and_validation(client):
     resp = client.post("/api/env", json={"env": bad_env})
     assert resp.status_code == 400 and "format invalid" in resp.get_json()["error"]
 
+def test_config_error_follows_env_changes(client):
+    assert "not found" in client.get("/api/state").get_json()["config_error"]
+    env = {"EPORTEM_USERNAME": "admin", "EPORTEM_PASSWORD": "pw", "EPORTEM_ENABLED": True,
+           "HEADLESS_BROWSING": False, "WEB_UI_PORT": 8010}
+    assert client.post("/api/env", json={"env": env}).get_json()["success"]
+    state = client.get("/api/state")
+    assert state.get_json()["config_error"] is None
+    schema = {f["key"]: f["value"] for f in client.get("/api/env_schema").get_json()["schema"]}
+    assert schema["EPORTEM_USERNAME"] == "admin" and schema["EPORTEM_ENABLED"] is True
+
+    # Edited outside the UI: picked up on the next request, and cached copies are refreshed
+    with open(webui.ENV_PATH, "a") as f:
+        f.write("EPORTEM_ENABLED=NO\n")
+    resp = client.get("/api/state", headers={"If-None-Match": state.headers["ETag"]})
+    assert resp.status_code == 200 and resp.get_json()["config_error"] == "EPORTEM_ENABLED is not set to YES."
+
 def test_config_overlay_for_missing_env(client, monkeypatch):
     # Remove .env so config will be missing
     if os.path.exists(webui.ENV_PATH):
         os.remove(webui.ENV_PATH)
-    webui.CONFIG_ERROR = webui.validate_basic_config()
     # Check main page returns config_error in template context
     resp = client.get("/")
     assert resp.status_code == 200
@@ -87,3 +103,173 @@ def test_serverinfo_and_restart_api(client):
     resp = client.post("/api/restart")
     assert resp.status_code == 200
     assert resp.get_json()["success"] is True
+
+def test_jobs_api_and_stream(client, monkeypatch):
+    monkeypatch.setenv("USE_MOCK_SERVER", "YES")
+    resp = client.post("/api/jobs", json={"action": "reboot", "location": "office"})
+    assert resp.status_code == 400
+
+    stream = client.get("/api/jobs/stream", buffered=False)
+    assert stream.mimetype == "text/event-stream"
+    chunks = iter(stream.response)
+    assert next(chunks).startswith(b"retry:")
+
+    resp = client.post("/api/jobs", json={"action": "start_day", "location": "home", "telegram": "no"})
+    assert resp.status_code == 202
+    job_id = resp.get_json()["job_id"]
+
+    # The stream pushes every state change of the job
+    statuses = []
+    while not statuses or statuses[-1] not in ("succeeded", "failed"):
+        chunk = next(chunks).decode()
+        if chunk.startswith("event: job"):
+            job = json.loads(chunk.split("data: ", 1)[1])
+            if job["id"] == job_id:
+                statuses.append(job["status"])
+    stream.close()
+    assert statuses == ["queued", "running", "succeeded"]
+
+    job = client.get(f"/api/jobs/{job_id}").get_json()["job"]
+    assert job["flags"]["telegram"] is False
+    assert job["duration"] is not None and job["wait"] is not None
+    assert job_id in [j["id"] for j in client.get("/api/jobs?limit=5").get_json()["jobs"]]
+    assert client.get("/api/jobs/unknown").status_code == 404
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'eportem_jobs_total{source="api",status="succeeded"}' in text
+    assert 'eportem_job_wait_seconds_count{source="api"}' in text
+    assert 'eportem_action_seconds_count{action="start_day",location="home"}' in text
+
+    trace = client.get("/api/traces?limit=1").get_json()["traces"][0]
+    assert trace["attrs"]["action"] == "start_day"
+    events = client.get(f"/api/traces/{trace['trace_id']}?format=chrome").get_json()
+    assert events[0]["name"] == "action" and events[0]["ph"] == "X"
+    assert client.get("/api/traces/unknown").status_code == 404
+
+def test_job_stream_ends_and_resumes_from_the_store(client, monkeypatch):
+    from web_ui.state_store import StateStore
+    monkeypatch.setattr(webui, "JOB_STREAM_SECONDS", 0.3)
+    monkeypatch.setattr(webui, "JOB_STREAM_POLL", 0.05)
+    # A job saved by another process (e.g. the scheduler service) through its own connection
+    other = StateStore(webui.store.path)
+    job = {"id": "elsewhere", "submitted_at": time.time(), "status": "running"}
+    other.save_job(job)
+    seq = other.last_job_event()
+    other.save_job(dict(job, status="succeeded"))
+
+    # The stream ends by itself, after resuming from the Last-Event-ID it is given
+    body = client.get("/api/jobs/stream", headers={"Last-Event-ID": str(seq)}).get_data(as_text=True)
+    events = [chunk for chunk in body.split("\n\n") if chunk.startswith("event: job")]
+    assert events == [f"event: job\nid: {seq + 1}\ndata: {json.dumps(dict(job, status='succeeded'))}"]
+
+def test_schedule_edits_are_persisted_per_row(client):
+    from web_ui.state_store import StateStore
+    rows = client.post("/api/schedule/add", json={"time": "07:45", "action": "start_day", "days": ["Saturday", "Sunday"]}).get_json()["rows"]
+    saturday, sunday = rows[0]["id"], rows[1]["id"]
+    assert client.post("/api/schedule/toggle", json={"id": saturday}).get_json()["row"]["enabled"] is False
+    assert client.post("/api/schedule/update_time", json={"id": sunday, "time": "08:15"}).get_json()["success"]
+    assert client.post("/api/schedule/update_time", json={"id": -1, "time": "08:15"}).status_code == 404
+
+    stored = {row["id"]: row for row in StateStore(webui.store.path).load()["schedule"]}
+    assert stored[saturday]["enabled"] is False
+    assert stored[sunday]["time"] == "08:15"
+
+    assert client.post("/api/schedule/remove", json={"id": saturday}).get_json()["success"]
+    assert client.post("/api/schedule/remove", json={"id": sunday}).get_json()["success"]
+    stored = {row["id"] for row in StateStore(webui.store.path).load()["schedule"]}
+    assert saturday not in stored and sunday not in stored
+
+def test_state_etag_and_schedule_delta(client):
+    resp = client.get("/api/state")
+    etag = resp.headers["ETag"]
+    version = resp.get_json()["version"]
+    assert client.get("/api/state", headers={"If-None-Match": etag}).status_code == 304
+
+    row = client.post("/api/schedule/add", json={"time": "06:30", "action": "start_day", "days": ["Sunday"]}).get_json()["rows"][0]
+    resp = client.get("/api/state", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
+
+    delta = client.get(f"/api/schedule?since={version}").get_json()
+    assert delta["full"] is False
+    assert [r["id"] for r in delta["changed"]] == [row["id"]] and delta["removed"] == []
+
+    client.post("/api/schedule/remove", json={"id": row["id"]})
+    delta = client.get(f"/api/schedule?since={delta['version']}").get_json()
+    assert delta["changed"] == [] and delta["removed"] == [row["id"]]
+    # Unknown versions fall back to the full schedule
+    assert client.get("/api/schedule?since=0").get_json()["full"] is True
+
+    # The version is the store's, so another process's write changes it too
+    from web_ui.state_store import StateStore
+    assert delta["version"] == webui.store.version()
+    etag = client.get("/api/state").headers["ETag"]
+    StateStore(webui.store.path).set_setting("location", "office")
+    resp = client.get("/api/state", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.get_json()["version"] == webui.store.version()
+
+def test_schedule_batch_is_validated_and_atomic(client):
+    from web_ui.state_store import StateStore
+    before = client.get("/api/schedule").get_json()
+    resp = client.post("/api/schedule/batch", json={"operations": [
+        {"op": "add", "time": "07:00", "action": "start_day", "days": ["Saturday"]},
+        {"op": "update", "id": before[0]["id"], "time": "25:00"},
+        {"op": "remove", "id": -1},
+        {"op": "toggle", "id": [before[0]["id"]]},
+        {"op": "remove", "id": {"id": 1}},
+    ]})
+    assert resp.status_code == 400
+    assert [e["index"] for e in resp.get_json()["errors"]] == [1, 2, 3, 4]
+    assert client.get("/api/schedule").get_json() == before
+
+    # The single-row endpoints validate like the batch does
+    for url, body in [("add", {"time": "7:60", "action": "start_day", "days": ["Saturday"]}),
+                      ("add", {"time": "07:00", "action": "reboot", "days": ["Saturday"]}),
+                      ("add", {"time": "07:00", "action": "start_day", "days": ["Caturday"]}),
+                      ("update_time", {"id": before[0]["id"], "time": "25:00"}),
+                      ("update_location", {"id": before[0]["id"], "location": "moon"})]:
+        assert client.post(f"/api/schedule/{url}", json=body).status_code == 400, (url, body)
+    assert client.post("/api/schedule/toggle", json={"id": [1]}).status_code == 404
+    assert client.get("/api/schedule").get_json() == before
+
+    operations = [{"op": "add", "time": f"{h:02d}:{m:02d}", "action": "start_day", "days": ["Saturday", "Sunday"]}
+                  for h in range(5) for m in range(0, 60, 15)]
+    operations += [{"op": "update", "id": before[0]["id"], "time": "08:30"},
+                   {"op": "toggle", "id": before[1]["id"]}]
+    resp = client.post("/api/schedule/batch", json={"operations": operations})
+    data = resp.get_json()
+    assert data["success"] and len(data["added"]) == 40 and data["updated"] == 2
+
+    stored = {row["id"]: row for row in StateStore(webui.store.path).load()["schedule"]}
+    assert stored[before[0]["id"]]["time"] == "08:30"
+    assert stored[before[1]["id"]]["enabled"] is (not before[1]["enabled"])
+    assert all(row["id"] in stored for row in data["added"])
+
+    # Undo everything in one batch
+    undo = [{"op": "remove", "id": row["id"]} for row in data["added"]]
+    undo += [{"op": "update", "id": before[0]["id"], "time": before[0]["time"]},
+             {"op": "toggle", "id": before[1]["id"]}]
+    assert client.post("/api/schedule/batch", json={"operations": undo}).get_json()["removed"] == 40
+    assert client.get("/api/schedule").get_json() == before
+
+def test_changes_from_other_processes_are_picked_up(client):
+    from web_ui.state_store import StateStore
+    # The scheduler service (or another worker) writes to the same database
+    other = StateStore(webui.store.path)
+    row_id = max(row["id"] for row in client.get("/api/schedule").get_json()) + 100
+    other.save_row({"id": row_id, "time": "06:15", "action": "start_day", "day": "Sunday", "location": "home"})
+    other.set_meta("last_action_result", "OK: start_day at home &mdash; done")
+    other.save_job({"id": "elsewhere", "submitted_at": 1e12, "status": "succeeded", "action": "start_day"})
+
+    assert row_id in [row["id"] for row in client.get("/api/schedule").get_json()]
+    assert client.get("/api/scheduler_status").get_json()["last_action_result"].endswith("done")
+    assert client.get("/api/jobs/elsewhere").get_json()["job"]["status"] == "succeeded"
+    assert client.get("/api/jobs?limit=1").get_json()["jobs"][0]["id"] == "elsewhere"
+    # New rows get ids after the ones added elsewhere
+    added = client.post("/api/schedule/add", json={"time": "07:00", "action": "start_day", "days": ["Sunday"]})
+    assert added.get_json()["rows"][0]["id"] == row_id + 1
+    assert client.post("/api/schedule/remove", json={"id": row_id}).get_json()["success"]
+    # A row removed elsewhere is not brought back by editing it here
+    assert other.delete_row(row_id + 1)
+    assert client.post("/api/schedule/toggle", json={"id": row_id + 1}).status_code == 404
+    assert client.post("/api/schedule/update_time", json={"id": row_id + 1, "time": "07:30"}).status_code == 404
+    assert row_id + 1 not in [row["id"] for row in other.load()["schedule"]]
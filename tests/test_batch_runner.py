@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import datetime
+import json
+import threading
+import time
+import pytest
+import batch_runner
+from batch_runner import BatchRunner, load_accounts
+from utility.schedule import find_due_action
+
+MONDAY_0905 = datetime.datetime(2024, 1, 1, 9, 5)
+
+SCHEDULE = {
+    "0": {"day": "Monday", "location": "home", "start_the_day": "9:00", "stop_the_day": "18:00"}
+}
+
+
+def make_accounts(count, **extra):
+    return [dict({"name": f"user{i}", "username": f"user{i}", "password": "pw", "schedule": SCHEDULE}, **extra)
+            for i in range(count)]
+
+
+def test_find_due_action_window():
+    day = SCHEDULE["0"]
+    assert find_due_action(day, MONDAY_0905) == "start_day"
+    assert find_due_action(day, MONDAY_0905.replace(hour=12)) is None
+    assert find_due_action(None, MONDAY_0905) is None
+
+
+def test_load_accounts_resolves_password_env_and_default_schedule(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALICE_PW", "secret")
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps({"accounts": [{"username": "alice", "password_env": "ALICE_PW"}]}))
+    [account] = load_accounts(str(path))
+    assert account["name"] == "alice"
+    assert account["password"] == "secret"
+    assert "0" in account["schedule"]
+
+
+def test_due_jobs_uses_schedule_and_location():
+    accounts = make_accounts(2)
+    accounts[1]["location"] = "office"
+    runner = BatchRunner(accounts)
+    jobs = runner.due_jobs(MONDAY_0905)
+    assert [(a["name"], action, loc) for a, action, loc in jobs] == [
+        ("user0", "start_day", "home"),
+        ("user1", "start_day", "office"),
+    ]
+    assert runner.due_jobs(MONDAY_0905.replace(hour=12)) == []
+
+
+class RecordingAction:
+    lock = threading.Lock()
+    running = {}
+    peak = {}
+    peak_total = 0
+
+    def __init__(self, action_type, location, credentials=("", ""), **kwargs):
+        self.account = credentials[0]
+        self.fail = credentials[1] == "bad"
+
+    def perform(self):
+        cls = RecordingAction
+        with cls.lock:
+            cls.running[self.account] = cls.running.get(self.account, 0) + 1
+            cls.peak[self.account] = max(cls.peak.get(self.account, 0), cls.running[self.account])
+            cls.peak_total = max(cls.peak_total, sum(cls.running.values()))
+        time.sleep(0.02)
+        with cls.lock:
+            cls.running[self.account] -= 1
+        if self.fail:
+            raise RuntimeError("login failed")
+        return True
+
+
+def test_run_is_bounded_and_reports_failures(monkeypatch):
+    monkeypatch.setattr(batch_runner, "EPortemAction", RecordingAction)
+    accounts = make_accounts(6)
+    accounts[2]["password"] = "bad"
+    runner = BatchRunner(accounts, workers=3, engine="http")
+    jobs = runner.due_jobs(MONDAY_0905)
+    # Same account twice: the per-account limit must serialize them
+    jobs.append(jobs[0])
+    results = runner.run(jobs)
+
+    assert len(results) == 7
+    assert [r["success"] for r in results].count(False) == 1
+    assert results[2]["error"] == "login failed"
+    assert RecordingAction.peak_total <= 3
+    assert RecordingAction.peak["user0"] == 1
+
+
+def test_run_with_mock_driver(monkeypatch):
+    monkeypatch.setenv('USE_MOCK_SERVER', 'YES')
+    runner = BatchRunner(make_accounts(3), workers=2, engine="selenium")
+    results = runner.run(runner.due_jobs(MONDAY_0905, action_type="lunch_break"))
+    assert all(r["success"] for r in results), results
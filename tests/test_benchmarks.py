@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import copy
+from benchmarks.bench_actions import run_benchmark, compare, percentile
+
+
+def test_percentile_interpolates():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50.5
+    assert percentile(values, 99) == 99.01
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) is None
+
+
+def test_benchmark_runs_both_engines_against_the_mock_stack(monkeypatch):
+    monkeypatch.setenv("ACTION_SETTLE_TIMEOUT", "0.05")
+    document = run_benchmark(actions=8, workers=2)
+    assert set(document["results"]) == {"mock-driver", "http"}
+    for result in document["results"].values():
+        assert result["failures"] == 0, result["first_error"]
+        assert result["throughput"] > 0
+        latency = result["latency_ms"]
+        assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    # The environment is restored afterwards
+    assert "EPORTEM_BASE_URL" not in os.environ
+
+    slower = copy.deepcopy(document)
+    slower["results"]["http"]["throughput"] /= 2
+    slower["results"]["http"]["latency_ms"]["p95"] *= 2
+    assert compare(document, document) == []
+    assert len(compare(document, slower)) == 2
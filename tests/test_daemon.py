@@ -0,0 +1,168 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+from datetime import date, datetime, timedelta
+import pytest
+import main
+from utility.daemon import ScheduleDaemon
+from utility.ledger import ActionLedger
+
+MONDAY = date(2024, 1, 1)
+DAY = {"location": "office", "start_the_day": "9:00", "lunch_break": "13:30", "stop_the_day": "18:00"}
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setenv("EPORTEM_ENABLED", "YES")
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"schedule": {"0": DAY}}))
+    clock = FakeClock(datetime(2024, 1, 1, 8, 50))
+    ran = []
+
+    def make_daemon(execute=lambda action, location: ran.append((action, location, clock.now))):
+        return ScheduleDaemon(str(config_path), execute, lambda config, now: config["schedule"]["0"]["location"],
+                              ledger=ActionLedger(tmp_path / "ledger.json"), poll=24 * 3600, retry=60,
+                              env_path=tmp_path / ".env", clock=clock, sleep=clock.sleep)
+    return make_daemon, clock, ran, config_path
+
+
+def test_ledger_keeps_recent_days(tmp_path):
+    ledger = ActionLedger(tmp_path / "ledger.json", keep_days=2)
+    ledger.record(MONDAY, "start_day", datetime(2024, 1, 1, 9, 1))
+    assert ActionLedger(tmp_path / "ledger.json").fired(MONDAY) == {"start_day": "09:01:00"}
+    ledger.record(MONDAY + timedelta(days=1), "start_day")
+    assert ledger.has_fired(MONDAY, "start_day")
+    ledger.record(MONDAY + timedelta(days=2), "stop_day")
+    assert not ledger.has_fired(MONDAY, "start_day")
+    assert ledger.has_fired(MONDAY + timedelta(days=2), "stop_day")
+
+
+def test_ledgers_sharing_a_file_do_not_lose_records(tmp_path):
+    # Separate instances stand in for cron and the daemon: only the file lock orders them
+    import threading
+    actions = [f"action{i}" for i in range(40)]
+
+    def record(ledger, names):
+        for name in names:
+            ledger.record(MONDAY, name)
+    threads = [threading.Thread(target=record, args=(ActionLedger(tmp_path / "ledger.json"), actions[i::2]))
+               for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ActionLedger(tmp_path / "ledger.json").fired(MONDAY)) == sorted(actions)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_daemon_sleeps_until_each_action_and_fires_it_once(setup):
+    make_daemon, clock, ran, _ = setup
+    daemon = make_daemon()
+    assert daemon.run_once() == 600
+    clock.sleep(600)
+    assert daemon.run_once() == 4.5 * 3600
+    assert ran == [("start_day", "office", datetime(2024, 1, 1, 9, 0))]
+
+    # A restart inside the window does not fire it again
+    clock.sleep(60)
+    make_daemon().run_once()
+    assert len(ran) == 1
+    for _ in range(3):
+        clock.sleep(make_daemon().run_once())
+    assert [action for action, _, _ in ran] == ["start_day", "lunch_break", "stop_day"]
+    assert ran[-1][2] == datetime(2024, 1, 1, 18, 0)
+
+
+def test_daemon_catches_up_inside_the_window_only(setup):
+    make_daemon, clock, ran, _ = setup
+    clock.now = datetime(2024, 1, 1, 9, 14)
+    make_daemon().run_once()
+    clock.now = datetime(2024, 1, 1, 13, 46)
+    make_daemon().run_once()
+    assert [action for action, _, _ in ran] == ["start_day"]
+
+
+def test_daemon_reloads_a_changed_config(setup):
+    make_daemon, clock, ran, config_path = setup
+    daemon = make_daemon()
+    config_path.write_text(json.dumps({"schedule": {"0": dict(DAY, start_the_day="8:55")}}))
+    os.utime(config_path, ns=(0, 0))
+    assert daemon.run_once() == 300
+    clock.sleep(300)
+    daemon.run_once()
+    assert ran == [("start_day", "office", datetime(2024, 1, 1, 8, 55))]
+
+
+def test_daemon_retries_failed_actions(setup):
+    make_daemon, clock, ran, _ = setup
+    attempts = []
+
+    def flaky(action, location):
+        attempts.append(clock.now)
+        if len(attempts) == 1:
+            raise RuntimeError("ePortem is down")
+
+    daemon = make_daemon(flaky)
+    clock.now = datetime(2024, 1, 1, 9, 0)
+    daemon.run_once()
+    clock.sleep(30)
+    daemon.run_once()
+    assert not daemon.ledger.has_fired(MONDAY, "start_day")
+    clock.sleep(30)
+    daemon.run_once()
+    assert attempts == [datetime(2024, 1, 1, 9, 0), datetime(2024, 1, 1, 9, 1)]
+    assert daemon.ledger.has_fired(MONDAY, "start_day")
+
+
+def test_cron_mode_runs_an_action_once_per_day(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "load_config", lambda: {"schedule": {str(day): DAY for day in range(7)}})
+    monkeypatch.setattr(main, "find_due_action", lambda schedule, now: "start_day")
+    ran = []
+    monkeypatch.setattr(main, "run_action", lambda action, location: ran.append(action))
+    ledger = ActionLedger(tmp_path / "ledger.json")
+    main.main(ledger)
+    main.main(ledger)
+    assert ran == ["start_day"]
+
+
+def test_concurrent_cron_runs_fire_an_action_once(tmp_path, monkeypatch):
+    # Separate ledgers stand in for two cron processes started inside the same window
+    import threading
+    import time
+    monkeypatch.setattr(main, "load_config", lambda: {"schedule": {str(day): DAY for day in range(7)}})
+    monkeypatch.setattr(main, "find_due_action", lambda schedule, now: "start_day")
+    ran = []
+
+    def run_action(action, location):
+        ran.append(action)
+        time.sleep(0.2)
+    monkeypatch.setattr(main, "run_action", run_action)
+    threads = [threading.Thread(target=main.main, args=(ActionLedger(tmp_path / "ledger.json"),)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ran == ["start_day"]
+
+
+def test_failed_cron_run_is_not_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "load_config", lambda: {"schedule": {str(day): DAY for day in range(7)}})
+    monkeypatch.setattr(main, "find_due_action", lambda schedule, now: "start_day")
+    monkeypatch.setattr(main, "run_action", lambda action, location: 1 / 0)
+    ledger = ActionLedger(tmp_path / "ledger.json")
+    with pytest.raises(ZeroDivisionError):
+        main.main(ledger)
+    assert ledger.fired(date.today()) == {}
@@ -0,0 +1,123 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from utility.driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.quit_called = False
+        self.cookies_cleared = 0
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise ConnectionError("browser crashed")
+        return "about:blank"
+
+    def delete_all_cookies(self):
+        self.cookies_cleared += 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+class CountingFactory:
+    def __init__(self):
+        self.created = []
+
+    def __call__(self):
+        driver = FakeDriver()
+        self.created.append(driver)
+        return driver
+
+
+def test_driver_is_reused_warm():
+    factory = CountingFactory()
+    pool = DriverPool(factory=factory, max_size=1, max_uses=10)
+    with pool.driver() as first:
+        pass
+    with pool.driver() as second:
+        pass
+    assert first is second
+    assert len(factory.created) == 1
+    assert not factory.created[0].quit_called
+    assert factory.created[0].cookies_cleared == 2
+
+
+def test_driver_recycled_after_max_uses():
+    factory = CountingFactory()
+    pool = DriverPool(factory=factory, max_size=1, max_uses=2)
+    for _ in range(3):
+        with pool.driver():
+            pass
+    assert len(factory.created) == 2
+    assert factory.created[0].quit_called
+    assert pool.stats()["size"] == 1
+
+
+def test_crashed_driver_is_replaced():
+    factory = CountingFactory()
+    pool = DriverPool(factory=factory, max_size=1)
+    with pool.driver() as first:
+        factory.created[0].alive = False
+    with pool.driver() as second:
+        pass
+    assert first is not second
+    assert factory.created[0].quit_called
+
+
+def test_acquire_times_out_when_exhausted():
+    pool = DriverPool(factory=CountingFactory(), max_size=1)
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+
+
+def test_close_quits_idle_drivers():
+    factory = CountingFactory()
+    pool = DriverPool(factory=factory, max_size=2)
+    pool.warm()
+    assert pool.stats()["idle"] == 2
+    pool.close()
+    assert all(d.quit_called for d in factory.created)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_action_returns_mock_driver_to_pool(monkeypatch):
+    from mock_server.mock_driver import create_mock_driver
+    from eportem_action import execute_action
+    monkeypatch.setenv('USE_MOCK_SERVER', 'YES')
+    created = []
+
+    def factory():
+        created.append(create_mock_driver())
+        return created[-1]
+
+    pool = DriverPool(factory=factory, max_size=1)
+    assert execute_action('stop_day', 'office', pool=pool)
+    assert execute_action('lunch_break', 'office', pool=pool)
+    assert len(created) == 1
+    assert pool.stats() == {"size": 1, "idle": 1, "leased": 0, "max_size": 1}
+
+
+def test_failed_login_returns_the_lease(monkeypatch):
+    import eportem_action
+    from eportem_action import EPortemAction
+
+    def failing_login(driver, **kwargs):
+        raise TimeoutError("login form not found")
+
+    monkeypatch.setattr(eportem_action, "login_and_navigate", failing_login)
+    factory = CountingFactory()
+    pool = DriverPool(factory=factory, max_size=1, acquire_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(TimeoutError, match="login form"):
+            EPortemAction("start_day", pool=pool)._perform_browser(use_mock=False)
+        assert pool.stats()["leased"] == 0
+    # The half-logged-in browser is not handed out again
+    assert len(factory.created) == 2 and factory.created[0].quit_called
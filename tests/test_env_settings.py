@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import builtins
+from unittest.mock import patch
+from web_ui.env_settings import EnvSettings
+
+SCHEMA = [
+    {"key": "EPORTEM_USERNAME", "type": "text", "required": True},
+    {"key": "TELEGRAM_CHAT_ID", "type": "text", "pattern": r"^\d+$", "required": False},
+    {"key": "EPORTEM_ENABLED", "type": "toggle", "required": True},
+    {"key": "WEB_UI_PORT", "type": "number", "required": True},
+]
+REQUIRED = ["EPORTEM_USERNAME", "EPORTEM_ENABLED", "WEB_UI_PORT"]
+
+
+def test_file_is_read_once_until_it_changes(tmp_path):
+    path = str(tmp_path / ".env")
+    with open(path, "w") as f:
+        f.write("# comment\nEPORTEM_USERNAME=alice\nEPORTEM_ENABLED=YES\nWEB_UI_PORT=8010\n")
+    settings = EnvSettings(SCHEMA, REQUIRED)
+    real_open = builtins.open
+    with patch("builtins.open", side_effect=real_open) as opened:
+        first = settings.load(path)
+        for _ in range(10):
+            assert settings.load(path) is first
+    assert opened.call_count == 1
+    assert first.config_error is None
+    schema = {entry["key"]: entry["value"] for entry in json.loads(first.schema_json)["schema"]}
+    assert schema == {"EPORTEM_USERNAME": "alice", "TELEGRAM_CHAT_ID": "", "EPORTEM_ENABLED": True, "WEB_UI_PORT": 8010}
+
+    # Replaced through a rename: new inode
+    with open(path + ".new", "w") as f:
+        f.write("EPORTEM_USERNAME=alice\nEPORTEM_ENABLED=NO\nWEB_UI_PORT=8010\n")
+    os.replace(path + ".new", path)
+    assert settings.load(path).config_error == "EPORTEM_ENABLED is not set to YES."
+
+    os.remove(path)
+    assert settings.load(path).config_error == "Configuration file not found (.env missing)."
+
+
+def test_patterns_are_compiled_once():
+    settings = EnvSettings(SCHEMA, REQUIRED)
+    assert list(settings.patterns) == ["TELEGRAM_CHAT_ID"]
+    assert settings.patterns["TELEGRAM_CHAT_ID"].match("123")
+    assert not settings.patterns["TELEGRAM_CHAT_ID"].match("12a")
@@ -0,0 +1,125 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import pytest
+from werkzeug.serving import make_server
+from utility.server import app, mock
+from utility.session_store import SessionStore
+from utility.http_engine import HttpActionEngine, HttpActionError, ClockEventRejected, ClockEventUncertain
+
+
+@pytest.fixture(scope="module")
+def mock_server_url():
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def mock_env(monkeypatch, mock_server_url):
+    monkeypatch.setenv('USE_MOCK_SERVER', 'YES')
+    monkeypatch.setenv('EPORTEM_BASE_URL', mock_server_url)
+    monkeypatch.delenv('EPORTEM_USERNAME', raising=False)
+    monkeypatch.delenv('EPORTEM_PASSWORD', raising=False)
+    # Every test starts with the clock stopped
+    mock.reset()
+
+
+def test_login_and_clock_event(mock_env):
+    engine = HttpActionEngine()
+    assert engine.perform("start_day", "home")["state"] == "working"
+    result = engine.perform("lunch_break", "home")
+    assert result["status"] == "success"
+    assert "lunch_break" in result["message"]
+    assert [e["action"] for e in mock.clock_log("test_user")] == ["start_day", "lunch_break"]
+
+
+def test_invalid_transition_is_rejected(mock_env):
+    engine = HttpActionEngine()
+    engine.perform("start_day")
+    with pytest.raises(ClockEventRejected, match="while working"):
+        engine.perform("start_day")
+    with pytest.raises(ClockEventRejected):
+        engine.perform("after_lunch")
+    assert len(mock.clock_log("test_user")) == 1
+
+
+def test_bad_credentials_raise(mock_env, monkeypatch):
+    engine = HttpActionEngine()
+    engine.password = "wrong"
+    with pytest.raises(HttpActionError):
+        engine.perform("start_day")
+
+
+def test_saved_session_skips_login(mock_env, tmp_path):
+    store = SessionStore(path=tmp_path / "sessions.json")
+    HttpActionEngine(session_store=store).perform("start_day")
+    assert store.load("test_user")
+
+    # Wrong password proves the login form is never posted
+    engine = HttpActionEngine(session_store=store)
+    engine.password = "wrong"
+    assert engine.perform("stop_day")["status"] == "success"
+
+
+def test_dead_saved_session_logs_in_again(mock_env, tmp_path):
+    store = SessionStore(path=tmp_path / "sessions.json")
+    store.save("test_user", [{"name": "session", "value": "forged"}])
+    assert HttpActionEngine(session_store=store).perform("start_day")["status"] == "success"
+    assert store.load("test_user") != [{"name": "session", "value": "forged"}]
+
+
+def test_execute_action_http_engine_needs_no_browser(mock_env, monkeypatch):
+    import eportem_action
+    monkeypatch.setattr(eportem_action, "login_and_navigate",
+                        lambda *a, **k: pytest.fail("browser path should not run"))
+    assert eportem_action.execute_action("start_day", "office", engine="http")
+
+
+def test_execute_action_falls_back_to_browser(monkeypatch):
+    import eportem_action
+    monkeypatch.setenv('USE_MOCK_SERVER', 'YES')
+    monkeypatch.setenv('EPORTEM_BASE_URL', 'http://127.0.0.1:9')
+    used_browser = []
+    real_perform_browser = eportem_action.EPortemAction._perform_browser
+
+    def perform_browser(self, use_mock):
+        used_browser.append(True)
+        return real_perform_browser(self, use_mock)
+
+    monkeypatch.setattr(eportem_action.EPortemAction, "_perform_browser", perform_browser)
+    assert eportem_action.execute_action("stop_day", "office", engine="http")
+    assert used_browser
+
+
+def test_no_browser_fallback_once_the_event_may_have_registered(mock_env, monkeypatch):
+    import eportem_action
+    from utility.server import app
+    monkeypatch.setattr(eportem_action, "login_and_navigate",
+                        lambda *a, **k: pytest.fail("a second attempt could clock in twice"))
+    client = app.test_client()
+    client.post('/admin/profile', json={"endpoints": {"action": {"error_rate": 1, "error_statuses": [502]}}})
+    try:
+        with pytest.raises(ClockEventUncertain, match="HTTP 502"):
+            eportem_action.execute_action("start_day", "office", engine="http")
+    finally:
+        client.post('/admin/profile', json={})
+
+
+def test_read_timeout_is_uncertain(mock_env):
+    import requests
+
+    class TimingOutSession(requests.Session):
+        def post(self, url, **kwargs):
+            if url.endswith("/api/action"):
+                raise requests.ReadTimeout("read timed out")
+            return super().post(url, **kwargs)
+
+    engine = HttpActionEngine(session=TimingOutSession())
+    with pytest.raises(ClockEventUncertain):
+        engine.perform("start_day")
+    engine.close()
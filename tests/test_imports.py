@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# What the cron path (and the mock and HTTP paths) must not pay for
+HEAVY = ("selenium", "requests", "flask")
+
+# Cumulative `python -X importtime` budget for `import main`; selenium alone is several times this
+MAIN_IMPORT_BUDGET_US = int(os.getenv("MAIN_IMPORT_BUDGET_US", "50000"))
+
+
+def run_fresh(code, **env):
+    """Run code in a new interpreter and return the HEAVY modules it ended up importing"""
+    report = f"\nimport sys, json\nprint(json.dumps(sorted(m for m in {HEAVY!r} if m in sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code + report], cwd=ROOT, env=dict(os.environ, **env),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_nothing_to_do_path_imports_no_heavy_modules():
+    code = "import main\nmain.find_due_action = lambda *args, **kwargs: None\nmain.main()"
+    assert run_fresh(code) == []
+
+
+def test_mock_action_imports_no_heavy_modules():
+    code = "from eportem_action import execute_action\nexecute_action('start_day', 'home', use_mock_server=True)"
+    assert run_fresh(code, USE_MOCK_SERVER="YES", ACTION_SETTLE_TIMEOUT="0") == []
+
+
+def test_http_engine_imports_requests_only():
+    assert run_fresh("import eportem_action\nimport utility.http_engine") == ["requests"]
+
+
+def test_main_import_time_budget():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative = next(int(line.split("|")[1]) for line in result.stderr.splitlines()
+                      if line.split("|")[-1].strip() == "main")
+    assert cumulative < MAIN_IMPORT_BUDGET_US, f"import main took {cumulative} us"
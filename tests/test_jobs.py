@@ -0,0 +1,84 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextvars
+import threading
+import pytest
+from web_ui.jobs import ActionExecutor, _capture_output
+
+
+@pytest.fixture
+def executor():
+    executor = ActionExecutor(workers=2, mode="inprocess")
+    yield executor
+    executor.shutdown()
+
+
+def test_inprocess_jobs_run_concurrently_with_own_output(executor, monkeypatch):
+    monkeypatch.setenv('USE_MOCK_SERVER', 'YES')
+    events = []
+    executor.add_listener(lambda job: events.append((job["id"], job["status"])))
+
+    first = executor.submit("start_day", "office")
+    second = executor.submit("lunch_break", "home", telegram=False)
+    jobs = [executor.wait(first, timeout=30), executor.wait(second, timeout=30)]
+
+    for job in jobs:
+        assert job["status"] == "succeeded", job
+        assert job["error"] is None
+        assert job["started_at"] >= job["submitted_at"]
+        assert job["finished_at"] >= job["started_at"]
+    assert "MOCK NOTIFICATION: RePortemed at office" in jobs[0]["output"]
+    assert "lunch" not in jobs[0]["output"]
+    assert "MOCK NOTIFICATION: RePortemed going to lunch break" in jobs[1]["output"]
+    assert [s for j, s in events if j == first] == ["queued", "running", "succeeded"]
+
+
+def test_exit_is_reported_as_failed_job(executor, monkeypatch):
+    monkeypatch.setenv('USE_MOCK_SERVER', 'NO')
+    monkeypatch.setenv('EPORTEM_ENABLED', 'NO')
+    job = executor.wait(executor.submit("start_day", "office"), timeout=30)
+    assert job["status"] == "failed"
+    assert "EPORTEM_ENABLED" in job["error"]
+
+
+def test_output_is_captured_per_job():
+    started, done = threading.Barrier(3), threading.Barrier(3)
+    outputs = {}
+
+    def job(name):
+        with _capture_output() as buffer:
+            started.wait()
+            print(f"from {name}")
+            # Work the job hands to another thread with its context, like the notifications
+            helper = threading.Thread(target=contextvars.copy_context().run, args=(print, f"helper of {name}"))
+            helper.start()
+            helper.join()
+            done.wait()
+        outputs[name] = buffer.getvalue()
+
+    threads = [threading.Thread(target=job, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    print("not part of any job")
+    done.wait()
+    for thread in threads:
+        thread.join()
+    assert outputs == {"a": "from a\nhelper of a\n", "b": "from b\nhelper of b\n"}
+
+
+def test_history_is_bounded():
+    executor = ActionExecutor(workers=1, mode="inprocess", max_history=2)
+    executor._run = lambda job: executor._update(job, status="succeeded")
+    ids = [executor.submit("start_day", "office") for _ in range(4)]
+    executor.shutdown()
+    assert executor.get(ids[0]) is None
+    last = executor.get(ids[-1])
+    assert last is not None and last["status"] == "succeeded"
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ActionExecutor(mode="forked")
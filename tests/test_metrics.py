@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from unittest.mock import patch
+import pytest
+import requests
+from utility import metrics
+from utility.metrics import Counter, Histogram, Registry
+from utility.notification_send import NotificationManager, SlackChannel
+from eportem_action import EPortemAction
+
+
+def test_text_exposition_format():
+    registry = Registry()
+    runs = registry.register(Counter("runs_total", "Runs", ("action",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", ("phase",), buckets=(0.1, 1)))
+    runs.inc(action='say "hi"\n')
+    runs.inc(2, action="stop_day")
+    latency.observe(0.05, phase="login")
+    latency.observe(0.5, phase="login")
+    latency.observe(3, phase="login")
+    assert registry.render().splitlines() == [
+        "# HELP runs_total Runs",
+        "# TYPE runs_total counter",
+        'runs_total{action="say \\"hi\\"\\n"} 1',
+        'runs_total{action="stop_day"} 2',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{phase="login",le="0.1"} 1',
+        'latency_seconds_bucket{phase="login",le="1"} 2',
+        'latency_seconds_bucket{phase="login",le="+Inf"} 3',
+        'latency_seconds_sum{phase="login"} 3.55',
+        'latency_seconds_count{phase="login"} 3',
+    ]
+    with pytest.raises(ValueError):
+        runs.inc(location="home")
+
+
+def test_actions_are_counted_by_result(monkeypatch):
+    monkeypatch.setenv("USE_MOCK_SERVER", "YES")
+    labels = {"action": "lunch_break", "location": "home"}
+    before = metrics.ACTIONS_TOTAL.value(result="succeeded", **labels)
+    with patch.object(EPortemAction, "_perform_browser"):
+        EPortemAction("lunch_break", "home").perform()
+    with patch.object(EPortemAction, "_perform_browser", side_effect=RuntimeError("no button")):
+        with pytest.raises(RuntimeError):
+            EPortemAction("lunch_break", "home").perform()
+    assert metrics.ACTIONS_TOTAL.value(result="succeeded", **labels) == before + 1
+    assert metrics.ACTIONS_TOTAL.value(result="failed", **labels) >= 1
+    assert metrics.ACTION_SECONDS.count(**labels) >= 2
+
+
+def test_notifications_are_timed_per_channel(stub_http):
+    stub_http.plans["/hook"] = [(500, 0)]
+    failures = metrics.NOTIFICATIONS_TOTAL.value(channel="slack", result="failure")
+    notify_phases = metrics.ACTION_PHASE_SECONDS.count(phase="notify")
+    manager = NotificationManager()
+    manager.register_channel(SlackChannel("hook", base_url=stub_http.url, retries=0))
+    assert not manager.notify("hello")[0].success
+    assert metrics.NOTIFICATIONS_TOTAL.value(channel="slack", result="failure") == failures + 1
+    assert metrics.ACTION_PHASE_SECONDS.count(phase="notify") == notify_phases + 1
+
+
+def test_metrics_http_server():
+    metrics.ACTIONS_TOTAL.inc(action="start_day", location="office", result="succeeded")
+    server = metrics.start_http_server(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        resp = requests.get(f"{url}/metrics", timeout=5)
+        assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'eportem_actions_total{action="start_day",location="office",result="succeeded"}' in resp.text
+        assert requests.get(f"{url}/other", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,134 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import InvalidSelectorException
+from eportem_action import EPortemAction
+from mock_server.mock_driver import Keys, MockWebDriver
+from mock_server.xpath import compile_xpath, XPathSyntaxError
+
+
+@pytest.fixture
+def dashboard():
+    driver = MockWebDriver()
+    driver.add_cookie({'name': MockWebDriver.SESSION_COOKIE, 'value': 'sid'})
+    MockWebDriver._issued_sessions.add('sid')
+    driver.get("http://localhost:8000/aplicaciones")
+    return driver
+
+
+def ids(elements):
+    return [element.id for element in elements]
+
+
+def test_every_action_selector_resolves(dashboard):
+    expected = {
+        '//*[@id="buttonsRegBox"]/div/div/button': 'main-button',
+        '//*[@id="buttonsRegBox"]/div/button[@data-toggle="dropdown"]': 'home-button',
+        '//*[@id="buttonsRegBox"]/div/div/button/div/div[2]/h2': 'h2-main',
+        '//*[@id="_ststart" and @name="1293"]': 'a-start-home',
+        '//*[@id="_stpause"]': 'a-pause',
+        '//a[@id="_stini" and @name="1"]': 'a-resume',
+        '//a[@id="_stini" and @name="1293"]': 'a-resume-home-main',
+        '//*[@id="_ststop"]': 'a-stop',
+    }
+    for action in ("start_day", "lunch_break", "after_lunch", "stop_day"):
+        for location in ("office", "home"):
+            for selector in EPortemAction(action, location, driver=dashboard).selectors.values():
+                if selector:
+                    assert dashboard.find_element(By.XPATH, selector).id == expected[selector]
+
+
+def test_xpath_predicates_and_positions(dashboard):
+    assert ids(dashboard.find_elements(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button')) == [
+        'main-button', 'warning-button']
+    assert ids(dashboard.find_elements(By.XPATH, '//div[2]')) == ['div2', 'btn-group3']
+    assert ids(dashboard.find_elements(
+        By.XPATH, '//ul[contains(@class, "scrollable")]//h2[text()="Resume (Home)"]')) == [
+        'h2-resume-home-main', 'h2-resume-home']
+    assert ids(dashboard.find_elements(By.XPATH, '/html/body')) == ['body']
+    assert ids(dashboard.find_elements(By.XPATH, '//a[@name and not(@name="1")]')) == [
+        'a-resume-home-main', 'a-start-home', 'a-resume-home']
+    assert ids(dashboard.find_elements(By.XPATH, '//a[@name!="1"]')) == [
+        'a-resume-home-main', 'a-start-home', 'a-resume-home']
+    menu = dashboard.find_element(By.XPATH, '//ul[@class="dropdown-menu"]')
+    assert ids(menu.find_elements(By.XPATH, './/a')) == ['a-start-home']
+    assert ids(menu.find_elements(By.XPATH, '//*[@id="_stpause"]')) == ['a-pause']
+
+
+def test_index_follows_dropdown_state(dashboard):
+    assert dashboard.find_elements(By.CLASS_NAME, 'open') == []
+    dashboard.find_element(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button').click()
+    assert ids(dashboard.find_elements(By.CLASS_NAME, 'open')) == ['btn-group2']
+    dashboard.find_element(By.ID, '_stpause').click()
+    assert dashboard.find_elements(By.CLASS_NAME, 'open') == []
+    # Elements created on the fly are indexed too
+    created = dashboard.find_element(By.ID, '_stnew')
+    assert dashboard.find_element(By.XPATH, '//ul/li/a[@id="_stnew"]') is created
+
+
+def test_element_lookups_stay_below_the_element(dashboard):
+    box = dashboard.find_element(By.ID, 'buttonsRegBox')
+    assert ids(box.find_elements(By.TAG_NAME, 'button')) == ['main-button', 'home-button', 'warning-button']
+    assert box.find_elements(By.ID, 'wrapper') == []
+
+
+def test_unsupported_xpath_is_rejected(dashboard):
+    with pytest.raises(InvalidSelectorException):
+        dashboard.find_element(By.XPATH, '//a/following-sibling::b')
+    with pytest.raises(XPathSyntaxError):
+        compile_xpath('//a[@id="x"')
+    assert compile_xpath('//*[@id="_ststop"]') is compile_xpath('//*[@id="_ststop"]')
+
+
+def test_drivers_share_pages_but_not_state(dashboard):
+    other = MockWebDriver()
+    other.add_cookie({'name': MockWebDriver.SESSION_COOKIE, 'value': 'sid'})
+    other.get("http://localhost:8000/aplicaciones")
+    assert other._pages['dashboard'] is dashboard._pages['dashboard']
+
+    dashboard.find_element(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button').click()
+    assert dashboard.find_element(By.ID, '_stpause').is_displayed()
+    assert not other.find_element(By.ID, '_stpause').is_displayed()
+    assert other.find_elements(By.CLASS_NAME, 'open') == []
+    assert dashboard.find_element(By.ID, '_stpause') is dashboard.find_element(By.XPATH, '//a[@id="_stpause"]')
+
+
+def test_adding_to_a_page_copies_it_first(dashboard):
+    other = MockWebDriver()
+    shared = dashboard._pages['dashboard']
+    button = dashboard.find_element(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button')
+    button.click()
+
+    dashboard.find_element(By.ID, '_stnew')
+    assert dashboard._pages['dashboard'] is not shared
+    assert other._pages['dashboard'] is shared and shared.ids('_stnew') == ()
+    # Elements handed out before the copy keep working and keep their state
+    assert button is dashboard.find_element(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button')
+    assert dashboard.find_element(By.ID, '_stpause').is_displayed()
+    assert ids(dashboard.find_elements(By.CLASS_NAME, 'open')) == ['btn-group2']
+
+
+def test_login_form_values_are_per_driver():
+    first, second = MockWebDriver(), MockWebDriver()
+    for driver in (first, second):
+        driver.get("http://localhost:8000/Usuario/Login")
+    first.find_element(By.NAME, 'usuario').send_keys('alice')
+    assert first.find_element(By.NAME, 'usuario').get_attribute('value') == 'alice'
+    assert second.find_element(By.NAME, 'usuario').get_attribute('value') is None
+
+
+def test_sessions_end_when_their_driver_quits():
+    first, second = MockWebDriver(), MockWebDriver()
+    first.get("http://localhost:8000/Usuario/Login")
+    first.find_element(By.NAME, 'usuario').send_keys('alice')
+    first.find_element(By.NAME, 'password').send_keys('secret' + Keys.RETURN)
+    session = first.get_cookie(MockWebDriver.SESSION_COOKIE) or {}
+    # A live session works from another driver, like cookies restored from the session store
+    second.add_cookie(session)
+    assert second._has_session()
+    first.quit()
+    assert not second._has_session()
+    assert session['value'] not in MockWebDriver._issued_sessions
@@ -0,0 +1,177 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import pytest
+import requests
+from werkzeug.serving import make_server
+from mock_server.clock import MockEportem, InvalidTransition, UnknownAction, mock_account
+from mock_server.faults import FaultProfile, Latency, PROFILES
+from utility.server import app, mock, SESSION_COOKIE
+
+
+@pytest.fixture(autouse=True)
+def clean_mock(monkeypatch):
+    monkeypatch.delenv('EPORTEM_USERNAME', raising=False)
+    monkeypatch.delenv('EPORTEM_PASSWORD', raising=False)
+    mock.reset()
+    mock.add_generated_users(2)
+    yield
+    mock.reset()
+    app.test_client().post('/admin/profile', json={})
+
+
+def login(client, username, password):
+    return client.post('/Usuario/Login', data={'usuario': username, 'password': password})
+
+
+def reply(response):
+    """The JSON body of a test client response"""
+    data = response.get_json()
+    assert data is not None
+    return data
+
+
+def session_id(client):
+    cookie = client.get_cookie(SESSION_COOKIE)
+    assert cookie is not None
+    return cookie.value
+
+
+def test_clock_state_machine():
+    clock = MockEportem()
+    assert clock.state("alice") == "stopped"
+    for action, state in [("start_day", "working"), ("lunch_break", "paused"),
+                          ("after_lunch", "working"), ("lunch_break", "paused"), ("stop_day", "stopped")]:
+        assert clock.clock("alice", action)["to"] == state
+    with pytest.raises(InvalidTransition, match="while stopped"):
+        clock.clock("alice", "lunch_break")
+    with pytest.raises(UnknownAction):
+        clock.clock("alice", "nap")
+    clock.clock("bob", "start_day")
+    assert clock.states() == {"alice": "stopped", "bob": "working"}
+    assert [e["id"] for e in clock.clock_log("bob")] == [6]
+    assert [e["action"] for e in clock.clock_log(since=4)] == ["stop_day", "start_day"]
+
+
+def test_sessions_are_per_user_and_expire():
+    clock = MockEportem(users={"alice": "pw"}, session_ttl=0)
+    assert clock.authenticate("alice", "pw") and not clock.authenticate("alice", "nope")
+    sid = clock.create_session("alice")
+    assert clock.session_user(sid) is None
+    clock.session_ttl = 60
+    sid = clock.create_session("alice")
+    assert clock.session_user(sid) == "alice"
+    assert clock.expire_sessions("bob") == 0
+    assert clock.expire_sessions("alice") == 1
+    assert clock.session_user(sid) is None
+
+
+def test_each_user_has_own_session_and_clock():
+    alice, bob = app.test_client(), app.test_client()
+    assert login(alice, *mock_account(0)).status_code == 302
+    assert login(bob, *mock_account(1)).status_code == 302
+    assert session_id(alice) != session_id(bob)
+
+    assert reply(alice.post('/api/action', json={'stamp': '_ststart', 'place': '1293'}))['state'] == 'working'
+    rejected = alice.post('/api/action', json={'action_type': 'start_day'})
+    assert rejected.status_code == 409 and reply(rejected)['state'] == 'working'
+    assert bob.post('/api/action', json={'action_type': 'start_day'}).status_code == 200
+    assert bob.post('/api/action', json={'action_type': 'snooze'}).status_code == 422
+
+    log = reply(app.test_client().get('/api/clock_log', query_string={'user': 'mock_user_0'}))
+    assert log['state'] == 'working'
+    assert [(e['action'], e['location']) for e in log['entries']] == [('start_day', 'home')]
+    assert reply(app.test_client().get('/api/clock_log'))['states'] == {'mock_user_0': 'working',
+                                                                        'mock_user_1': 'working'}
+    assert b'Working' in alice.get('/aplicaciones').data
+
+
+def test_requests_without_a_live_session_are_refused():
+    client = app.test_client()
+    assert login(client, 'mock_user_0', 'wrong').status_code == 200
+    assert client.post('/api/action', json={'action_type': 'start_day'}).status_code == 401
+    assert '/Usuario/Login?ReturnUrl=' in client.get('/aplicaciones').headers['Location']
+
+    login(client, *mock_account(0))
+    mock.expire_sessions()
+    assert client.post('/api/action', json={'action_type': 'start_day'}).status_code == 401
+    assert mock.clock_log() == []
+
+
+def test_no_double_clock_in_under_concurrency():
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    clients = 16
+    sessions = [requests.Session() for _ in range(clients)]
+    for session in sessions:
+        session.post(f"{url}/Usuario/Login", data=dict(zip(('usuario', 'password'), mock_account(0))))
+    barrier = threading.Barrier(clients)
+    statuses = []
+
+    def clock_in(session):
+        barrier.wait()
+        statuses.append(session.post(f"{url}/api/action", json={'action_type': 'start_day'}).status_code)
+
+    threads = [threading.Thread(target=clock_in, args=(session,)) for session in sessions]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        entries = requests.get(f"{url}/api/clock_log", params={'user': 'mock_user_0'}).json()['entries']
+    finally:
+        server.shutdown()
+    assert sorted(statuses) == [200] + [409] * (clients - 1)
+    assert [e['action'] for e in entries] == ['start_day']
+
+
+def test_fault_decisions_are_reproducible_from_the_seed():
+    def decisions(config):
+        profile = FaultProfile(config)
+        return [profile.decide("action") for _ in range(200)]
+
+    first = decisions(PROFILES["bad_morning"])
+    assert first == decisions(PROFILES["bad_morning"])
+    assert first != decisions(dict(PROFILES["bad_morning"], seed=2))
+    assert any(d.status in (500, 502, 503) for d in first)
+    assert all(0 <= d.delay <= 15 for d in first)
+    assert FaultProfile().decide("action") == (0.0, None, False, False)
+
+
+def test_latency_distributions():
+    import random
+    rng = random.Random(0)
+    assert Latency({"dist": "fixed", "value": 0.25}).sample(rng) == 0.25
+    assert min(Latency({"dist": "normal", "mean": 0, "stddev": 1}).sample(rng) for _ in range(100)) == 0
+    tail = sorted(Latency({"dist": "longtail", "median": 0.1, "sigma": 1, "max": 0.5}).sample(rng) for _ in range(1001))
+    assert 0.07 < tail[500] < 0.14 and tail[-1] == 0.5
+    with pytest.raises(ValueError):
+        Latency({"dist": "uniform"})
+    with pytest.raises(ValueError):
+        FaultProfile({"endpoints": {"logout": {}}})
+
+
+def test_profile_from_admin_endpoint():
+    admin, client = app.test_client(), app.test_client()
+    login(client, *mock_account(0))
+    profile = {"seed": 7, "endpoints": {"action": {"error_rate": 1, "error_statuses": [503]}},
+               "dropdown_delay": {"dist": "fixed", "value": 1.5}}
+    assert reply(admin.post('/admin/profile', json=profile))['profile'] == profile
+
+    assert client.post('/api/action', json={'action_type': 'start_day'}).status_code == 503
+    assert 'const dropdownDelayMs = 1500;' in client.get('/aplicaciones').get_data(as_text=True)
+    assert reply(admin.get('/admin/profile'))['injected']['errors'] == 1
+    assert mock.clock_log() == []
+
+    admin.post('/admin/profile', json={"session_expiry_rate": 1})
+    assert client.post('/api/action', json={'action_type': 'start_day'}).status_code == 401
+
+    assert admin.post('/admin/profile', json={"endpoints": {"action": {"error_rate": 2}}}).status_code == 400
+    assert reply(admin.post('/admin/profile', json={"name": "bad_morning"}))['name'] == 'bad_morning'
+    assert reply(admin.post('/admin/profile', json={}))['profile'] == {}
+    login(client, *mock_account(0))
+    assert client.post('/api/action', json={'action_type': 'start_day'}).status_code == 200
+    assert reply(admin.post('/admin/expire_sessions', query_string={'user': 'mock_user_0'}))['expired'] == 1
@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+from utility.notification_send import NotificationManager, TelegramChannel, SlackChannel, NotificationChannel
+
+
+def test_fan_out_is_concurrent(stub_http):
+    stub_http.plans["/botT/sendMessage"] = [(200, 0.4)]
+    stub_http.plans["/hook"] = [(200, 0.4)]
+    manager = NotificationManager()
+    manager.register_channel(TelegramChannel("T", "1", base_url=stub_http.url))
+    manager.register_channel(SlackChannel("hook", base_url=stub_http.url))
+
+    start = time.monotonic()
+    results = manager.notify("hello")
+    assert time.monotonic() - start < 0.75
+    assert [(r.channel, r.success, r.status_code) for r in results] == [("telegram", True, 200), ("slack", True, 200)]
+
+
+def test_retries_with_backoff_then_gives_up(stub_http):
+    stub_http.plans["/hook"] = [(503, 0), (200, 0)]
+    result = SlackChannel("hook", base_url=stub_http.url, backoff=0.01).send("hello")
+    assert result.success and result.attempts == 2
+
+    stub_http.plans["/hook"] = [(500, 0)] * 3
+    result = SlackChannel("hook", base_url=stub_http.url, retries=2, backoff=0.01).send("hello")
+    assert not result.success
+    assert result.attempts == 3 and result.status_code == 500
+
+
+def test_client_errors_are_not_retried(stub_http):
+    stub_http.plans["/hook"] = [(404, 0)]
+    result = SlackChannel("hook", base_url=stub_http.url, backoff=0.01).send("hello")
+    assert not result.success and result.attempts == 1
+
+
+def test_timeout_is_reported(stub_http):
+    stub_http.plans["/hook"] = [(200, 0.5)]
+    result = SlackChannel("hook", base_url=stub_http.url, timeout=0.1, retries=0).send("hello")
+    assert not result.success
+    assert result.status_code is None and result.error
+
+
+def test_connections_are_reused(stub_http):
+    channel = TelegramChannel("T", "1", base_url=stub_http.url)
+    for _ in range(3):
+        assert channel.send("hello").success
+    ports = {port for path, port, body in stub_http.requests}
+    assert len(ports) == 1
+
+
+def test_channel_exceptions_become_results():
+    class Broken(NotificationChannel):
+        name = "broken"
+
+        def send(self, message_text):
+            raise RuntimeError("no network")
+
+    manager = NotificationManager()
+    manager.register_channel(Broken())
+    [result] = manager.notify("hello")
+    assert not result.success and result.error == "no network"
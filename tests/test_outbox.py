@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import time
+from unittest.mock import patch
+import pytest
+from utility.outbox import Outbox, OutboxDrainer
+import utility.outbox as outbox_module
+from eportem_action import EPortemAction
+
+
+@pytest.fixture
+def env(stub_http, monkeypatch):
+    monkeypatch.setenv("TELEGRAM_API_URL", stub_http.url)
+    monkeypatch.setenv("SLACK_HOOKS_URL", stub_http.url)
+    monkeypatch.setenv("SLACK_API_URL", stub_http.url)
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "T")
+    monkeypatch.setenv("TELEGRAM_CHAT_ID", "1")
+    monkeypatch.setenv("SLACK_WEBHOOK", "hook")
+    return stub_http
+
+
+def test_failed_events_are_kept_and_retried_as_one_batch(env, tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"), base_delay=10)
+    assert outbox.enqueue("slack", {"text": "first"}, dedup_key="a")
+    assert outbox.enqueue("slack", {"text": "second"}, dedup_key="b")
+    assert not outbox.enqueue("slack", {"text": "first again"}, dedup_key="a")
+
+    env.plans["/hook"] = [(503, 0)]
+    now = time.time()
+    assert outbox.drain_once(now) == {"delivered": 0, "failed": 2, "dead": 0}
+    # Backed off: nothing is due right away, and a restart keeps the events
+    assert outbox.drain_once(now + 1) == {"delivered": 0, "failed": 0, "dead": 0}
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    assert outbox.pending() == 2
+
+    assert outbox.drain_once(now + 11)["delivered"] == 2
+    path, port, body = env.requests[-1]
+    assert path == "/hook" and json.loads(body) == {"text": "first\nsecond"}
+    assert outbox.pending() == 0
+    assert not outbox.enqueue("slack", {"text": "first"}, dedup_key="a")
+
+
+def test_only_latest_slack_status_is_sent(env, tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    outbox.enqueue("slack_status", {"text": "Away for lunch", "emoji": ":fork_and_knife:"})
+    outbox.enqueue("slack_status", {"text": "Working at home", "emoji": ":house:"})
+    assert outbox.drain_once()["delivered"] == 2
+    assert len(env.requests) == 1
+    path, port, body = env.requests[0]
+    assert path == "/users.profile.set"
+    assert json.loads(body)["profile"]["status_text"] == "Working at home"
+
+
+def test_events_die_after_max_attempts(env, tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"), max_attempts=2, base_delay=0)
+    outbox.enqueue("telegram", {"text": "hello"})
+    env.plans["/botT/sendMessage"] = [(500, 0), (500, 0)]
+    assert outbox.drain_once()["failed"] == 1
+    assert outbox.drain_once()["dead"] == 1
+    assert outbox.pending() == 0
+
+
+def test_perform_enqueues_and_drainer_delivers(env, tmp_path, monkeypatch):
+    monkeypatch.setenv("NOTIFY_OUTBOX", "YES")
+    monkeypatch.setenv("USE_MOCK_SERVER", "NO")
+    monkeypatch.setenv("EPORTEM_ENABLED", "YES")
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    drainer = OutboxDrainer(outbox)
+    monkeypatch.setattr(outbox_module, "_default", (outbox, drainer))
+    env.plans["/hook"] = [(200, 0.5)]
+
+    action = EPortemAction("stop_day", "office", credentials=("alice", "pw"),
+                           telegram=True, slack=True, slack_status=True)
+    with patch.object(EPortemAction, "_perform_browser"):
+        start = time.monotonic()
+        action.perform()
+        action.perform()
+        # Enqueueing does not wait for the slow Slack webhook
+        assert time.monotonic() - start < 0.4
+    assert outbox.pending() == 3
+
+    drainer.start()
+    try:
+        assert drainer.flush(timeout=5)
+    finally:
+        drainer.stop()
+    assert outbox.pending() == 0
+    assert sorted(path for path, port, body in env.requests) == ["/botT/sendMessage", "/hook", "/users.profile.set"]
+
+
+def test_cron_run_delivers_what_earlier_runs_left_queued(env, tmp_path, monkeypatch):
+    import main
+    monkeypatch.setenv("NOTIFY_OUTBOX", "YES")
+    monkeypatch.setenv("OUTBOX_PATH", str(tmp_path / "outbox.db"))
+    monkeypatch.setattr(outbox_module, "_default", None)
+    Outbox().enqueue("telegram", {"text": "left over"})
+    monkeypatch.setattr(main, "load_config", lambda: {"schedule": {}})
+
+    # Nothing is due, yet the drainer runs
+    main.main()
+    outbox, drainer = outbox_module._default
+    try:
+        assert drainer.flush(timeout=5)
+    finally:
+        drainer.stop()
+    assert outbox.pending() == 0
+    assert [path for path, port, body in env.requests] == ["/botT/sendMessage"]
+    # A stopped drainer does not hold up the exit
+    assert not drainer.flush()
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+from datetime import datetime, timedelta
+import pytest
+from web_ui.schedule_model import ScheduleModel
+from web_ui.scheduler import DAYS, next_occurrence
+
+MONDAY_0905 = datetime(2024, 1, 1, 9, 5)
+
+
+def brute_force_next(rows, now):
+    candidates = [(next_occurrence(row, now), row["id"]) for row in rows if row.get("enabled")]
+    candidates = [c for c in candidates if c[0] is not None]
+    return min(candidates, default=(None, None))
+
+
+def next_action(model, now):
+    upcoming = model.next_action(now)
+    assert upcoming is not None
+    return upcoming
+
+
+def test_next_action_matches_full_scan():
+    rng = random.Random(7)
+    rows = [{"id": i, "time": f"{rng.randrange(24)}:{rng.randrange(60):02d}", "action": "start_day",
+             "enabled": rng.random() > 0.3, "day": rng.choice(DAYS + [None])} for i in range(1, 500)]
+    for row in rows:
+        if row["day"] is None:
+            del row["day"]
+    model = ScheduleModel(rows)
+    for _ in range(200):
+        now = MONDAY_0905 + timedelta(minutes=rng.randrange(7 * 24 * 60), seconds=rng.choice([0, 30]))
+        due, row = next_action(model, now)
+        expected_due, _ = brute_force_next(rows, now)
+        assert due == expected_due
+        assert next_occurrence(row, now) == due
+
+
+def test_edits_keep_timelines_in_sync():
+    model = ScheduleModel([
+        {"id": 1, "time": "09:00", "action": "start_day", "enabled": True, "day": "Monday"},
+        {"id": 2, "time": "12:00", "action": "lunch_break", "enabled": True, "day": "Monday"},
+    ])
+    assert next_action(model, MONDAY_0905)[1]["id"] == 2
+
+    model.update(2, enabled=False)
+    assert model.next_action(MONDAY_0905) == (datetime(2024, 1, 8, 9, 0), model.get(1))
+
+    model.update(1, time="9:30")
+    assert next_action(model, MONDAY_0905)[0] == datetime(2024, 1, 1, 9, 30)
+
+    model.remove(1)
+    assert model.next_action(MONDAY_0905) is None
+    assert model.update(1, time="10:00") is None
+    assert [row["id"] for row in model.rows()] == [2]
+
+
+def test_row_due_now_is_next():
+    model = ScheduleModel([{"id": 1, "time": "9:05", "action": "start_day", "enabled": True, "day": "Monday"}])
+    assert next_action(model, MONDAY_0905)[0] == MONDAY_0905
+    assert next_action(model, MONDAY_0905.replace(second=1))[0] == MONDAY_0905 + timedelta(days=7)
+
+
+def test_duplicate_ids_are_rejected():
+    model = ScheduleModel([{"id": 1, "time": "9:05", "action": "start_day", "enabled": True}])
+    with pytest.raises(ValueError):
+        model.add({"id": 1, "time": "10:00", "action": "stop_day", "enabled": True})
+
+
+def changes_since(model, since):
+    changes = model.changes_since(since)
+    assert changes is not None
+    return changes
+
+
+def test_changes_since_and_tombstone_limit():
+    model = ScheduleModel([{"id": 1, "time": "9:00", "action": "start_day", "enabled": True}], version=100,
+                          max_tombstones=1)
+    assert model.changes_since(100) == ([], [])
+    model.update(1, time="9:30")
+    model.add({"id": 2, "time": "10:00", "action": "stop_day", "enabled": True})
+    changed, removed = changes_since(model, 100)
+    assert [row["id"] for row in changed] == [1, 2] and removed == []
+    assert [row["id"] for row in changes_since(model, 101)[0]] == [2]
+
+    model.remove(2)
+    assert model.changes_since(102) == ([], [2])
+    model.add({"id": 3, "time": "11:00", "action": "stop_day", "enabled": True})
+    model.remove(3)
+    # The tombstone for row 2 was dropped, so older versions need a full reload
+    assert model.changes_since(102) is None
+    assert model.changes_since(model.version + 1) is None
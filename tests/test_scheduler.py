@@ -0,0 +1,93 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+from datetime import datetime, timedelta
+from web_ui.scheduler import Scheduler, next_occurrence
+from utility import metrics
+
+MONDAY_0905 = datetime(2024, 1, 1, 9, 5)
+
+
+def next_due(scheduler):
+    upcoming = scheduler.next_due()
+    assert upcoming is not None
+    return upcoming
+
+
+def test_next_occurrence():
+    assert next_occurrence({"time": "9:05", "day": "Monday"}, MONDAY_0905) == MONDAY_0905
+    assert next_occurrence({"time": "9:00", "day": "Monday"}, MONDAY_0905) == datetime(2024, 1, 8, 9, 0)
+    assert next_occurrence({"time": "08:30", "day": "Wednesday"}, MONDAY_0905) == datetime(2024, 1, 3, 8, 30)
+    assert next_occurrence({"time": "9:00"}, MONDAY_0905) == datetime(2024, 1, 2, 9, 0)
+    assert next_occurrence({"time": "bogus"}, MONDAY_0905) is None
+
+
+def test_next_due_skips_disabled_rows():
+    rows = [
+        {"id": 1, "time": "9:10", "day": "Monday", "action": "start_day", "enabled": False},
+        {"id": 2, "time": "9:20", "day": "Monday", "action": "lunch_break", "enabled": True},
+    ]
+    scheduler = Scheduler(lambda: rows, lambda row, due: None, clock=lambda: MONDAY_0905)
+    due, row = next_due(scheduler)
+    assert due == datetime(2024, 1, 1, 9, 20)
+    assert row["id"] == 2
+
+
+def shifted_clock(lead):
+    """A clock whose next minute boundary is `lead` seconds away"""
+    real_start = datetime.now()
+    boundary = (real_start + timedelta(minutes=2)).replace(second=0, microsecond=0)
+    offset = (boundary - timedelta(seconds=lead)) - real_start
+    return (lambda: datetime.now() + offset), boundary
+
+
+def test_fires_once_on_time_and_wakes_on_change():
+    clock, boundary = shifted_clock(0.3)
+    rows = []
+    fired = []
+    done = threading.Event()
+
+    def fire(row, due):
+        fired.append((row["id"], due, clock()))
+        done.set()
+
+    scheduler = Scheduler(lambda: rows, fire, clock=clock)
+    fired_before = metrics.SCHEDULER_LAG_SECONDS.count()
+    scheduler.start()
+    try:
+        # The schedule is empty when the thread starts; the new row must be picked up by wake()
+        rows.append({"id": 7, "time": boundary.strftime("%H:%M"), "day": boundary.strftime("%A"),
+                     "action": "start_day", "enabled": True})
+        scheduler.wake()
+        assert done.wait(3)
+        done.clear()
+        assert not done.wait(0.5)
+        assert metrics.SCHEDULER_LAG_SECONDS.count() == fired_before + 1
+    finally:
+        scheduler.stop()
+
+    assert len(fired) == 1
+    row_id, due, fired_at = fired[0]
+    assert row_id == 7 and due == boundary
+    assert timedelta(0) <= fired_at - boundary < timedelta(seconds=1)
+    # The row is re-armed for next week
+    assert next_due(scheduler)[0] == boundary + timedelta(days=7)
+
+
+def test_rebuild_keeps_rows_due_within_the_grace_period():
+    rows = [{"id": 1, "time": "9:05", "day": "Monday", "action": "start_day", "enabled": True}]
+    now = [MONDAY_0905 + timedelta(seconds=30)]
+    scheduler = Scheduler(lambda: rows, lambda row, due: None, clock=lambda: now[0])
+    # An edit lands just after the row came due: it still fires
+    scheduler.wake()
+    assert next_due(scheduler)[0] == MONDAY_0905
+    assert [due for due, _ in scheduler._take_due() or []] == [MONDAY_0905]
+    # ...once: a later rebuild does not bring it back
+    scheduler.wake()
+    assert next_due(scheduler)[0] == MONDAY_0905 + timedelta(days=7)
+    # Past the grace period it is next week's
+    now[0] = MONDAY_0905 + timedelta(minutes=2)
+    assert next_due(Scheduler(lambda: rows, lambda row, due: None, clock=lambda: now[0]))[0] == \
+        MONDAY_0905 + timedelta(days=7)
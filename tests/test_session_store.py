@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import pytest
+from utility.session_store import SessionStore
+from utility.login_and_navigate import login_and_navigate
+from mock_server.mock_driver import MockWebDriver
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(path=tmp_path / "sessions.json", ttl=3600)
+
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    monkeypatch.setenv('USE_MOCK_SERVER', 'YES')
+
+
+class RecordingDriver(MockWebDriver):
+    def __init__(self):
+        super().__init__()
+        self.visited = []
+
+    def get(self, url):
+        self.visited.append(url)
+        super().get(url)
+
+
+def test_store_round_trip_and_invalidate(store):
+    cookies = [{"name": "ASP.NET_SessionId", "value": "abc"}]
+    store.save("alice", cookies)
+    assert store.load("alice") == cookies
+    assert store.load("bob") is None
+    store.invalidate("alice")
+    assert store.load("alice") is None
+
+
+def test_store_expiry(store):
+    store.save("alice", [{"name": "sid", "value": "abc", "expiry": int(time.time()) - 1}])
+    assert store.load("alice") is None
+    store.ttl = -1
+    store.save("bob", [{"name": "sid", "value": "abc"}])
+    assert store.load("bob") is None
+
+
+def test_store_file_is_private(store):
+    store.save("alice", [])
+    assert os.stat(store.path).st_mode & 0o077 == 0
+
+
+def test_second_login_reuses_session(store, mock_env):
+    first = RecordingDriver()
+    login_and_navigate(first, session_store=store)
+    assert '/aplicaciones' in first.current_url
+    assert store.load("test_user")
+
+    second = RecordingDriver()
+    login_and_navigate(second, session_store=store)
+    assert '/aplicaciones' in second.current_url
+    assert not any('/Usuario/Login' in url for url in second.visited)
+
+
+def test_dead_session_falls_back_to_login(store, mock_env):
+    login_and_navigate(RecordingDriver(), session_store=store)
+    old_cookies = store.load("test_user")
+    MockWebDriver.expire_sessions()
+
+    driver = RecordingDriver()
+    login_and_navigate(driver, session_store=store)
+    assert '/aplicaciones' in driver.current_url
+    assert any('/Usuario/Login' in url for url in driver.visited)
+    assert store.load("test_user") != old_cookies
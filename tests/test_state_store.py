@@ -0,0 +1,138 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+import threading
+from web_ui.state_store import StateStore
+
+STATE = {
+    "updates_enabled": True,
+    "location": "home",
+    "_scheduler_status": {"upcoming_action": None},
+    "schedule": [
+        {"id": 1, "time": "18:00", "action": "stop_day", "enabled": True, "day": "Monday", "location": "office"},
+        {"id": 2, "time": "09:00", "action": "start_day", "enabled": False, "day": "Monday", "location": "home"},
+        {"id": 3, "time": "12:00", "action": "lunch_break", "enabled": True},
+    ],
+}
+
+
+def test_import_and_load_round_trip(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    assert store.is_empty()
+    store.import_state(STATE)
+    loaded = StateStore(str(tmp_path / "state.db")).load()
+    assert loaded["updates_enabled"] is True and loaded["location"] == "home"
+    assert "_scheduler_status" not in loaded
+    assert loaded["schedule"] == STATE["schedule"]
+    assert [row["id"] for row in store.rows_for_day("Monday")] == [2, 1]
+
+
+def test_row_updates_only_touch_their_row(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    store.import_state(STATE)
+    store.save_row(dict(STATE["schedule"][0], time="17:30"))
+    store.delete_row(3)
+    store.set_setting("updates_enabled", False)
+    loaded = store.load()
+    assert [(row["id"], row["time"]) for row in loaded["schedule"]] == [(1, "17:30"), (2, "09:00")]
+    assert loaded["updates_enabled"] is False
+    with sqlite3.connect(store.path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_concurrent_writers_do_not_lose_rows(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+
+    def writer(offset):
+        for i in range(50):
+            store.save_row({"id": offset + i, "time": "09:00", "action": "start_day", "day": "Friday"})
+
+    threads = [threading.Thread(target=writer, args=(n * 100,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(store.load()["schedule"]) == 200
+
+
+def test_stores_adding_concurrently_get_distinct_ids(tmp_path):
+    # Two stores on one file stand in for two web workers; each has its own connections and lock
+    stores = [StateStore(str(tmp_path / "state.db")) for _ in range(2)]
+    added = [[] for _ in stores]
+    start = threading.Barrier(len(stores))
+
+    def writer(n):
+        start.wait()
+        for _ in range(50):
+            added[n].append(stores[n].add_row({"time": "09:00", "action": "start_day", "day": "Friday"})["id"])
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(len(stores))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ids = added[0] + added[1]
+    assert len(set(ids)) == 100
+    assert sorted(row["id"] for row in stores[0].load()["schedule"]) == sorted(ids)
+
+
+def test_field_updates_do_not_overwrite_other_fields(tmp_path):
+    web = StateStore(str(tmp_path / "state.db"))
+    web.import_state(STATE)
+    other = StateStore(str(tmp_path / "state.db"))
+    assert other.toggle_row(1) == dict(STATE["schedule"][0], enabled=False)
+    # A stale copy of row 1 in this store would still say enabled; the update leaves the flag alone
+    assert web.update_row(1, {"time": "17:30"}) == dict(STATE["schedule"][0], time="17:30", enabled=False)
+    assert web.update_row(99, {"time": "17:30"}) is None
+    assert web.toggle_row(99) is None
+    assert web.delete_row(3) and not web.delete_row(3)
+
+
+def test_transaction_is_atomic(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    try:
+        with store.transaction() as conn:
+            store.save_row({"id": 1, "time": "09:00", "action": "start_day"}, conn)
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert store.load()["schedule"] == []
+
+
+def test_writes_from_another_process_are_detected(tmp_path):
+    web = StateStore(str(tmp_path / "state.db"))
+    web.import_state(STATE)
+    web.load()
+    assert not web.changed_elsewhere()
+    web.save_row(dict(STATE["schedule"][0], time="17:00"))
+    assert not web.changed_elsewhere()
+
+    # A second store on the same file stands in for another process
+    other = StateStore(str(tmp_path / "state.db"))
+    other.set_meta("last_action_result", "OK")
+    assert web.changed_elsewhere()
+    # Our own later write does not hide the other one
+    web.set_setting("location", "office")
+    written = web.seen_version()
+    assert web.changed_elsewhere()
+    # The reloaded state has both writes, so it does not share the version of ours
+    web.load()
+    assert web.seen_version() > written
+    assert not web.changed_elsewhere()
+    assert web.get_meta("last_action_result") == "OK"
+
+
+def test_jobs_are_shared_and_pruned(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    store.load()
+    for i in range(5):
+        store.save_job({"id": f"job{i}", "submitted_at": 1000 + i, "status": "queued"}, keep=3)
+    store.save_job({"id": "job4", "submitted_at": 1004, "status": "succeeded"}, keep=3)
+    assert [job["id"] for job in store.list_jobs()] == ["job4", "job3", "job2"]
+    shared = StateStore(store.path).get_job("job4")
+    assert shared is not None and shared["status"] == "succeeded"
+    assert store.get_job("job0") is None
+    # Job records are not part of the state, so they do not trigger reloads
+    assert not store.changed_elsewhere()
@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+from utility import tracing
+from utility.notification_send import NotificationManager, SlackChannel, TelegramChannel
+from eportem_action import execute_action
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    monkeypatch.setattr(tracing, "_exporters", [])
+    return tracing.add_exporter(tracing.MemoryExporter(5))
+
+
+def test_spans_are_noops_without_exporters(monkeypatch):
+    monkeypatch.setattr(tracing, "_exporters", [])
+    with tracing.span("action") as span:
+        assert span is tracing.NOOP_SPAN
+        span.set("ignored", True)
+
+
+def test_nested_spans_form_one_trace(recorder):
+    with pytest.raises(ValueError):
+        with tracing.span("action", action="start_day"):
+            with tracing.span("login") as span:
+                span.set("restored", False)
+            with tracing.span("click"):
+                raise ValueError("no button")
+    trace, = recorder.traces()
+    assert trace["name"] == "action" and trace["status"] == "error"
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert spans["login"]["parent_id"] == spans["action"]["span_id"]
+    assert spans["login"]["attrs"] == {"restored": False}
+    assert spans["click"]["error"] == "ValueError: no button"
+
+
+def test_notification_threads_join_the_trace(recorder, stub_http):
+    manager = NotificationManager()
+    manager.register_channel(TelegramChannel("T", "1", base_url=stub_http.url))
+    manager.register_channel(SlackChannel("hook", base_url=stub_http.url))
+    with tracing.span("action"):
+        manager.notify("hello")
+    trace = recorder.traces()[0]
+    spans = {span["attrs"].get("channel", span["name"]): span for span in trace["spans"]}
+    assert spans["notify"]["parent_id"] == spans["action"]["span_id"]
+    for channel in ("telegram", "slack"):
+        assert spans[channel]["parent_id"] == spans["notify"]["span_id"]
+        assert spans[channel]["attrs"]["success"] is True
+
+
+def test_mock_driver_run_is_traced(recorder, monkeypatch):
+    monkeypatch.setenv("USE_MOCK_SERVER", "YES")
+    execute_action("start_day", "office", mock=True, use_mock_server=True)
+    trace = recorder.traces()[0]
+    names = [span["name"] for span in trace["spans"]]
+    assert names[:3] == ["execute_action", "driver_start", "action"]
+    for name in ("page_load", "login", "find_element", "click", "element_click", "confirmation"):
+        assert name in names
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "chrome"])
+def test_file_exporters(monkeypatch, tmp_path, fmt):
+    path = str(tmp_path / "traces")
+    monkeypatch.setenv("TRACE_FILE", path)
+    monkeypatch.setenv("TRACE_FORMAT", fmt)
+    monkeypatch.setattr(tracing, "_exporters", None)
+    for _ in range(2):
+        with tracing.span("action"):
+            with tracing.span("login"):
+                pass
+    with open(path) as f:
+        content = f.read()
+    if fmt == "jsonl":
+        traces = [json.loads(line) for line in content.splitlines()]
+        assert [len(trace["spans"]) for trace in traces] == [2, 2]
+    else:
+        # The array is left open for appending; close it to parse
+        events = json.loads(content.rstrip().rstrip(",") + "]")
+        assert [event["name"] for event in events] == ["action", "login", "action", "login"]
+        assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import pytest
+from selenium.webdriver.common.by import By
+from utility.waits import wait_until, wait_for_element, wait_for_registration, WaitTimeoutError
+from mock_server.mock_driver import MockWebDriver
+
+
+def test_wait_until_returns_value_and_retries_errors():
+    calls = []
+
+    def condition():
+        calls.append(1)
+        if len(calls) < 3:
+            raise LookupError("not yet")
+        return "ready"
+
+    assert wait_until(condition, timeout=1, poll=0.001) == "ready"
+    assert len(calls) == 3
+
+
+def test_wait_until_times_out():
+    start = time.monotonic()
+    with pytest.raises(WaitTimeoutError):
+        wait_until(lambda: False, timeout=0.05, poll=0.01)
+    assert time.monotonic() - start < 1
+
+
+@pytest.fixture
+def dashboard():
+    driver = MockWebDriver()
+    driver.add_cookie({'name': MockWebDriver.SESSION_COOKIE, 'value': 'sid'})
+    MockWebDriver._issued_sessions.add('sid')
+    driver.get("http://localhost:8000/aplicaciones")
+    return driver
+
+
+def test_wait_for_element_waits_for_dropdown(dashboard):
+    with pytest.raises(WaitTimeoutError):
+        wait_for_element(dashboard, By.XPATH, '//*[@id="_stpause"]', timeout=0.05, poll=0.01)
+    dashboard.find_element(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button').click()
+    link = wait_for_element(dashboard, By.XPATH, '//*[@id="_stpause"]', timeout=0.05, poll=0.01)
+    assert link.get_attribute('id') == '_stpause'
+
+
+def test_wait_for_registration_detects_click_effect(dashboard):
+    marker = dashboard.find_element(By.ID, 'buttonsRegBox')
+    dashboard.find_element(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button').click()
+    link = dashboard.find_element(By.XPATH, '//*[@id="_ststop"]')
+    assert wait_for_registration(dashboard, marker, link, timeout=0.05, poll=0.01) is False
+    link.click()
+    assert wait_for_registration(dashboard, marker, link, timeout=0.05, poll=0.01) is True
+    assert dashboard.clock_events == [('_ststop', None)]
+
+
+def test_wait_for_registration_outlasts_the_closing_menu(dashboard):
+    dashboard.registration_delay = 0.2
+    marker = dashboard.find_element(By.ID, 'buttonsRegBox')
+    dashboard.find_element(By.XPATH, '//*[@id="buttonsRegBox"]/div/div/button').click()
+    link = dashboard.find_element(By.XPATH, '//*[@id="_stpause"]')
+    start = time.monotonic()
+    link.click()
+    # The menu closes at once, but the submission has not landed yet
+    assert not link.is_displayed() and dashboard.clock_events == []
+    assert wait_for_registration(dashboard, marker, link, timeout=2, poll=0.01) is True
+    assert time.monotonic() - start >= 0.2
+    assert dashboard.clock_events == [('_stpause', None)]
\ No newline at end of file
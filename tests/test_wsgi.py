@@ -0,0 +1,42 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import socket
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+def find_free_port():
+    with socket.socket() as s:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+
+
+def test_production_mode_serves_concurrent_requests(tmp_path):
+    port = find_free_port()
+    env = dict(os.environ, WEB_UI_PORT=str(port), WEB_UI_DB_PATH=str(tmp_path / "state.db"),
+               EPORTEM_ENV_PATH=str(tmp_path / ".env"))
+    proc = subprocess.Popen([sys.executable, "web_ui/server.py", "--production", "--no-scheduler"], env=env,
+                            cwd=os.path.join(os.path.dirname(__file__), '..'),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(40):
+            try:
+                requests.get(f"{url}/api/state", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.25)
+        with ThreadPoolExecutor(8) as pool:
+            responses = list(pool.map(lambda _: requests.get(f"{url}/api/state", timeout=5), range(16)))
+        assert all(resp.status_code == 200 for resp in responses)
+        # Config is validated in production mode too
+        assert responses[0].json()["config_error"]
+    finally:
+        proc.terminate()
+        output = proc.communicate(timeout=5)[0]
+    assert "Scheduler runs in a separate process" in output
+    assert "Debugger is active" not in output
@@ -0,0 +1,150 @@
+"""
+Long-running replacement for calling main.py from cron (main.py --daemon).
+
+config/config.json is parsed once and the daemon sleeps until the next
+scheduled action instead of starting a new interpreter every few minutes.
+Every DAEMON_POLL_SECONDS (default 30) it checks the modification times of
+the config file and config/.env and re-reads the ones that changed. The
+location override file is read when an action runs, like in cron mode.
+
+An action fires from its scheduled time until `window` minutes later, and
+only if the ActionLedger has no record of it for that day. A failed action
+is retried every DAEMON_RETRY_SECONDS (default 120) while its window is open.
+"""
+import datetime
+import json
+import os
+import time
+
+from utility.env_loader import ENV_PATH
+from utility.ledger import ActionLedger
+from utility.schedule import ACTION_TYPES, DEFAULT_WINDOW, get_day_schedule
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ScheduleDaemon:
+    """
+    Fire the actions of a config.json schedule at their times.
+
+    `execute(action_type, location)` runs one action and raises on failure;
+    `locate(config, now)` returns the location to use.
+    """
+
+    def __init__(self, config_path, execute, locate, ledger=None, window=DEFAULT_WINDOW, poll=None,
+                 retry=None, env_path=ENV_PATH, clock=datetime.datetime.now, sleep=time.sleep):
+        self.config_path = config_path
+        self.env_path = env_path
+        self._execute = execute
+        self._locate = locate
+        self.ledger = ledger or ActionLedger()
+        self.window = datetime.timedelta(minutes=window)
+        self.poll = poll if poll is not None else float(os.getenv('DAEMON_POLL_SECONDS', '30'))
+        self.retry = retry if retry is not None else float(os.getenv('DAEMON_RETRY_SECONDS', '120'))
+        self._clock = clock
+        self._sleep = sleep
+        self._failed = {}
+        self.config = self._load_config()
+        self._mtimes = {config_path: _mtime(config_path), env_path: _mtime(env_path)}
+
+    def _load_config(self):
+        with open(self.config_path, "r") as f:
+            return json.load(f)
+
+    def reload(self):
+        """Re-read the config file and .env if they changed; returns True if anything was reloaded"""
+        reloaded = False
+        mtime = _mtime(self.config_path)
+        if mtime != self._mtimes[self.config_path]:
+            try:
+                self.config = self._load_config()
+            except (OSError, ValueError) as e:
+                # Probably caught halfway through an edit; keep the old schedule and look again later
+                print(f"[Daemon] Could not reload {self.config_path}: {e}")
+            else:
+                self._mtimes[self.config_path] = mtime
+                print(f"[Daemon] Reloaded {self.config_path}")
+                reloaded = True
+        mtime = _mtime(self.env_path)
+        if mtime != self._mtimes[self.env_path]:
+            self._mtimes[self.env_path] = mtime
+            if mtime is not None:
+                from dotenv import load_dotenv
+                load_dotenv(self.env_path, override=True)
+                print(f"[Daemon] Reloaded {self.env_path}")
+                reloaded = True
+        return reloaded
+
+    def _today(self, now):
+        """[(scheduled datetime, action type)] for the day of `now`, earliest first"""
+        events = []
+        for task, time_str in (get_day_schedule(self.config["schedule"], now) or {}).items():
+            if task not in ACTION_TYPES:
+                continue
+            try:
+                hour, minute = map(int, time_str.split(":"))
+            except ValueError:
+                continue
+            events.append((now.replace(hour=hour, minute=minute, second=0, microsecond=0), ACTION_TYPES[task]))
+        return sorted(events)
+
+    def due(self, now):
+        """Action types whose window is open at `now` and that did not run today yet"""
+        fired = self.ledger.fired(now.date())
+        actions = []
+        for at, action in self._today(now):
+            if not at <= now <= at + self.window or action in fired:
+                continue
+            failed = self._failed.get((now.date(), action))
+            if failed is not None and (now - failed).total_seconds() < self.retry:
+                continue
+            actions.append(action)
+        return actions
+
+    def seconds_until_next(self, now):
+        """Seconds until the next scheduled time, at most the poll interval"""
+        upcoming = [at for at, _ in self._today(now) if at > now]
+        if upcoming:
+            wait = (upcoming[0] - now).total_seconds()
+        else:
+            tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+            wait = (tomorrow - now).total_seconds()
+        return max(0.0, min(wait, self.poll))
+
+    def fire(self, action, now):
+        if os.getenv('USE_MOCK_SERVER', 'NO') != 'YES' and os.getenv('EPORTEM_ENABLED') != 'YES':
+            print(f"[Daemon] EPORTEM_ENABLED is not 'YES', not running {action}")
+            self._failed[(now.date(), action)] = now
+            return False
+        try:
+            # A cron run of main.py may be running the same action; claim() waits for it
+            with self.ledger.claim(now.date(), action, self._clock) as claimed:
+                if claimed:
+                    print(f"[Daemon] Running {action} due at {now:%Y-%m-%d %H:%M}")
+                    self._execute(action, self._locate(self.config, now))
+        except Exception as e:
+            print(f"[Daemon] {action} failed: {e}")
+            self._failed[(now.date(), action)] = now
+            return False
+        self._failed.pop((now.date(), action), None)
+        if not claimed:
+            print(f"[Daemon] {action} already ran today")
+        return claimed
+
+    def run_once(self):
+        """Reload changed files, fire what is due and return how long to sleep"""
+        self.reload()
+        now = self._clock()
+        for action in self.due(now):
+            self.fire(action, now)
+        return self.seconds_until_next(self._clock())
+
+    def run(self):
+        print(f"[Daemon] Running the schedule from {self.config_path}, ledger in {self.ledger.path}")
+        while True:
+            self._sleep(self.run_once())
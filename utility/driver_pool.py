@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PooledDriver:
+    """Bookkeeping for a browser instance owned by a DriverPool."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class DriverPool:
+    """
+    Keep a bounded set of warm WebDriver instances and hand them out per action.
+
+    Drivers are health-checked before being handed out, recycled after
+    `max_uses` actions or `max_idle` seconds without use, and replaced
+    transparently when they crash.
+    """
+
+    def __init__(self, factory=None, max_size=1, max_uses=20, max_idle=600, acquire_timeout=120.0):
+        if factory is None:
+            from utility.login_and_navigate import create_driver
+            factory = create_driver
+        self.factory = factory
+        self.max_size = max(1, int(max_size))
+        self.max_uses = max(1, int(max_uses))
+        self.max_idle = max_idle
+        self.acquire_timeout = acquire_timeout
+        self._idle = []
+        self._leased = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Return a healthy driver, creating one if the pool has room."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        retired = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Driver pool is closed")
+                    while self._idle:
+                        entry = self._idle.pop()
+                        if self._is_stale(entry) or not self._is_alive(entry.driver):
+                            retired.append(self._retire(entry))
+                            continue
+                        return self._lease(entry)
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No driver available within {timeout}s")
+                    self._cond.wait(remaining)
+        finally:
+            self._quit_all(retired)
+
+        # Start the browser outside the lock, it can take seconds
+        try:
+            entry = PooledDriver(self.factory())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            return self._lease(entry)
+
+    def release(self, driver, discard=False):
+        """Return a driver to the pool, recycling it if it is worn out or dead."""
+        alive = not discard and self._is_alive(driver)
+        retired = []
+        with self._cond:
+            entry = self._leased.pop(id(driver), None)
+            if entry is None:
+                return
+            entry.last_used = time.monotonic()
+            if not alive or self._closed or entry.uses >= self.max_uses:
+                retired.append(self._retire(entry))
+            else:
+                self._reset(driver)
+                self._idle.append(entry)
+            self._cond.notify()
+        self._quit_all(retired)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Context manager that leases a driver for the duration of the block."""
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def warm(self, count=None):
+        """Start browsers up front so the first actions don't pay the cold start."""
+        count = self.max_size if count is None else min(count, self.max_size)
+        drivers = []
+        try:
+            for _ in range(count):
+                drivers.append(self.acquire())
+        finally:
+            for driver in drivers:
+                self.release(driver)
+
+    def close(self):
+        """Quit every idle driver; leased drivers are quit when released."""
+        with self._cond:
+            self._closed = True
+            retired = [self._retire(entry) for entry in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+        self._quit_all(retired)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+                "max_size": self.max_size,
+            }
+
+    def _lease(self, entry):
+        entry.uses += 1
+        entry.last_used = time.monotonic()
+        self._leased[id(entry.driver)] = entry
+        return entry.driver
+
+    def _retire(self, entry):
+        self._size -= 1
+        return entry.driver
+
+    @staticmethod
+    def _quit_all(drivers):
+        # Quitting a browser is slow, so it always happens outside the lock
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"Driver pool: error quitting driver: {e}")
+
+    def _is_stale(self, entry):
+        return self.max_idle is not None and time.monotonic() - entry.last_used > self.max_idle
+
+    @staticmethod
+    def _is_alive(driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(driver):
+        # Never leak one account's session into the next action
+        try:
+            driver.delete_all_cookies()
+        except Exception:
+            pass
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """Return the process-wide pool, configured from DRIVER_POOL_* variables."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            import atexit
+            _default_pool = DriverPool(
+                max_size=int(os.getenv('DRIVER_POOL_SIZE', '1')),
+                max_uses=int(os.getenv('DRIVER_POOL_MAX_USES', '20')),
+                max_idle=int(os.getenv('DRIVER_POOL_MAX_IDLE', '600')),
+            )
+            atexit.register(_default_pool.close)
+        return _default_pool
@@ -0,0 +1,33 @@
+import os
+
+LOGIN_PATH = "/Usuario/Login"
+DASHBOARD_PATH = "/aplicaciones"
+
+MOCK_BASE_URL = "http://localhost:8000"
+REAL_BASE_URL = "https://eportem.es"
+
+MOCK_USERNAME = "test_user"
+MOCK_PASSWORD = "test_password"
+
+
+def get_base_url():
+    """Return the ePortem base URL (the local mock server when USE_MOCK_SERVER=YES)"""
+    override = os.getenv('EPORTEM_BASE_URL')
+    if override:
+        return override.rstrip("/")
+    return MOCK_BASE_URL if os.getenv('USE_MOCK_SERVER', 'NO') == "YES" else REAL_BASE_URL
+
+
+def get_credentials(credentials=None):
+    """
+    Return (username, password).
+
+    Explicit credentials (e.g. from a batch accounts file) win. Otherwise
+    mock mode always uses the test credentials so the real ones from .env
+    are never sent to the mock server.
+    """
+    if credentials:
+        return tuple(credentials)
+    if os.getenv('USE_MOCK_SERVER', 'NO') == "YES":
+        return MOCK_USERNAME, MOCK_PASSWORD
+    return os.getenv('EPORTEM_USERNAME'), os.getenv('EPORTEM_PASSWORD')
@@ -1,9 +1,20 @@
 from pathlib import Path
-from dotenv import load_dotenv
+
+ENV_PATH = Path(__file__).parent.parent / "config" / ".env"
+
+_loaded = False
 
 def load_environment():
     """
     Load environment variables from the .env file located in the project config directory.
+
+    Only the first call reads the file, and python-dotenv is only imported
+    when there is a file to read.
     """
-    env_path = Path(__file__).parent.parent / "config" / ".env"
-    load_dotenv(env_path)
\ No newline at end of file
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if ENV_PATH.exists():
+        from dotenv import load_dotenv
+        load_dotenv(ENV_PATH)
@@ -0,0 +1,164 @@
+import os
+import requests
+from urllib3.exceptions import NewConnectionError
+from utility.endpoints import LOGIN_PATH, get_base_url, get_credentials
+
+# Clock event ids behind the dashboard dropdown links (see EPortemAction._get_selectors)
+STAMP_IDS = {
+    "start_day": "_ststart",
+    "lunch_break": "_stpause",
+    "after_lunch": "_stini",
+    "stop_day": "_ststop",
+}
+
+# Work place ids carried in the links' name attribute
+PLACE_IDS = {
+    "office": "1",
+    "home": "1293",
+}
+
+
+class HttpActionError(Exception):
+    """Raised when a login or clock event sent over HTTP does not go through."""
+    pass
+
+
+class ClockEventRejected(HttpActionError):
+    """Raised when ePortem answers but refuses the clock event (e.g. already clocked in)."""
+    pass
+
+
+class ClockEventUncertain(HttpActionError):
+    """
+    Raised when the clock event was sent but no clear answer came back (a read
+    timeout, a 5xx, a garbled response): ePortem may have registered it.
+    """
+    pass
+
+
+def _never_sent(error):
+    """True if a request failed while connecting, so the server cannot have seen it"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class HttpActionEngine:
+    """
+    Perform ePortem clock events with plain HTTP requests instead of a browser.
+
+    The engine logs in with a form POST and sends the clock event to
+    EPORTEM_HTTP_ACTION_PATH (default /api/action). Cookies can be shared
+    with the browser path through a SessionStore, so a live session is
+    reused and the login POST is skipped.
+    """
+
+    def __init__(self, base_url=None, session=None, session_store=None, timeout=None, credentials=None):
+        self.base_url = (base_url or get_base_url()).rstrip("/")
+        self.session = session or requests.Session()
+        self.session_store = session_store
+        self.timeout = timeout if timeout is not None else float(os.getenv('HTTP_ENGINE_TIMEOUT', '15'))
+        self.action_path = os.getenv('EPORTEM_HTTP_ACTION_PATH', '/api/action')
+        self.username, self.password = get_credentials(credentials)
+        self._logged_in = False
+
+    def login(self):
+        """Log in with the form POST; raises HttpActionError on bad credentials."""
+        if not self.username or not self.password:
+            raise HttpActionError("ePortem credentials are not configured")
+        response = self.session.post(
+            f"{self.base_url}{LOGIN_PATH}",
+            params={"ReturnUrl": "/aplicaciones"},
+            data={"usuario": self.username, "password": self.password},
+            timeout=self.timeout,
+        )
+        # A successful login redirects away from the login form
+        if response.status_code >= 400 or LOGIN_PATH in response.url:
+            raise HttpActionError(f"Login failed for {self.username} (HTTP {response.status_code})")
+        self._logged_in = True
+        if self.session_store is not None:
+            self.session_store.save(self.username, self._export_cookies())
+
+    def perform(self, action_type, location="office"):
+        """Send one clock event and return the decoded response."""
+        if action_type not in STAMP_IDS:
+            raise HttpActionError(f"Unknown action: {action_type}")
+
+        reused = self._logged_in or self._restore_session()
+        if not reused:
+            self.login()
+        response = self._send(action_type, location)
+        if self._session_expired(response) and reused:
+            # The session was dead: log in properly and try once more
+            if self.session_store is not None:
+                self.session_store.invalidate(self.username)
+            self.session.cookies.clear()
+            self.login()
+            response = self._send(action_type, location)
+        if self._session_expired(response):
+            raise HttpActionError(f"{action_type}: ePortem did not accept the session")
+
+        if response.status_code in (409, 422):
+            raise ClockEventRejected(f"{action_type} rejected: {self._error_message(response)}")
+        if response.status_code >= 500:
+            raise ClockEventUncertain(f"{action_type} may or may not have registered (HTTP {response.status_code}): "
+                                      f"{response.text[:200]}")
+        if response.status_code >= 400:
+            raise HttpActionError(f"{action_type} failed (HTTP {response.status_code}): {response.text[:200]}")
+        try:
+            result = response.json()
+        except ValueError:
+            raise ClockEventUncertain(f"{action_type}: unexpected non-JSON response from {response.url}")
+        if result.get("status") != "success":
+            raise ClockEventRejected(f"{action_type} rejected: {result.get('message')}")
+        return result
+
+    def close(self):
+        self.session.close()
+
+    def _send(self, action_type, location):
+        payload = {
+            "action_type": action_type,
+            "location": location,
+            "stamp": STAMP_IDS[action_type],
+            "place": PLACE_IDS.get(location, PLACE_IDS["office"]),
+        }
+        try:
+            return self.session.post(f"{self.base_url}{self.action_path}", json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            if _never_sent(e):
+                raise HttpActionError(f"{action_type}: could not reach ePortem ({e})") from e
+            raise ClockEventUncertain(f"{action_type} may or may not have registered: {e}") from e
+
+    @staticmethod
+    def _error_message(response):
+        try:
+            return response.json().get("message") or response.text[:200]
+        except ValueError:
+            return response.text[:200]
+
+    @staticmethod
+    def _session_expired(response):
+        return response.status_code == 401 or LOGIN_PATH in response.url
+
+    def _restore_session(self):
+        if self.session_store is None or not self.username:
+            return False
+        cookies = self.session_store.load(self.username)
+        if not cookies:
+            return False
+        # The session only ever talks to base_url, so cookies are not domain-scoped here
+        for cookie in cookies:
+            self.session.cookies.set(cookie["name"], cookie["value"], path=cookie.get("path", "/"))
+        return True
+
+    def _export_cookies(self):
+        # Same shape as Selenium's get_cookies() so both engines can share a SessionStore
+        cookies = []
+        for cookie in self.session.cookies:
+            entry = {"name": cookie.name, "value": cookie.value, "path": cookie.path}
+            if cookie.expires:
+                entry["expiry"] = cookie.expires
+            cookies.append(entry)
+        return cookies
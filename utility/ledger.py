@@ -0,0 +1,101 @@
+import datetime
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+DEFAULT_LEDGER_PATH = Path(__file__).parent.parent / "config" / ".fired.json"
+
+# Days of history kept in the file
+KEEP_DAYS = 7
+
+
+class ActionLedger:
+    """
+    Record which scheduled actions already ran on which day.
+
+    Cron runs of main.py and the daemon run scheduled actions inside
+    claim(), which holds an flock on a ".lock" file next to the ledger from
+    the check until the action is recorded. A second run of the same action,
+    from another cron job or the daemon, waits for the first and then sees
+    its record, so an action that succeeded runs once a day; one that
+    failed is not recorded and may be run again. record() takes the same
+    lock. The file maps "YYYY-MM-DD" to {action: time it ran}.
+    """
+
+    def __init__(self, path=None, keep_days=KEEP_DAYS):
+        self.path = Path(path or os.getenv('ACTION_LEDGER_PATH') or DEFAULT_LEDGER_PATH)
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+
+    def fired(self, day):
+        """{action: "HH:MM:SS"} for the actions that ran on `day`"""
+        with self._lock:
+            return dict(self._read().get(day.isoformat(), {}))
+
+    def has_fired(self, day, action):
+        return action in self.fired(day)
+
+    def record(self, day, action, when=None):
+        with self._locked():
+            self._record(day, action, when or datetime.datetime.now())
+
+    @contextmanager
+    def claim(self, day, action, clock=None):
+        """
+        Hold the ledger while running `action` for `day`.
+
+        Yields False if the action already ran that day. Otherwise yields
+        True and records the action, at the time `clock` returns, when the
+        block exits without an exception. The lock is held throughout, so
+        the block must not use this ledger.
+        """
+        with self._locked():
+            if action in self._read().get(day.isoformat(), {}):
+                yield False
+                return
+            yield True
+            self._record(day, action, (clock or datetime.datetime.now)())
+
+    def _record(self, day, action, when):
+        data = self._read()
+        data.setdefault(day.isoformat(), {})[action] = when.strftime("%H:%M:%S")
+        oldest = (day - datetime.timedelta(days=self.keep_days - 1)).isoformat()
+        self._write({key: value for key, value in data.items() if key >= oldest})
+
+    @contextmanager
+    def _locked(self):
+        # The thread lock for this process, the flock for the others; closing the file releases it
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        # Imported here: most cron runs only read the ledger
+        import tempfile
+        # Write atomically, through a temporary file of our own: cron and the daemon may both be reading it
+        tmp = tempfile.NamedTemporaryFile("w", dir=self.path.parent, prefix=self.path.name, suffix=".tmp", delete=False)
+        try:
+            with tmp:
+                json.dump(data, tmp, indent=1, sort_keys=True)
+            os.replace(tmp.name, self.path)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
@@ -0,0 +1,25 @@
+"""
+Selenium's locator strategies and special keys, without importing selenium.
+
+The values are the ones selenium.webdriver.common.by.By and
+selenium.webdriver.common.keys.Keys use, so they work with real drivers and
+MockWebDriver alike. Importing selenium costs more than a whole run of
+main.py that finds nothing to do, so only the code that starts a real
+browser imports it.
+"""
+
+
+class By:
+    ID = "id"
+    XPATH = "xpath"
+    LINK_TEXT = "link text"
+    PARTIAL_LINK_TEXT = "partial link text"
+    NAME = "name"
+    TAG_NAME = "tag name"
+    CLASS_NAME = "class name"
+    CSS_SELECTOR = "css selector"
+
+
+class Keys:
+    RETURN = "\ue006"
+    ENTER = "\ue007"
@@ -1,41 +1,112 @@
 #!/usr/bin/env python
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options as ChromeOptions
 import time
 import os
-
-
-def login_and_navigate(driver=None):
-    # Get the directory of the current file
-    current_dir = os.path.dirname(os.path.realpath(__file__))
-
-    uname = os.getenv('EPORTEM_USERNAME')
-    pwd = os.getenv('EPORTEM_PASSWORD')
-    headless = os.getenv('HEADLESS_BROWSING')
+from utility.endpoints import LOGIN_PATH, DASHBOARD_PATH, get_base_url, get_credentials
+from utility.session_store import get_default_store
+from utility.waits import wait_for_element, wait_for_url_not_containing
+from utility import metrics, tracing
+from utility.locators import By, Keys
+
+
+def create_driver():
+    """Create a new browser instance (a MockWebDriver when USE_MOCK_SERVER=YES)"""
+    if os.getenv('USE_MOCK_SERVER', 'NO') == "YES":
+        # Use our custom MockWebDriver
+        from mock_server.mock_driver import create_mock_driver
+        return create_mock_driver()
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options as ChromeOptions
+    chrome_options = ChromeOptions()
+    chrome_options.add_argument("--disable-gpu")
+    if os.getenv('HEADLESS_BROWSING') == "YES":
+        chrome_options.add_argument("--headless")
+    return webdriver.Chrome(options=chrome_options)
+
+
+def _is_blank(driver):
+    # A browser that has not loaded anything yet must be sent to the login page
+    try:
+        return driver.current_url in ("about:blank", "data:,")
+    except Exception:
+        return False
+
+
+def restore_session(driver, store, account, base_url=None):
+    """
+    Load saved cookies for `account` into the browser and open the dashboard.
+
+    Returns True when the session is still alive. A dead session (the site
+    redirects back to the login form) is removed from the store.
+    """
+    cookies = store.load(account)
+    if not cookies:
+        return False
+    base_url = base_url or get_base_url()
+    try:
+        # Cookies can only be set for the domain currently loaded
+        if not driver.current_url.startswith(base_url):
+            with tracing.span("page_load", path="/favicon.ico"):
+                driver.get(f"{base_url}/favicon.ico")
+        driver.delete_all_cookies()
+        for cookie in cookies:
+            driver.add_cookie(cookie)
+        with tracing.span("page_load", path=DASHBOARD_PATH):
+            driver.get(f"{base_url}{DASHBOARD_PATH}")
+        if LOGIN_PATH not in driver.current_url:
+            print("Reusing saved ePortem session")
+            return True
+    except Exception as e:
+        print(f"Could not restore saved session: {e}")
+    print("Saved ePortem session expired, logging in again")
+    store.invalidate(account)
+    return False
+
+
+def login_and_navigate(driver=None, navigate=False, session_store=None, credentials=None):
+    """
+    Log in to ePortem and land on the dashboard.
+
+    A new browser is created when no driver is passed in. Pass navigate=True
+    for a reused (pooled) driver so it is sent to the login page first.
+    When a session store is available (SESSION_CACHE=YES) saved cookies are
+    tried first and the login form is only used if that session is dead.
+    `credentials` is an optional (username, password) pair overriding .env.
+    """
+    uname, pwd = get_credentials(credentials)
     use_mock = os.getenv('USE_MOCK_SERVER', 'NO')
+    base_url = get_base_url()
+    store = session_store if session_store is not None else get_default_store()
+
+    # Always use test credentials in mock mode
+    if use_mock == "YES" and not credentials:
+        print("Using mock credentials: test_user / test_password")
 
     # create a new Chrome browser instance if one isn't passed in
     if driver is None:
-        if use_mock == "YES":
-            # Use our custom MockWebDriver
-            from mock_server.mock_driver import create_mock_driver
-            driver = create_mock_driver()
-        else:
-            chrome_options = ChromeOptions()
-            chrome_options.add_argument("--disable-gpu")
-            if headless == "YES":
-                chrome_options.add_argument("--headless")
-            driver = webdriver.Chrome(options=chrome_options)
-
-        # Determine the base URL based on whether we're using the mock server
-        base_url = "http://localhost:8000" if use_mock == "YES" else "https://eportem.es"
-        
+        with metrics.phase("driver_start"):
+            driver = create_driver()
+        navigate = True
+
+    if store is not None and uname:
+        with metrics.phase("session_restore"):
+            restored = restore_session(driver, store, uname, base_url)
+        if restored:
+            return driver
+
+    with metrics.phase("login"):
+        _log_in(driver, navigate, store, uname, pwd, base_url, use_mock)
+    return driver
+
+
+def _log_in(driver, navigate, store, uname, pwd, base_url, use_mock):
+    """Fill in and submit the login form, then wait for the dashboard"""
+    if navigate or store is not None or _is_blank(driver):
         try:
             # navigate to the login page
-            driver.get(f"{base_url}/Usuario/Login?ReturnUrl=%2faplicaciones")
+            with tracing.span("page_load", path=LOGIN_PATH):
+                driver.get(f"{base_url}{LOGIN_PATH}?ReturnUrl=%2faplicaciones")
         except Exception as e:
             if use_mock == "YES":
                 print(f"Mock driver warning: {e}")
@@ -45,14 +116,10 @@ def login_and_navigate(driver=None):
 
     try:
         # find the username and password fields within the login form
-        username = driver.find_element(By.NAME, "usuario")
-        password = driver.find_element(By.NAME, "password")
-
-        # Always use test credentials in mock mode
-        if use_mock == "YES":
-            uname = "test_user"
-            pwd = "test_password"
-            print("Using mock credentials: test_user / test_password")
+        with tracing.span("find_element", by=By.NAME, value="usuario"):
+            username = driver.find_element(By.NAME, "usuario")
+        with tracing.span("find_element", by=By.NAME, value="password"):
+            password = driver.find_element(By.NAME, "password")
 
         username.send_keys(uname)
         password.send_keys(pwd)
@@ -60,15 +127,20 @@ def login_and_navigate(driver=None):
         # submit the login form
         password.send_keys(Keys.RETURN)
 
-        # wait for the page to load
-        time.sleep(2)
+        # wait for the dashboard to load
+        wait_for_url_not_containing(driver, LOGIN_PATH)
+        wait_for_element(driver, By.ID, "buttonsRegBox", visible=False)
+
+        # Remember the session for the next action on this account
+        if store is not None and uname and LOGIN_PATH not in driver.current_url:
+            store.save(uname, driver.get_cookies())
     except Exception as e:
         if use_mock == "YES":
             print(f"Mock driver warning: {e}")
             print("Continuing with mock test...")
             # If using mock driver, try to navigate to the dashboard directly
             try:
-                driver.get(f"http://localhost:8000/aplicaciones")
+                driver.get(f"{base_url}{DASHBOARD_PATH}")
             except:
                 pass
         else:
@@ -76,8 +148,6 @@ def login_and_navigate(driver=None):
 
 #    print (driver.page_source)
 
-    return driver
-
 # example usage of the function
 if __name__ == '__main__':
     driver = login_and_navigate()
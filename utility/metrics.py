@@ -0,0 +1,227 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms with labels, kept in memory and rendered by
+REGISTRY.render() (served at /metrics by the web UI). Only this
+process is covered: actions run with ACTION_EXECUTION_MODE=subprocess
+record their phases in the child process.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from utility import tracing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; actions and logins take seconds, clicks and HTTP calls less
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+    @abstractmethod
+    def _samples(self, items) -> list:
+        """Sample lines for the sorted (label values, value) items"""
+        pass
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data["counts"][i] += 1
+                    break
+            data["sum"] += value
+            data["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block took, also when it raises"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            data = self._values.get(self._key(labels))
+            return data["count"] if data else 0
+
+    def _samples(self, items):
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data["counts"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(data['sum'])}"
+            yield f"{self.name}_count{labels} {data['count']}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Return all metrics in the text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+ACTION_PHASE_SECONDS = histogram(
+    "eportem_action_phase_seconds", "Time spent in each phase of an action", ("phase",))
+ACTION_SECONDS = histogram(
+    "eportem_action_seconds", "Time for a whole action, notifications included", ("action", "location"))
+ACTIONS_TOTAL = counter(
+    "eportem_actions_total", "Actions performed, by result", ("action", "location", "result"))
+NOTIFICATION_SECONDS = histogram(
+    "eportem_notification_seconds", "Time to send one notification, retries included", ("channel",))
+NOTIFICATIONS_TOTAL = counter(
+    "eportem_notifications_total", "Notifications sent, by result", ("channel", "result"))
+SCHEDULER_LAG_SECONDS = histogram(
+    "eportem_scheduler_lag_seconds", "Actual fire time minus scheduled time",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 30, 60))
+JOBS_TOTAL = counter(
+    "eportem_jobs_total", "Web UI jobs, by source and final status", ("source", "status"))
+JOB_WAIT_SECONDS = histogram(
+    "eportem_job_wait_seconds", "Time web UI jobs spent queued before a worker picked them up", ("source",))
+
+
+@contextmanager
+def phase(name, **attrs):
+    """
+    Time one phase of an action: `with metrics.phase("login"): ...`
+
+    Also a tracing span with the same name, yielded for extra attributes.
+    """
+    with tracing.span(name, **attrs) as span, ACTION_PHASE_SECONDS.time(phase=name):
+        yield span
+
+
+def record_notification(result):
+    NOTIFICATION_SECONDS.observe(result.elapsed, channel=result.channel)
+    NOTIFICATIONS_TOTAL.inc(channel=result.channel, result="success" if result.success else "failure")
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serve /metrics on its own port, for processes without the web UI (the scheduler service)"""
+    # http.server is imported here: every action imports this module, few serve it
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
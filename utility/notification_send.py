@@ -1,39 +1,155 @@
+import contextvars
 import os
+import threading
+import time
 import requests
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from utility import metrics, tracing
+
+# Defaults for the API base URLs; TELEGRAM_API_URL / SLACK_HOOKS_URL / SLACK_API_URL override them
+TELEGRAM_API_URL = "https://api.telegram.org"
+SLACK_HOOKS_URL = "https://hooks.slack.com/services"
+SLACK_API_URL = "https://slack.com/api"
+
+# Responses worth another attempt; other 4xx errors will not get better by retrying
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class NotificationResult:
+    """Outcome of sending one message on one channel"""
+
+    def __init__(self, channel, success, status_code=None, attempts=0, error=None, elapsed=0.0):
+        self.channel = channel
+        self.success = success
+        self.status_code = status_code
+        self.attempts = attempts
+        self.error = error
+        self.elapsed = elapsed
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        status = "ok" if self.success else f"failed: {self.error}"
+        return f"<NotificationResult {self.channel} {status} after {self.attempts} attempt(s)>"
+
 
 class NotificationChannel(ABC):
+    """
+    Base class for notification channels.
+
+    Subclasses implement send() and use _post() for HTTP calls. All
+    instances of a channel class share one pooled requests.Session, so
+    repeated notifications reuse the same TCP/TLS connections.
+    """
+    name = "channel"
+
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+
+    def __init__(self, timeout=None, retries=None, backoff=None):
+        self.timeout = float(timeout if timeout is not None else os.getenv('NOTIFY_TIMEOUT', '5'))
+        self.retries = int(retries if retries is not None else os.getenv('NOTIFY_RETRIES', '2'))
+        self.backoff = float(backoff if backoff is not None else os.getenv('NOTIFY_BACKOFF', '0.5'))
+
     @abstractmethod
     def send(self, message_text: str):
+        """Send the message and return a NotificationResult"""
         pass
 
+    @classmethod
+    def get_session(cls):
+        with cls._sessions_lock:
+            session = cls._sessions.get(cls)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls._sessions[cls] = session
+            return session
+
+    def _post(self, url, **kwargs):
+        """POST with timeout and exponential backoff, returning a NotificationResult"""
+        result = self._post_with_retries(url, **kwargs)
+        metrics.record_notification(result)
+        return result
+
+    def _post_with_retries(self, url, **kwargs):
+        session = self.get_session()
+        start = time.monotonic()
+        status_code = None
+        error = None
+        attempt = 0
+        for attempt in range(1, self.retries + 2):
+            delay = self.backoff * (2 ** (attempt - 1))
+            try:
+                response = session.post(url, timeout=self.timeout, **kwargs)
+                status_code = response.status_code
+                if response.ok and self._accepted(response):
+                    return NotificationResult(self.name, True, status_code, attempt,
+                                              elapsed=time.monotonic() - start)
+                error = f"HTTP {status_code}: {response.text[:200]}"
+                if status_code not in RETRY_STATUS:
+                    break
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = min(float(retry_after), 30.0)
+            except requests.RequestException as e:
+                error = str(e) or e.__class__.__name__
+            if attempt <= self.retries:
+                time.sleep(delay)
+        return NotificationResult(self.name, False, status_code, attempt, error, time.monotonic() - start)
+
+    def _accepted(self, response):
+        """Hook for APIs that report errors inside a 200 response"""
+        return True
+
+
 class TelegramChannel(NotificationChannel):
-    def __init__(self, token=None, chat_id=None):
+    name = "telegram"
+
+    def __init__(self, token=None, chat_id=None, base_url=None, **kwargs):
+        super().__init__(**kwargs)
         self.token = token or os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = chat_id or os.getenv('TELEGRAM_CHAT_ID')
+        self.base_url = (base_url or os.getenv('TELEGRAM_API_URL') or TELEGRAM_API_URL).rstrip("/")
 
     def send(self, message_text: str):
-        url = f'https://api.telegram.org/bot{self.token}/sendMessage'
+        url = f'{self.base_url}/bot{self.token}/sendMessage'
         data = {'chat_id': self.chat_id, 'text': message_text}
-        response = requests.post(url, data)
-        if response.status_code == 200:
-            print("Telegram notification sent successfully.")
-        else:
-            print(f"Telegram notification failed with status code {response.status_code}: {response.text}")
+        return self._post(url, data=data)
+
 
 class SlackChannel(NotificationChannel):
-    def __init__(self, webhook=None):
+    name = "slack"
+
+    def __init__(self, webhook=None, base_url=None, **kwargs):
+        super().__init__(**kwargs)
         self.webhook = webhook or os.getenv('SLACK_WEBHOOK')
+        self.base_url = (base_url or os.getenv('SLACK_HOOKS_URL') or SLACK_HOOKS_URL).rstrip("/")
 
     def send(self, message_text: str):
-        url = f'https://hooks.slack.com/services/{self.webhook}'
+        url = f'{self.base_url}/{self.webhook}'
         data = {'text': message_text}
-        response = requests.post(url, json=data)
-        if response.status_code == 200:
-            print("Slack notification sent successfully.")
-        else:
-            print(f"Slack notification failed with status code {response.status_code}: {response.text}")
+        return self._post(url, json=data)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv('NOTIFY_WORKERS', '8')),
+                                           thread_name_prefix="notify")
+        return _executor
+
 
 class NotificationManager:
     def __init__(self):
@@ -43,8 +159,38 @@ class NotificationManager:
         self.channels.append(channel)
 
     def notify(self, message_text: str):
-        for channel in self.channels:
-            channel.send(message_text)
+        """Send the message on all channels at once and return one NotificationResult per channel"""
+        with metrics.phase("notify"):
+            if len(self.channels) == 1:
+                return [self._send(self.channels[0], message_text)]
+            # Each task gets a copy of the context, so its span joins the current trace
+            futures = [_get_executor().submit(contextvars.copy_context().run, self._send, channel, message_text)
+                       for channel in self.channels]
+            return [future.result() for future in futures]
+
+    @classmethod
+    def _send(cls, channel, message_text):
+        name = getattr(channel, "name", channel.__class__.__name__)
+        with tracing.span("notification", channel=name) as span:
+            result = cls._send_one(channel, name, message_text)
+            span.set("success", result.success)
+            span.set("attempts", result.attempts)
+            if result.status_code is not None:
+                span.set("status_code", result.status_code)
+        return result
+
+    @staticmethod
+    def _send_one(channel, name, message_text):
+        start = time.monotonic()
+        try:
+            result = channel.send(message_text)
+        except Exception as e:
+            return NotificationResult(name, False, attempts=1, error=str(e), elapsed=time.monotonic() - start)
+        if isinstance(result, NotificationResult):
+            return result
+        # Channels that do not report a result are assumed to have worked
+        return NotificationResult(name, True, attempts=1, elapsed=time.monotonic() - start)
+
 
 if __name__ == '__main__':
     # Load environment variables from eportem/config/.env
@@ -57,4 +203,5 @@ if __name__ == '__main__':
     if os.getenv('SLACK_NOTIFY') == "YES":
         manager.register_channel(SlackChannel())
 
-    manager.notify("Hello from the notification manager!")
+    for result in manager.notify("Hello from the notification manager!"):
+        print(result)
@@ -0,0 +1,218 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_OUTBOX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", ".outbox.db")
+
+# Delivered events are kept this long so late duplicates are still recognised
+KEEP_DELIVERED = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedup_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    created REAL NOT NULL,
+    delivered REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+
+def deliver(channel, payloads):
+    """
+    Deliver a batch of payloads for one channel and return a NotificationResult.
+
+    Text messages for the same channel are sent as one message. For Slack
+    status updates only the newest one matters, so only that one is sent.
+    """
+    from utility.notification_send import TelegramChannel, SlackChannel
+    if channel in ("telegram", "slack"):
+        text = "\n".join(payload["text"] for payload in payloads)
+        target = TelegramChannel(retries=0) if channel == "telegram" else SlackChannel(retries=0)
+        return target.send(text)
+    if channel == "slack_status":
+        from utility.slack_status import SlackStatusUpdater
+        latest = payloads[-1]
+        return SlackStatusUpdater(retries=0).set_status(latest["text"], latest["emoji"], latest.get("expiration", 0))
+    raise ValueError(f"Unknown outbox channel: {channel}")
+
+
+class Outbox:
+    """
+    Persistent queue of notification and Slack status events (SQLite).
+
+    enqueue() only writes a row, so callers never wait on Telegram or
+    Slack. drain_once() delivers due events grouped per channel, retries
+    failures with exponential backoff and gives up after max_attempts.
+    Events with the same dedup_key are only ever queued once.
+    """
+
+    def __init__(self, path=None, max_attempts=None, base_delay=None, max_delay=3600, batch_size=20, deliver=deliver):
+        self.path = path or os.getenv('OUTBOX_PATH') or DEFAULT_OUTBOX_PATH
+        self.max_attempts = int(max_attempts or os.getenv('OUTBOX_MAX_ATTEMPTS', '20'))
+        self.base_delay = float(base_delay if base_delay is not None else os.getenv('OUTBOX_RETRY_DELAY', '5'))
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.deliver = deliver
+        self._drain_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, channel, payload, dedup_key=None):
+        """Queue an event; returns False if an event with the same dedup_key was already queued"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO outbox (channel, payload, dedup_key, next_attempt, created) VALUES (?, ?, ?, ?, ?)",
+                (channel, json.dumps(payload), dedup_key, now, now)
+            )
+            return cursor.rowcount == 1
+
+    def pending(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def next_due(self):
+        """Return the time of the next pending event, or None"""
+        with self._connect() as conn:
+            return conn.execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def drain_once(self, now=None):
+        """Deliver the events that are due; returns counts of delivered, failed and dead events"""
+        now = now or time.time()
+        stats = {"delivered": 0, "failed": 0, "dead": 0}
+        with self._drain_lock:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, channel, payload, attempts FROM outbox WHERE status = 'pending' AND next_attempt <= ? "
+                    "ORDER BY id LIMIT ?", (now, self.batch_size)
+                ).fetchall()
+            batches = {}
+            for row in rows:
+                batches.setdefault(row[1], []).append(row)
+
+            for channel, batch in batches.items():
+                ids = [row[0] for row in batch]
+                try:
+                    result = self.deliver(channel, [json.loads(row[2]) for row in batch])
+                    success, error = result.success, result.error
+                except Exception as e:
+                    success, error = False, str(e) or e.__class__.__name__
+                with self._connect() as conn:
+                    if success:
+                        conn.executemany("UPDATE outbox SET status = 'delivered', delivered = ?, attempts = attempts + 1 "
+                                         "WHERE id = ?", [(now, i) for i in ids])
+                        stats["delivered"] += len(ids)
+                        continue
+                    print(f"[Outbox] {channel} delivery failed: {error}")
+                    for row_id, _, _, attempts in batch:
+                        attempts += 1
+                        if attempts >= self.max_attempts:
+                            conn.execute("UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                                         (attempts, error, row_id))
+                            stats["dead"] += 1
+                        else:
+                            delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+                            conn.execute("UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                                         (attempts, now + delay, error, row_id))
+                            stats["failed"] += 1
+
+            with self._connect() as conn:
+                conn.execute("DELETE FROM outbox WHERE status = 'delivered' AND delivered < ?", (now - KEEP_DELIVERED,))
+        return stats
+
+
+class OutboxDrainer:
+    """Background thread that drains an Outbox whenever events are due"""
+
+    def __init__(self, outbox, idle_interval=60):
+        self.outbox = outbox
+        self.idle_interval = idle_interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._idle = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._idle.clear()
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def flush(self, timeout=10.0):
+        """Wait until nothing is due right now (failed events stay queued for later); returns True if so"""
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        self.wake()
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                self.outbox.drain_once()
+                next_due = self.outbox.next_due()
+            except Exception as e:
+                print(f"[Outbox] Drain error: {e}")
+                next_due = None
+            delay = self.idle_interval if next_due is None else max(0.0, next_due - time.time())
+            if delay > 0:
+                self._idle.set()
+                self._wake.wait(min(delay, self.idle_interval))
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_default_outbox():
+    """
+    Return the shared (Outbox, OutboxDrainer) when NOTIFY_OUTBOX=YES, else None.
+
+    The first call starts the drainer, which also delivers what earlier runs
+    left queued, so long-running processes call this at startup.
+    """
+    global _default
+    if os.getenv('NOTIFY_OUTBOX', 'NO') != 'YES':
+        return None
+    with _default_lock:
+        if _default is None:
+            outbox = Outbox()
+            drainer = OutboxDrainer(outbox)
+            drainer.start()
+            # Give queued messages a chance to go out before a one-shot CLI run exits
+            atexit.register(drainer.flush, float(os.getenv('OUTBOX_FLUSH_TIMEOUT', '10')))
+            _default = (outbox, drainer)
+        return _default
@@ -0,0 +1,36 @@
+import datetime
+
+# Map config.json task names to action types
+ACTION_TYPES = {
+    "start_the_day": "start_day",
+    "lunch_break": "lunch_break",
+    "after_lunch_break": "after_lunch",
+    "stop_the_day": "stop_day"
+}
+
+# Minutes either side of the scheduled time in which an action still runs
+DEFAULT_WINDOW = 15
+
+
+def get_day_schedule(schedule, now=None):
+    """Return the schedule entry for the weekday of `now` (config.json format), or None"""
+    now = now or datetime.datetime.now()
+    return schedule.get(str(now.weekday()))
+
+
+def find_due_action(day_schedule, now=None, window=DEFAULT_WINDOW):
+    """
+    Return the action type due at `now` for one day's schedule, or None.
+
+    An action is due when `now` is within `window` minutes of its time.
+    """
+    if not day_schedule:
+        return None
+    now = now or datetime.datetime.now()
+    for task, time_str in day_schedule.items():
+        if task not in ACTION_TYPES:  # Skip non-time entries
+            continue
+        task_hour, task_minute = map(int, time_str.split(":"))
+        if abs((now.hour * 60 + now.minute) - (task_hour * 60 + task_minute)) <= window:
+            return ACTION_TYPES[task]
+    return None
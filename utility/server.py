@@ -1,83 +1,239 @@
 #!/usr/bin/env python3
-import os
+"""
+Mock ePortem server for development, tests and load tests.
+
+Accounts log in with the form POST like on the real site and get their
+own session cookie. Each account has its own clock (stopped, working,
+paused); clock events that do not fit it are rejected with HTTP 409.
+Accepted events can be read back from /api/clock_log.
+
+Accounts: the test account (EPORTEM_USERNAME/EPORTEM_PASSWORD, default
+test_user/test_password), MOCK_USER_COUNT generated accounts
+(mock_user_N/mock_password_N) and the {username: password} JSON file in
+MOCK_USERS_FILE.
+
+Latency and faults follow a profile (see mock_server/faults.py): a name
+from PROFILES or a JSON file in MOCK_PROFILE, or one posted to
+/admin/profile while the server runs.
+"""
+import argparse
 import json
-from flask import Flask, request, render_template, redirect, url_for, jsonify, session
+import os
+import sys
+import time
+from flask import Flask, request, render_template, redirect, url_for, jsonify
 
-app = Flask(__name__, template_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'))
-app.secret_key = 'mock_server_secret_key'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server.clock import MockEportem, ClockError, InvalidTransition, STAMP_ACTIONS, PLACE_LOCATIONS
+from mock_server.faults import FaultProfile
+
+app = Flask(__name__, template_folder=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mock_server', 'templates'))
 
 # Default credentials for testing
 DEFAULT_USERNAME = 'test_user'
 DEFAULT_PASSWORD = 'test_password'
 
-# Store session data
-user_sessions = {}
+# Same cookie name as the real site (and MockWebDriver)
+SESSION_COOKIE = 'ASP.NET_SessionId'
+
+STATUS_LABELS = {"stopped": "Not Started", "working": "Working", "paused": "On Lunch Break"}
+
+
+def load_users():
+    """Accounts from MOCK_USERS_FILE; generated ones are added from MOCK_USER_COUNT"""
+    path = os.getenv('MOCK_USERS_FILE')
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+mock = MockEportem(users=load_users(), session_ttl=float(os.getenv('MOCK_SESSION_TTL', str(8 * 3600))))
+mock.add_generated_users(int(os.getenv('MOCK_USER_COUNT', '0')))
+profile = FaultProfile.load(os.getenv('MOCK_PROFILE')) if os.getenv('MOCK_PROFILE') else FaultProfile()
+
+# Flask endpoint -> profile endpoint name; admin and status routes are never slowed down
+FAULT_ENDPOINTS = {'login': 'login', 'dashboard': 'dashboard', 'handle_action': 'action', 'clock_log': 'clock_log'}
+
+
+def check_credentials(username, password):
+    # The test account follows the environment, so tests can change it at any time
+    expected = (os.getenv('EPORTEM_USERNAME', DEFAULT_USERNAME), os.getenv('EPORTEM_PASSWORD', DEFAULT_PASSWORD))
+    return (username, password) == expected or mock.authenticate(username, password)
+
+
+def current_user():
+    return mock.session_user(request.cookies.get(SESSION_COOKIE))
+
+
+@app.before_request
+def inject_faults():
+    """Apply the fault profile: expire the session, wait, then maybe fail instead of answering."""
+    endpoint = FAULT_ENDPOINTS.get(request.endpoint or '')
+    if endpoint is None:
+        return None
+    decision = profile.decide(endpoint)
+    if decision.expire_session:
+        mock.end_session(request.cookies.get(SESSION_COOKIE))
+    if decision.delay:
+        time.sleep(decision.delay)
+    if decision.timeout:
+        time.sleep(profile.timeout_seconds)
+        return jsonify({'status': 'error', 'message': 'Gateway timeout (injected)'}), 504
+    if decision.status:
+        return jsonify({'status': 'error', 'message': f'Injected HTTP {decision.status}'}), decision.status
+    return None
+
 
 @app.route('/Usuario/Login', methods=['GET', 'POST'])
 def login():
     """Mock login endpoint for ePortem."""
     if request.method == 'POST':
-        username = request.form.get('user')
+        # The real site names the field 'usuario'; older clients send 'user'
+        username = request.form.get('usuario') or request.form.get('user')
         password = request.form.get('password')
-        
-        # Check if credentials match expected values or env variables
-        expected_username = os.getenv('EPORTEM_USERNAME', DEFAULT_USERNAME)
-        expected_password = os.getenv('EPORTEM_PASSWORD', DEFAULT_PASSWORD)
-        
-        if username == expected_username and password == expected_password:
-            session['logged_in'] = True
-            session['username'] = username
-            return redirect(url_for('dashboard'))
+
+        if check_credentials(username, password):
+            target = request.args.get('ReturnUrl') or ''
+            response = redirect(target if target.startswith('/') else url_for('dashboard'))
+            response.set_cookie(SESSION_COOKIE, mock.create_session(username), httponly=True)
+            return response
         else:
             return render_template('login.html', error='Invalid credentials')
-    
+
     return render_template('login.html')
 
 @app.route('/aplicaciones', methods=['GET'])
 def dashboard():
     """Mock dashboard endpoint for ePortem."""
-    if not session.get('logged_in'):
-        return redirect(url_for('login'))
-    
-    return render_template('dashboard.html', username=session.get('username'))
+    username = current_user()
+    if not username:
+        return redirect(url_for('login', ReturnUrl='/aplicaciones'))
+
+    return render_template('dashboard.html', username=username, status=STATUS_LABELS[mock.state(username)],
+                           dropdown_delay_ms=int(profile.dropdown_delay_seconds() * 1000))
 
 @app.route('/api/action', methods=['POST'])
 def handle_action():
-    """API endpoint to handle actions (start day, lunch break, etc.)."""
-    if not session.get('logged_in'):
+    """API endpoint for clock events (start day, lunch break, etc.)."""
+    username = current_user()
+    if not username:
         return jsonify({'status': 'error', 'message': 'Not logged in'}), 401
-    
-    data = request.json
-    action_type = data.get('action_type')
-    location = data.get('location', 'office')
-    
-    # Log the action for testing verification
-    print(f"Action: {action_type}, Location: {location}")
-    
+
+    data = request.get_json(silent=True) or {}
+    action_type = data.get('action_type') or STAMP_ACTIONS.get(data.get('stamp', ''))
+    location = data.get('location') or PLACE_LOCATIONS.get(str(data.get('place')), 'office')
+
+    try:
+        entry = mock.clock(username, action_type, location)
+    except InvalidTransition as e:
+        return jsonify({'status': 'error', 'message': str(e), 'state': e.state}), 409
+    except ClockError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 422
+
     return jsonify({
         'status': 'success',
         'message': f"Action {action_type} performed successfully from {location}",
-        'timestamp': session.get('timestamp', '12:00:00')
+        'timestamp': entry['timestamp'],
+        'state': entry['to'],
+        'entry_id': entry['id'],
     })
 
+@app.route('/api/clock_log', methods=['GET'])
+def clock_log():
+    """Accepted clock events: ?user=<name> (default: everyone), ?since=<entry id>, ?limit=<n>"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'since and limit must be integers'}), 400
+    username = request.args.get('user')
+    entries = mock.clock_log(username, since=since, limit=limit)
+    if username:
+        return jsonify({'entries': entries, 'state': mock.state(username)})
+    return jsonify({'entries': entries, 'states': mock.states()})
+
+@app.route('/admin/reset', methods=['POST'])
+def admin_reset():
+    """Forget all sessions, clock states and the clock log (between test or benchmark runs)."""
+    mock.reset()
+    return jsonify({'status': 'success'})
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    GET the fault profile and what it injected so far. POST {"name": <PROFILES name>},
+    a whole profile, or {} for none; this also restarts its random generators.
+    """
+    global profile
+    if request.method == 'POST':
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object'}), 400
+        try:
+            profile = FaultProfile.load(data['name']) if 'name' in data else FaultProfile(data)
+        except (OSError, ValueError, TypeError) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(profile.to_dict())
+
+@app.route('/admin/expire_sessions', methods=['POST'])
+def admin_expire_sessions():
+    """Drop every live session (or only those of ?user=), as if the site had logged everyone out."""
+    return jsonify({'status': 'success', 'expired': mock.expire_sessions(request.args.get('user'))})
+
 @app.route('/reset', methods=['GET'])
 def reset_session():
-    """Reset the session state for testing."""
-    session.clear()
-    return redirect(url_for('login'))
+    """Log out of the current session."""
+    mock.end_session(request.cookies.get(SESSION_COOKIE))
+    response = redirect(url_for('login'))
+    response.delete_cookie(SESSION_COOKIE)
+    return response
 
 @app.route('/status', methods=['GET'])
 def server_status():
     """Check if mock server is running."""
-    return jsonify({
-        'status': 'running',
-        'version': '1.0.0',
-        'mode': 'mock'
-    })
+    return jsonify(dict(mock.stats(), status='running', version='1.1.0', mode='mock'))
+
+def serve(host='localhost', port=8000, threads=None):
+    """
+    Serve the mock for load tests: waitress if it is installed, otherwise
+    Werkzeug's threaded server. No debugger, no reloader.
+    """
+    threads = threads or int(os.getenv('MOCK_SERVER_THREADS', '16'))
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        from werkzeug.serving import make_server
+        print(f"[mock] waitress not installed, serving on port {port} with the threaded Werkzeug server")
+        make_server(host, port, app, threaded=True).serve_forever()
+    else:
+        print(f"[mock] Serving on port {port} with waitress ({threads} threads)")
+        waitress_serve(app, host=host, port=port, threads=threads)
 
-def start_mock_server(host='localhost', port=5000, debug=False):
+def start_mock_server(host='localhost', port=5000, debug=False, production=False, threads=None):
     """Start the mock server."""
-    app.run(host=host, port=port, debug=debug)
+    if production:
+        serve(host, port, threads)
+    else:
+        app.run(host=host, port=port, debug=debug, threaded=True)
 
 if __name__ == '__main__':
-    start_mock_server(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the mock ePortem server.")
+    parser.add_argument("--host", default="localhost", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--debug", action="store_true", help="Run the Flask debug server with the reloader")
+    parser.add_argument("--production", action="store_true",
+                        help="Serve with a production WSGI server (or set MOCK_SERVER_PRODUCTION=YES)")
+    parser.add_argument("--threads", type=int, help="Request threads in production mode (default MOCK_SERVER_THREADS or 16)")
+    parser.add_argument("--users", type=int, default=0, help="Generate this many extra accounts (mock_user_N/mock_password_N)")
+    parser.add_argument("--profile", help="Latency/fault profile: a name (none, bad_morning) or a JSON file")
+    parser.add_argument("--seed", type=int, help="Override the profile's random seed")
+    args = parser.parse_args()
+    mock.add_generated_users(args.users)
+    if args.profile or args.seed is not None:
+        config = FaultProfile.load(args.profile).config if args.profile else dict(profile.config)
+        if args.seed is not None:
+            config = dict(config, seed=args.seed)
+        profile = FaultProfile(config, name=args.profile or profile.name)
+    production = args.production or os.getenv('MOCK_SERVER_PRODUCTION', 'NO') == 'YES'
+    start_mock_server(args.host, args.port, args.debug, production, args.threads)
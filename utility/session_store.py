@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+DEFAULT_SESSION_PATH = Path(__file__).parent.parent / "config" / ".sessions.json"
+
+
+class SessionStore:
+    """
+    Persist post-login ePortem cookies per account so later actions can skip the login form.
+
+    Sessions expire after `ttl` seconds, or earlier when one of the saved
+    cookies has its own expiry in the past. Callers invalidate a session
+    when the site bounces them back to the login page.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = Path(path or os.getenv('SESSION_STORE_PATH') or DEFAULT_SESSION_PATH)
+        self.ttl = ttl if ttl is not None else int(os.getenv('SESSION_TTL_MINUTES', '480')) * 60
+        self._lock = threading.Lock()
+
+    def load(self, account):
+        """Return the saved cookies for an account, or None if there is no live session."""
+        with self._lock:
+            entry = self._read().get(account)
+        if not entry:
+            return None
+        now = time.time()
+        if now - entry.get("saved_at", 0) > self.ttl:
+            return None
+        cookies = entry.get("cookies") or []
+        if any(c.get("expiry") is not None and c["expiry"] <= now for c in cookies):
+            return None
+        return cookies
+
+    def save(self, account, cookies):
+        with self._lock:
+            data = self._read()
+            data[account] = {"saved_at": time.time(), "cookies": list(cookies)}
+            self._write(data)
+
+    def invalidate(self, account):
+        with self._lock:
+            data = self._read()
+            if data.pop(account, None) is not None:
+                self._write(data)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        # Write atomically and keep the file private: these cookies are credentials
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+_default_store = None
+
+
+def get_default_store():
+    """Return the shared store when SESSION_CACHE=YES, otherwise None."""
+    global _default_store
+    if os.getenv('SESSION_CACHE', 'NO') != 'YES':
+        return None
+    if _default_store is None:
+        _default_store = SessionStore()
+    return _default_store
@@ -1,12 +1,16 @@
 import os
-import requests
+from utility.notification_send import NotificationChannel, SLACK_API_URL
 
-class SlackStatusUpdater:
-    def __init__(self, token=None):
+class SlackStatusUpdater(NotificationChannel):
+    name = "slack_status"
+
+    def __init__(self, token=None, base_url=None, **kwargs):
+        super().__init__(**kwargs)
         # Use SLACK_WEBHOOK as the OAuth token for status updates
         self.token = token or os.getenv('SLACK_WEBHOOK')
         if not self.token:
             raise ValueError("Slack OAuth token not found in SLACK_WEBHOOK environment variable.")
+        self.base_url = (base_url or os.getenv('SLACK_API_URL') or SLACK_API_URL).rstrip("/")
 
     def set_status(self, text, emoji, expiration=0):
         """
@@ -16,8 +20,11 @@ class SlackStatusUpdater:
             text (str): The status text to display.
             emoji (str): The emoji to use for the status.
             expiration (int): Unix timestamp when the status should expire (0 = no expiration).
+
+        Returns:
+            NotificationResult: whether Slack accepted the update.
         """
-        url = "https://slack.com/api/users.profile.set"
+        url = f"{self.base_url}/users.profile.set"
         headers = {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
@@ -28,21 +35,22 @@ class SlackStatusUpdater:
             "status_expiration": expiration
         }
         data = {"profile": profile}
-        response = requests.post(url, json=data, headers=headers)
+        return self._post(url, json=data, headers=headers)
+
+    def send(self, message_text: str):
+        return self.set_status(message_text, ":speech_balloon:")
+
+    def _accepted(self, response):
+        # Slack answers 200 with {"ok": false, "error": ...} for API errors
         try:
-            resp_json = response.json()
-        except Exception:
-            resp_json = {}
-        if response.ok and resp_json.get("ok"):
-            print("Slack status updated successfully.")
-        else:
-            print(f"Failed to update Slack status: {response.text}")
+            return bool(response.json().get("ok"))
+        except ValueError:
+            return False
 
 if __name__ == "__main__":
     # When run directly, load environment and set a test status
     from dotenv import load_dotenv
-    import os
     env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "config", ".env")
     load_dotenv(env_path)
     updater = SlackStatusUpdater()
-    updater.set_status("Testing software", ":test_tube:")
+    print(updater.set_status("Testing software", ":test_tube:"))
@@ -0,0 +1,252 @@
+"""
+Lightweight span tracing for action runs.
+
+    with tracing.span("login", account=name) as span:
+        ...
+        span.set("restored", True)
+
+The outermost span of a thread (or of a task that copied the context)
+is the root of a trace. When the root ends, the whole trace goes to the
+registered exporters. Without exporters, span() does nothing, which is
+the default. Set TRACE_FILE to write every trace to a file, as JSON lines
+(TRACE_FORMAT=jsonl, the default) or as Chrome trace events
+(TRACE_FORMAT=chrome, open in chrome://tracing or Perfetto).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# The innermost open span of this thread or task; read with .get(None)
+_current = contextvars.ContextVar("eportem_span")
+_exporters = None
+_exporters_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "duration",
+                 "status", "error", "thread", "thread_id", "_t0")
+
+    def __init__(self, trace, parent_id, name, attrs):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+        self.thread = threading.current_thread().name
+        self.thread_id = threading.get_ident()
+        self._t0 = time.perf_counter()
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+    def end(self, error=None):
+        self.duration = time.perf_counter() - self._t0
+        if error is not None:
+            self.status = "error"
+            self.error = error
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "thread": self.thread,
+            "thread_id": self.thread_id,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        root = next((s for s in spans if s.parent_id is None), spans[0])
+        return {
+            "trace_id": self.trace_id,
+            "pid": os.getpid(),
+            "name": root.name,
+            "start": root.start,
+            "duration": root.duration,
+            "status": root.status,
+            "attrs": root.attrs,
+            "spans": [s.to_dict() for s in spans],
+        }
+
+
+def chrome_events(trace):
+    """Chrome trace-event ("X" complete events) for a trace dict"""
+    pid = trace.get("pid", os.getpid())
+    events = []
+    for s in trace["spans"]:
+        args = dict(s["attrs"], trace_id=trace["trace_id"], span_id=s["span_id"], thread=s["thread"])
+        if s["error"]:
+            args["error"] = s["error"]
+        events.append({"name": s["name"], "cat": "eportem", "ph": "X", "pid": pid, "tid": s["thread_id"],
+                       "ts": round(s["start"] * 1e6), "dur": round((s["duration"] or 0) * 1e6), "args": args})
+    return events
+
+
+class MemoryExporter:
+    """Keeps the last max_traces traces, e.g. for the web UI"""
+
+    def __init__(self, max_traces=20):
+        self._traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def traces(self, limit=None):
+        """Return the kept traces, newest first"""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        return traces[:limit] if limit else traces
+
+    def get(self, trace_id):
+        with self._lock:
+            return next((t for t in self._traces if t["trace_id"] == trace_id), None)
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per trace to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        line = json.dumps(trace, default=str) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+class ChromeTraceExporter:
+    """
+    Appends trace events to a Chrome trace file.
+
+    The file uses the JSON array format without the closing bracket,
+    which the trace viewers accept, so it can be appended to forever.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        events = "".join(json.dumps(event, default=str) + ",\n" for event in chrome_events(trace))
+        with self._lock, open(self.path, "a") as f:
+            if f.tell() == 0:
+                f.write("[\n")
+            f.write(events)
+
+
+def exporter_from_env():
+    """The file exporter configured by TRACE_FILE / TRACE_FORMAT, or None"""
+    path = os.getenv('TRACE_FILE')
+    if not path:
+        return None
+    if os.getenv('TRACE_FORMAT', 'jsonl').lower() == "chrome":
+        return ChromeTraceExporter(path)
+    return JsonLinesExporter(path)
+
+
+def _get_exporters():
+    global _exporters
+    if _exporters is None:
+        with _exporters_lock:
+            if _exporters is None:
+                exporter = exporter_from_env()
+                _exporters = [exporter] if exporter else []
+    return _exporters
+
+
+def add_exporter(exporter):
+    global _exporters
+    _get_exporters()
+    with _exporters_lock:
+        _exporters = (_exporters or []) + [exporter]
+    return exporter
+
+
+def remove_exporter(exporter):
+    global _exporters
+    _get_exporters()
+    with _exporters_lock:
+        _exporters = [e for e in _exporters or [] if e is not exporter]
+
+
+def current_span():
+    """The innermost open span, or a no-op span"""
+    return _current.get(None) or NOOP_SPAN
+
+
+def span(name, **attrs):
+    """Context manager timing a span; a no-op while no exporter is registered"""
+    if not _get_exporters() and _current.get(None) is None:
+        return _noop()
+    return _span(name, attrs)
+
+
+@contextmanager
+def _noop():
+    yield NOOP_SPAN
+
+
+@contextmanager
+def _span(name, attrs):
+    parent = _current.get(None)
+    trace = parent.trace if parent is not None else Trace()
+    current = Span(trace, parent.span_id if parent is not None else None, name, attrs)
+    token = _current.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        current.end(error)
+        _current.reset(token)
+        trace.add(current)
+        if parent is None:
+            _export(trace)
+
+
+def _export(trace):
+    data = trace.to_dict()
+    for exporter in _get_exporters():
+        try:
+            exporter.export(data)
+        except Exception as e:
+            print(f"[Tracing] Could not export trace: {e}")
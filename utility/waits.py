@@ -0,0 +1,114 @@
+import os
+import time
+
+from utility import tracing
+
+
+class WaitTimeoutError(TimeoutError):
+    """Raised when a wait condition is not met within its timeout."""
+    pass
+
+
+def get_wait_timeout():
+    """Seconds to wait for an element or page before giving up (ACTION_WAIT_TIMEOUT)."""
+    return float(os.getenv('ACTION_WAIT_TIMEOUT', '10'))
+
+
+def get_settle_timeout():
+    """Upper bound in seconds for waiting on the page to react to a click (ACTION_SETTLE_TIMEOUT)."""
+    return float(os.getenv('ACTION_SETTLE_TIMEOUT', '3'))
+
+
+def get_poll_interval():
+    """Seconds between condition checks (ACTION_WAIT_POLL)."""
+    return float(os.getenv('ACTION_WAIT_POLL', '0.1'))
+
+
+def wait_until(condition, timeout=None, poll=None, message="Condition not met"):
+    """
+    Call `condition()` until it returns a truthy value and return that value.
+
+    Exceptions raised by the condition (element not found, stale element...)
+    count as "not yet". Works with any driver, real or MockWebDriver, since
+    it only calls back into the condition.
+    """
+    timeout = get_wait_timeout() if timeout is None else timeout
+    poll = get_poll_interval() if poll is None else poll
+    deadline = time.monotonic() + timeout
+    last_error = None
+    while True:
+        try:
+            value = condition()
+            if value:
+                return value
+        except Exception as e:
+            last_error = e
+        if time.monotonic() >= deadline:
+            raise WaitTimeoutError(f"{message} after {timeout}s") from last_error
+        time.sleep(poll)
+
+
+def wait_for_element(driver, by, value, visible=True, timeout=None, poll=None):
+    """Wait until an element is present (and displayed, unless visible=False) and return it."""
+    with tracing.span("find_element", by=by, value=value) as span:
+        attempts = 0
+
+        def find():
+            nonlocal attempts
+            attempts += 1
+            element = driver.find_element(by, value)
+            if visible and not element.is_displayed():
+                return None
+            return element
+        try:
+            return wait_until(find, timeout, poll, message=f"Element {by}={value} not available")
+        finally:
+            span.set("attempts", attempts)
+
+
+def wait_for_url_not_containing(driver, fragment, timeout=None, poll=None):
+    """Wait until the browser has left any URL containing `fragment`."""
+    return wait_until(lambda: fragment not in driver.current_url or None, timeout, poll,
+                      message=f"Still on a page matching {fragment}")
+
+
+def wait_for_registration(driver, marker, clicked, timeout=None, poll=None):
+    """
+    Wait for the site to register a click, not just for the page to react to it.
+
+    `marker` is an element showing the registered state (the dashboard's
+    buttons box), found before the first click. Registration is any of: the
+    URL changes, the marker goes stale (the page was re-rendered), or its
+    text differs from before the click once `clicked` is hidden or gone. A
+    dropdown entry hides itself the moment it is clicked, before the
+    submission has landed, so that alone says nothing.
+
+    Returns True if registration was seen, False if the timeout passed
+    first. It never raises, since the site may not show anything.
+    """
+    timeout = get_settle_timeout() if timeout is None else timeout
+    try:
+        start_url = driver.current_url
+        start_text = marker.text
+    except Exception:
+        start_url = start_text = None
+
+    def registered():
+        try:
+            if driver.current_url != start_url:
+                return True
+            text = marker.text
+        except Exception:
+            # Stale marker: the page was re-rendered
+            return True
+        if text == start_text:
+            return False
+        try:
+            return not clicked.is_displayed()
+        except Exception:
+            return True
+
+    try:
+        return wait_until(registered, timeout, poll)
+    except WaitTimeoutError:
+        return False
@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import threading
+from collections import namedtuple
+
+# One parsed version of the .env file
+EnvSnapshot = namedtuple("EnvSnapshot", "path key text values schema_json config_error")
+
+
+def parse_env_text(text):
+    values = {}
+    for line in text.splitlines():
+        s = line.strip()
+        if not s or s.startswith("#") or "=" not in s:
+            continue
+        k, v = s.split("=", 1)
+        values[k.strip()] = v.strip()
+    return values
+
+
+class EnvSettings:
+    """
+    The parsed .env file, its rendered settings schema and the config
+    error, cached until the file changes.
+
+    Each call stats the file and compares (inode, mtime, size) with the
+    cached version, so edits by hand, by the settings page or by a file
+    replaced through a rename are picked up without re-reading the file
+    on every request. Schema patterns are compiled once.
+    """
+
+    def __init__(self, schema, required_keys):
+        self.schema = schema
+        self.required_keys = required_keys
+        self.patterns = {entry["key"]: re.compile(entry["pattern"]) for entry in schema if entry.get("pattern")}
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def load(self, path):
+        """Return the EnvSnapshot of path, re-reading it only if it changed"""
+        key = self._stat(path)
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.path != path or snapshot.key != key:
+                snapshot = self._snapshot = self._read(path, key)
+            return snapshot
+
+    def invalidate(self):
+        """Forget the cached file, e.g. after writing it"""
+        with self._lock:
+            self._snapshot = None
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read(self, path, key):
+        text = None
+        if key is not None:
+            try:
+                with open(path, "r") as f:
+                    text = f.read()
+            except OSError:
+                pass
+        values = parse_env_text(text or "")
+        schema_json = json.dumps({"success": True, "schema": self._render_schema(values)})
+        return EnvSnapshot(path, key, text, values, schema_json, self._config_error(text, values))
+
+    def _render_schema(self, env_vals):
+        schema = []
+        for entry in self.schema:
+            current_val = env_vals.get(entry["key"])
+            typ = entry["type"]
+            if typ == "toggle":
+                normalized = (current_val or "").upper()
+                value = normalized == "YES"
+            elif typ == "number":
+                try:
+                    value = int(current_val)
+                except Exception:
+                    value = ""
+            else:
+                value = current_val or ""
+            with_info = entry.copy()
+            with_info["value"] = value
+            schema.append(with_info)
+        return schema
+
+    def _config_error(self, text, vals):
+        # Check if .env file exists, and key fields are present/non-empty
+        if text is None:
+            return "Configuration file not found (.env missing)."
+        missing = [k for k in self.required_keys if not vals.get(k)]
+        if missing:
+            return f"Configuration incomplete. Missing required: {', '.join(missing)}"
+        if vals.get("EPORTEM_ENABLED", "").upper() != "YES":
+            return "EPORTEM_ENABLED is not set to YES."
+        return None
@@ -0,0 +1,216 @@
+import contextvars
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+FINISHED = ("succeeded", "failed")
+
+
+# The output buffer of the job running in the current context; worker threads
+# the job hands work to with a copied context (e.g. notifications) write to it too
+_job_output = contextvars.ContextVar("job_output")
+
+
+class _RoutedOutput(io.TextIOBase):
+    """
+    sys.stdout wrapper that copies what a job prints into that job's buffer.
+
+    It holds no state of its own: the buffer comes from the caller's context,
+    so concurrent jobs never see each other's output, prints from other
+    threads are never captured, and a re-wrap does not lose a running job's
+    buffer. Everything is still written to the wrapped stream, so the server
+    log is unchanged.
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, text):
+        buffer = _job_output.get(None)
+        if buffer is not None:
+            buffer.write(text)
+        return self.target.write(text)
+
+    def flush(self):
+        self.target.flush()
+
+
+_output_lock = threading.Lock()
+
+
+@contextmanager
+def _capture_output():
+    """Collect what the current job prints into a buffer"""
+    # Re-wrap if someone (e.g. pytest) swapped sys.stdout since the last job
+    with _output_lock:
+        if not isinstance(sys.stdout, _RoutedOutput):
+            sys.stdout = _RoutedOutput(sys.stdout)
+    buffer = io.StringIO()
+    token = _job_output.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _job_output.reset(token)
+
+
+class ActionExecutor:
+    """
+    Run ePortem actions on a worker pool and track them as jobs.
+
+    submit() returns a job id immediately. In "inprocess" mode (default)
+    actions run through EPortemAction in a worker thread, leasing browsers
+    from a shared DriverPool; "subprocess" mode keeps the old isolation of
+    running eportem_action.py in its own Python process.
+    """
+
+    def __init__(self, workers=None, mode=None, max_history=None):
+        self.workers = max(1, int(workers or os.getenv('ACTION_WORKERS', '2')))
+        self.mode = mode or os.getenv('ACTION_EXECUTION_MODE', 'inprocess')
+        if self.mode not in ("inprocess", "subprocess"):
+            raise ValueError(f"Unknown ACTION_EXECUTION_MODE: {self.mode}")
+        self.max_history = max(1, int(max_history or os.getenv('JOB_HISTORY', '100')))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="action")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._pool = None
+
+    def add_listener(self, callback):
+        """Call callback(job) with a copy of the job record whenever a job changes state"""
+        self._listeners.append(callback)
+
+    def submit(self, action, location, telegram=None, slack=None, slack_status=None, source="manual"):
+        """Queue an action and return its job id"""
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "action": action,
+            "location": location,
+            "source": source,
+            "flags": {"telegram": telegram, "slack": slack, "slack_status": slack_status},
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "output": "",
+            "error": None,
+            "wait": None,
+            "duration": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._prune()
+        self._changed(job)
+        self._executor.submit(self._run, job)
+        return job["id"]
+
+    def get(self, job_id):
+        """Return a copy of the job record, or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self, limit=None):
+        """Return copies of the known jobs, newest first"""
+        with self._lock:
+            jobs = [dict(job) for job in reversed(self._jobs.values())]
+        return jobs[:limit] if limit else jobs
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finished (or timeout) and return its record"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.05)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond max_history
+        excess = len(self._jobs) - self.max_history
+        for job_id in [j for j, job in self._jobs.items() if job["status"] in FINISHED][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _update(self, job, **changes):
+        with self._lock:
+            job.update(changes)
+            if job["status"] in FINISHED:
+                self._prune()
+        self._changed(job)
+
+    def _changed(self, job):
+        snapshot = dict(job)
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"[Jobs] Listener error: {e}")
+
+    def _run(self, job):
+        started = time.time()
+        self._update(job, status="running", started_at=started, wait=round(started - job["submitted_at"], 3))
+        if self.mode == "subprocess":
+            success, output, error = self._run_subprocess(job)
+        else:
+            success, output, error = self._run_inprocess(job)
+        finished = time.time()
+        self._update(
+            job,
+            status="succeeded" if success else "failed",
+            finished_at=finished,
+            duration=round(finished - started, 3),
+            output=output.strip(),
+            error=error,
+        )
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                from utility.driver_pool import DriverPool
+                self._pool = DriverPool(max_size=self.workers)
+            return self._pool
+
+    def _run_inprocess(self, job):
+        if ROOT_DIR not in sys.path:
+            sys.path.insert(0, ROOT_DIR)
+        with _capture_output() as buffer:
+            try:
+                from eportem_action import EPortemAction
+                action = EPortemAction(job["action"], job["location"], pool=self._get_pool(), **job["flags"])
+                action.perform()
+                return True, buffer.getvalue(), None
+            except (Exception, SystemExit) as e:
+                # check_env_variable() exits when EPORTEM_ENABLED is not YES
+                error = str(e) or e.__class__.__name__
+                print(f"Error running {job['action']}: {error}")
+                return False, buffer.getvalue(), error
+
+    def _run_subprocess(self, job):
+        env = os.environ.copy()
+        for key, env_key in (("telegram", "TELEGRAM_NOTIFY"), ("slack", "SLACK_NOTIFY"), ("slack_status", "SLACK_STATUS")):
+            if job["flags"][key] is not None:
+                env[env_key] = "YES" if job["flags"][key] else "NO"
+        script_path = os.path.join(ROOT_DIR, 'eportem_action.py')
+        result = subprocess.run(
+            [sys.executable, script_path, job["action"], "--location", job["location"]],
+            capture_output=True, text=True, env=env
+        )
+        if result.returncode == 0:
+            return True, result.stdout, None
+        return False, result.stdout, result.stderr.strip() or f"Exit code {result.returncode}"
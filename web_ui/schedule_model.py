@@ -0,0 +1,141 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from web_ui.scheduler import DAYS, parse_time
+
+
+class ScheduleModel:
+    """
+    The web UI schedule, indexed for lookups.
+
+    Rows are kept in an id -> row dict. Enabled rows also sit in a sorted
+    (minute of day, id) timeline per weekday; rows without a day are in
+    every weekday's timeline. Edits must go through add/update/remove so
+    the timelines stay in sync, and then next_action() is a bisect per
+    day instead of a sort of the whole schedule.
+
+    Every edit (and touch()) bumps `version`, or sets it to what
+    `version_source()` returns when one is given (the web UI passes the
+    state store's version, so edits must come after their write). The
+    version of each row's last change and of recent removals is
+    remembered, so changes_since() can answer delta requests.
+    """
+
+    def __init__(self, rows=(), version=0, max_tombstones=1000, version_source=None):
+        self._rows = {}
+        self._timelines = [[] for _ in DAYS]
+        self._changed = {}
+        self._removed = {}
+        self.max_tombstones = max_tombstones
+        self.version = version
+        self._version_source = None
+        for row in rows:
+            self.add(row)
+        # The initial rows are part of the starting version
+        self.version = version
+        self._changed = {}
+        # Oldest version changes_since() can answer from
+        self._floor = version
+        self._version_source = version_source
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, row_id):
+        return row_id in self._rows
+
+    def get(self, row_id):
+        return self._rows.get(row_id)
+
+    def rows(self):
+        """Return all rows in insertion order"""
+        return list(self._rows.values())
+
+    def max_id(self):
+        return max(self._rows, default=0)
+
+    def touch(self):
+        """Bump the version for a change outside the rows (e.g. settings)"""
+        self.version = self._version_source() if self._version_source else self.version + 1
+        return self.version
+
+    def add(self, row):
+        if row["id"] in self._rows:
+            raise ValueError(f"Duplicate schedule row id {row['id']}")
+        self._rows[row["id"]] = row
+        self._index(row)
+        self._removed.pop(row["id"], None)
+        self._changed[row["id"]] = self.touch()
+        return row
+
+    def update(self, row_id, **changes):
+        """Apply changes to a row and return it, or None if there is no such row"""
+        row = self._rows.get(row_id)
+        if row is None:
+            return None
+        self._unindex(row)
+        row.update(changes)
+        self._index(row)
+        self._changed[row_id] = self.touch()
+        return row
+
+    def remove(self, row_id):
+        row = self._rows.pop(row_id, None)
+        if row is not None:
+            self._unindex(row)
+            self._changed.pop(row_id, None)
+            self._removed[row_id] = self.touch()
+            if len(self._removed) > self.max_tombstones:
+                # Forget the oldest removal; older versions now need a full resync
+                oldest = next(iter(self._removed))
+                self._floor = max(self._floor, self._removed.pop(oldest))
+        return row
+
+    def changes_since(self, since):
+        """
+        Return (changed rows, removed ids) after version `since`.
+
+        Returns None when `since` is too old (or from another server run)
+        and the client has to reload the full schedule.
+        """
+        if since < self._floor or since > self.version:
+            return None
+        changed = [self._rows[row_id] for row_id, version in self._changed.items() if version > since]
+        removed = [row_id for row_id, version in self._removed.items() if version > since]
+        return changed, removed
+
+    def next_action(self, now=None):
+        """Return (datetime, row) of the next enabled row at or after now, or None"""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute + (1 if now.second or now.microsecond else 0)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(8):
+            timeline = self._timelines[(now.weekday() + offset) % 7]
+            i = bisect_left(timeline, (minute,)) if offset == 0 else 0
+            if i < len(timeline):
+                minutes, row_id = timeline[i]
+                return midnight + timedelta(days=offset, minutes=minutes), self._rows[row_id]
+        return None
+
+    def _entries(self, row):
+        """Timeline entries (weekday, (minute, id)) of a row; none for disabled or unparseable rows"""
+        if not row.get("enabled"):
+            return []
+        try:
+            hour, minute = parse_time(row.get("time", ""))
+        except (ValueError, AttributeError):
+            return []
+        day = row.get("day")
+        days = [DAYS.index(day)] if day in DAYS else range(7)
+        return [(d, (hour * 60 + minute, row["id"])) for d in days]
+
+    def _index(self, row):
+        for day, entry in self._entries(row):
+            insort(self._timelines[day], entry)
+
+    def _unindex(self, row):
+        for day, entry in self._entries(row):
+            timeline = self._timelines[day]
+            i = bisect_left(timeline, entry)
+            if i < len(timeline) and timeline[i] == entry:
+                del timeline[i]
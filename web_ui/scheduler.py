@@ -0,0 +1,148 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+from utility import metrics
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# A row is still fired if we wake up at most this late (e.g. after a slow action)
+MISFIRE_GRACE = timedelta(seconds=60)
+
+# Upper bound for one sleep, so suspend/resume or wall clock changes are noticed
+MAX_SLEEP = 600
+
+
+def parse_time(tstr):
+    """Parse "9:00" / "09:00" into (hour, minute)"""
+    parts = tstr.strip().split(':')
+    return int(parts[0]), int(parts[1]) if len(parts) > 1 else 0
+
+
+def next_occurrence(row, now):
+    """
+    Return the first datetime >= now at which a schedule row is due.
+
+    Rows without a "day" run every day. Returns None for unparseable rows.
+    """
+    try:
+        hour, minute = parse_time(row.get("time", ""))
+        candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    except (ValueError, TypeError):
+        return None
+    day = row.get("day")
+    wanted = DAYS.index(day) if day in DAYS else None
+    for _ in range(8):
+        if candidate >= now and (wanted is None or candidate.weekday() == wanted):
+            return candidate
+        candidate += timedelta(days=1)
+    return None
+
+
+class Scheduler:
+    """
+    Fire schedule rows exactly when they are due.
+
+    Enabled rows are kept in a heap ordered by their next occurrence. The
+    scheduler thread sleeps until the top of the heap is due and does no
+    work in between. Call wake() whenever the schedule changes so the
+    heap is rebuilt and the sleep is recomputed.
+    """
+
+    def __init__(self, get_rows, fire, clock=datetime.now):
+        self._get_rows = get_rows
+        self._fire = fire
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._heap = []
+        # row id -> the last occurrence fired (or missed), so a rebuild never brings it back
+        self._done = {}
+        self._dirty = True
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def wake(self):
+        """Tell the scheduler the schedule changed"""
+        with self._cond:
+            self._dirty = True
+            self._cond.notify_all()
+
+    def next_due(self):
+        """Return (datetime, row) for the next row to fire, or None"""
+        with self._cond:
+            if self._dirty:
+                self._rebuild(self._clock())
+            if not self._heap:
+                return None
+            due, _, row = self._heap[0]
+            return due, row
+
+    def _rebuild(self, now):
+        heap = []
+        for row in self._get_rows():
+            if not row.get("enabled"):
+                continue
+            # A row that came due within the grace period is kept, like in _take_due
+            due = next_occurrence(row, now - MISFIRE_GRACE)
+            done = self._done.get(row["id"])
+            if due is not None and done is not None and due <= done:
+                due = next_occurrence(row, done + timedelta(minutes=1))
+            if due is not None:
+                heap.append((due, row["id"], row))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._dirty = False
+
+    def _take_due(self):
+        """Block until rows are due and return them, or None once stopped"""
+        with self._cond:
+            while not self._stopped:
+                now = self._clock()
+                if self._dirty:
+                    self._rebuild(now)
+                if not self._heap:
+                    self._cond.wait(MAX_SLEEP)
+                    continue
+                delay = (self._heap[0][0] - now).total_seconds()
+                if delay > 0:
+                    self._cond.wait(min(delay, MAX_SLEEP))
+                    continue
+                due_rows = []
+                while self._heap and self._heap[0][0] <= now:
+                    due, row_id, row = heapq.heappop(self._heap)
+                    self._done[row_id] = due
+                    if now - due <= MISFIRE_GRACE:
+                        due_rows.append((due, row))
+                    else:
+                        print(f"[Scheduler] Missed {row.get('action')} due at {due:%Y-%m-%d %H:%M}")
+                    following = next_occurrence(row, due + timedelta(minutes=1))
+                    if following is not None:
+                        heapq.heappush(self._heap, (following, row_id, row))
+                return due_rows
+            return None
+
+    def _run(self):
+        while True:
+            due_rows = self._take_due()
+            if due_rows is None:
+                return
+            for due, row in due_rows:
+                metrics.SCHEDULER_LAG_SECONDS.observe(max(0.0, (self._clock() - due).total_seconds()))
+                try:
+                    self._fire(row, due)
+                except Exception as e:
+                    print(f"[Scheduler] Error firing {row.get('action')}: {e}")
@@ -0,0 +1,47 @@
+"""
+Runs the web UI scheduler on its own, for when the web UI is served by
+several worker processes with WEB_UI_SCHEDULER=external. Run exactly one.
+
+Schedule and settings changes made through the web UI reach it through
+the state store; it checks for them every SCHEDULER_SYNC_INTERVAL
+seconds (default 2). Actions it runs show up in the web UI's job list
+and last action result. Set SCHEDULER_METRICS_PORT to serve its own
+/metrics.
+"""
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from web_ui import server
+from utility import metrics
+
+
+def main():
+    interval = float(os.getenv("SCHEDULER_SYNC_INTERVAL", "2"))
+    # docker stop sends SIGTERM; let running actions finish
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    metrics_port = os.getenv("SCHEDULER_METRICS_PORT")
+    if metrics_port:
+        # The web UI's /metrics only covers its own process
+        metrics.start_http_server(int(metrics_port))
+        print(f"[Scheduler] Serving /metrics on port {metrics_port}")
+    server.start_outbox()
+    server.start_scheduler()
+    print(f"[Scheduler] Running with state from {server.store.path}")
+    try:
+        while True:
+            time.sleep(interval)
+            # Wakes the scheduler when the schedule changed
+            if server.sync_state():
+                print("[Scheduler] Reloaded the schedule")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.scheduler.stop()
+        server.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
 import os
+import sys
 import threading
 import time
+import zlib
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 from dotenv import load_dotenv
 import json
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from web_ui.scheduler import Scheduler, DAYS
+from web_ui.jobs import ActionExecutor
+from web_ui.state_store import StateStore
+from web_ui.schedule_model import ScheduleModel
+from web_ui.env_settings import EnvSettings
+from utility import metrics, tracing
+
 # Load environment variables from config/.env if present
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'config', '.env'))
 
@@ -20,13 +30,6 @@ PORT = int(os.getenv("WEB_UI_PORT", 8010))
 
 WEB_UI_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'web_ui_config.json')
 
-def save_state():
-    try:
-        with open(WEB_UI_CONFIG_PATH, 'w') as f:
-            json.dump(state, f, indent=2)
-    except Exception as e:
-        print(f"Could not save web UI config: {e}")
-
 def load_state():
     print(f"Checking for persistent web UI config at: {WEB_UI_CONFIG_PATH}")
     if os.path.exists(WEB_UI_CONFIG_PATH):
@@ -76,130 +79,329 @@ def load_schedule_from_config():
         print(f"Could not load schedule from config: {e}")
         return [], 1
 
-# Load persistent state if present, otherwise initialize
-loaded_state = load_state()
-if loaded_state:
-    print("Initializing state from web_ui_config.json")
-    state = loaded_state
-    _next_id = max([row["id"] for row in state.get("schedule", [])], default=0) + 1
-else:
-    print("Initializing state from config/config.json or default schedule")
-    schedule_init, _next_id = load_schedule_from_config()
-    state = {
-        "updates_enabled": True,
-        "location": "home",  # or "office"
-        "telegram_enabled": True,
-        "slack_enabled": True,
-        "slack_status_enabled": True,
-        "schedule": schedule_init if schedule_init else [
-            {"id": 1, "time": "09:00", "action": "start_day", "enabled": True},
-            {"id": 2, "time": "12:00", "action": "lunch_break", "enabled": True},
-            {"id": 3, "time": "13:00", "action": "after_lunch", "enabled": True},
-            {"id": 4, "time": "18:00", "action": "stop_day", "enabled": True},
-        ]
-    }
-    print(f"Initialized state: {state}")
+# State lives in SQLite; the first start imports web_ui_config.json or config/config.json
+store = StateStore()
+# Guards the in-memory state; every mutation updates it and its store rows together
+state_lock = threading.RLock()
+
+if store.is_empty():
+    loaded_state = load_state()
+    if loaded_state:
+        print("Initializing state from web_ui_config.json")
+        initial_state = loaded_state
+    else:
+        print("Initializing state from config/config.json or default schedule")
+        schedule_init, _ = load_schedule_from_config()
+        initial_state = {
+            "updates_enabled": True,
+            "location": "home",  # or "office"
+            "telegram_enabled": True,
+            "slack_enabled": True,
+            "slack_status_enabled": True,
+            "schedule": schedule_init if schedule_init else [
+                {"id": 1, "time": "09:00", "action": "start_day", "enabled": True},
+                {"id": 2, "time": "12:00", "action": "lunch_break", "enabled": True},
+                {"id": 3, "time": "13:00", "action": "after_lunch", "enabled": True},
+                {"id": 4, "time": "18:00", "action": "stop_day", "enabled": True},
+            ]
+        }
+    store.import_state(initial_state)
+state = store.load()
+# Schedule rows by id, with sorted per-day timelines for the next-action lookup. Its version is the
+# store's, which all processes share and which survives restarts; edits follow their store write
+schedule_model = ScheduleModel(state.pop("schedule"), version=store.seen_version(), version_source=store.seen_version)
+print(f"Initialized state with {len(schedule_model)} schedule rows from {store.path}")
+
+def sync_state():
+    """
+    Reload the state if another process (a web worker or the scheduler
+    service) wrote to the store. Returns True if it did.
+    """
+    global schedule_model
+    with state_lock:
+        if not store.changed_elsewhere():
+            return False
+        fresh = store.load()
+        status = state.get("_scheduler_status")
+        state.clear()
+        state.update(fresh)
+        if status is not None:
+            status["last_action_result"] = store.get_meta("last_action_result")
+            state["_scheduler_status"] = status
+        # A new model at the loaded version; clients behind it get a full reload
+        schedule_model = ScheduleModel(state.pop("schedule"), version=store.seen_version(),
+                                       version_source=store.seen_version)
+    scheduler.wake()
+    return True
+
+@app.before_request
+def refresh_state():
+    sync_state()
 
 @app.route("/")
 def index():
     # Pass config error status and year to template
-    return render_template("index.html", config_error=CONFIG_ERROR, page_title="ePortem Web UI", year=datetime.datetime.now().year)
+    return render_template("index.html", config_error=validate_basic_config(), page_title="ePortem Web UI", year=datetime.datetime.now().year)
 
 @app.route("/settings")
 def settings():
    # Render a dedicated settings page, reusing schema/config error
-   return render_template("settings.html", config_error=CONFIG_ERROR, page_title="Settings", year=datetime.datetime.now().year)
+   return render_template("settings.html", config_error=validate_basic_config(), page_title="Settings", year=datetime.datetime.now().year)
+
+def versioned_response(make_payload, *extra):
+    # Weak ETag from the store version plus what the payload has outside the store (`extra`);
+    # a matching If-None-Match gets a 304 without building the payload
+    with state_lock:
+        etag = f"{schedule_model.version}-{zlib.crc32(json.dumps(extra).encode()):08x}"
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify(make_payload())
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.route("/api/state", methods=["GET"])
 def get_state():
-    print(f"API /api/state returning schedule: {state.get('schedule')}")
-    # Also return config error status to UI
-    return jsonify({**state, "config_error": CONFIG_ERROR})
+    # Also return config error status to UI; neither it nor the upcoming action is in the store
+    config_error = validate_basic_config()
+    update_upcoming_action()
+    return versioned_response(lambda: {
+        **state,
+        "schedule": schedule_model.rows(),
+        "version": schedule_model.version,
+        "config_error": config_error,
+    }, config_error, state["_scheduler_status"]["upcoming_action"])
 
 @app.route("/api/toggle", methods=["POST"])
 def toggle():
     data = request.json
     key = data.get("key")
     value = data.get("value")
-    if key in state:
-        state[key] = value
-        save_state()
+    if key in state and key != "schedule" and not key.startswith("_"):
+        with state_lock:
+            state[key] = value
+            store.set_setting(key, value)
+            schedule_model.touch()
+        scheduler.wake()
         return jsonify({"success": True, "state": state})
     return jsonify({"success": False, "error": "Invalid key"}), 400
 
 @app.route("/api/schedule", methods=["GET"])
 def get_schedule():
-    print(f"API /api/schedule returning: {state.get('schedule')}")
-    return jsonify(state["schedule"])
+    since = request.args.get("since", type=int)
+    if since is None:
+        return versioned_response(schedule_model.rows)
+
+    def delta():
+        # Only the rows changed or removed after `since`; a full list if that is too old
+        changes = schedule_model.changes_since(since)
+        if changes is None:
+            return {"version": schedule_model.version, "full": True, "rows": schedule_model.rows()}
+        changed, removed = changes
+        return {"version": schedule_model.version, "full": False, "changed": changed, "removed": removed}
+    return versioned_response(delta)
 
 @app.route("/api/schedule/toggle", methods=["POST"])
 def toggle_schedule_row():
     row_id = request.json.get("id")
-    for row in state["schedule"]:
-        if row["id"] == row_id:
-            row["enabled"] = not row["enabled"]
-            save_state()
-            return jsonify({"success": True, "row": row})
-    return jsonify({"success": False, "error": "Row not found"}), 404
+    with state_lock:
+        # The store flips the flag itself, so a toggle from another process is never undone
+        row = store.toggle_row(row_id) if is_row_id(row_id) else None
+        if row is None:
+            return jsonify({"success": False, "error": "Row not found"}), 404
+        # If another process wrote in between, reloading picks up this edit too
+        if not sync_state():
+            schedule_model.update(row_id, enabled=row["enabled"])
+    scheduler.wake()
+    return jsonify({"success": True, "row": row})
 
 @app.route("/api/schedule/add", methods=["POST"])
 def add_schedule_row():
-    global _next_id
     time_val = request.json.get("time")
     action = request.json.get("action")
     days = request.json.get("days")
     location = request.json.get("location", "office")
     if not time_val or not action or not days or not isinstance(days, list) or not days:
         return jsonify({"success": False, "error": "Missing time, action, or days"}), 400
-    rows = []
+    error = schedule_field_error({"time": time_val, "action": action, "location": location})
     for day in days:
-        row = {"id": _next_id, "time": time_val, "action": action, "enabled": True, "day": day, "location": location}
-        state["schedule"].append(row)
-        rows.append(row)
-        _next_id += 1
-    save_state()
+        error = error or schedule_field_error({"day": day})
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    with state_lock:
+        # Ids are given out by the store inside the transaction, so workers cannot hand out the same one
+        with store.transaction() as conn:
+            rows = [store.add_row({"time": time_val, "action": action, "enabled": True, "day": day,
+                                   "location": location}, conn) for day in days]
+        if not sync_state():
+            for row in rows:
+                schedule_model.add(row)
+    scheduler.wake()
     return jsonify({"success": True, "rows": rows})
 
 @app.route("/api/schedule/remove", methods=["POST"])
 def remove_schedule_row():
     row_id = request.json.get("id")
-    before = len(state["schedule"])
-    state["schedule"] = [row for row in state["schedule"] if row["id"] != row_id]
-    after = len(state["schedule"])
-    save_state()
-    return jsonify({"success": before != after})
+    with state_lock:
+        removed = is_row_id(row_id) and store.delete_row(row_id)
+        if removed and not sync_state():
+            schedule_model.remove(row_id)
+    scheduler.wake()
+    return jsonify({"success": removed})
 
 @app.route("/api/schedule/update_location", methods=["POST"])
 def update_location():
     row_id = request.json.get("id")
     location = request.json.get("location")
-    updated = False
-    for row in state["schedule"]:
-        if row["id"] == row_id:
-            row["location"] = location
-            updated = True
-            break
-    if updated:
-        save_state()
-        return jsonify({"success": True, "id": row_id, "location": location})
-    return jsonify({"success": False, "error": "Row not found"}), 404
+    error = schedule_field_error({"location": location})
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    with state_lock:
+        row = store.update_row(row_id, {"location": location}) if is_row_id(row_id) else None
+        if row is None:
+            return jsonify({"success": False, "error": "Row not found"}), 404
+        if not sync_state():
+            schedule_model.update(row_id, location=location)
+    scheduler.wake()
+    return jsonify({"success": True, "id": row_id, "location": location})
 
 @app.route("/api/schedule/update_time", methods=["POST"])
 def update_time():
     row_id = request.json.get("id")
     time_val = request.json.get("time")
-    updated = False
-    for row in state["schedule"]:
-        if row["id"] == row_id:
-            row["time"] = time_val
-            updated = True
-            break
-    if updated:
-        save_state()
-        return jsonify({"success": True, "id": row_id, "time": time_val})
-    return jsonify({"success": False, "error": "Row not found"}), 404
-
-import subprocess
+    error = schedule_field_error({"time": time_val})
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    with state_lock:
+        row = store.update_row(row_id, {"time": time_val}) if is_row_id(row_id) else None
+        if row is None:
+            return jsonify({"success": False, "error": "Row not found"}), 404
+        if not sync_state():
+            schedule_model.update(row_id, time=time_val)
+    scheduler.wake()
+    return jsonify({"success": True, "id": row_id, "time": time_val})
+
+SCHEDULE_BATCH_LIMIT = 5000
+TIME_RE = r"^([01]?\d|2[0-3]):[0-5]\d$"
+
+def is_row_id(value):
+    # Row ids are ints; anything else (a list, a dict, true) cannot name a row
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def schedule_field_error(fields):
+    # Validate the row fields that may be set through the batch endpoint
+    if "time" in fields and not (isinstance(fields["time"], str) and re.match(TIME_RE, fields["time"])):
+        return f"Invalid time: {fields['time']!r}"
+    if "action" in fields and fields["action"] not in ACTIONS:
+        return f"Invalid action: {fields['action']!r}"
+    if "location" in fields and fields["location"] not in LOCATIONS:
+        return f"Invalid location: {fields['location']!r}"
+    if "day" in fields and fields["day"] not in DAYS:
+        return f"Invalid day: {fields['day']!r}"
+    if "enabled" in fields and not isinstance(fields["enabled"], bool):
+        return "enabled must be true or false"
+    return None
+
+def plan_schedule_batch(operations):
+    """
+    Validate a list of batch operations and turn them into a plan.
+
+    Returns (plan, errors). The plan is a list of ("add", fields),
+    ("update", id, changes), ("toggle", id, {}) and ("remove", id) steps;
+    nothing is changed here. Added rows get their ids from the store.
+    """
+    plan, errors = [], []
+    removed = set()
+    for index, op in enumerate(operations):
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind == "add":
+            days = op.get("days") or ([op["day"]] if op.get("day") else [])
+            fields = {"time": op.get("time"), "action": op.get("action"), "location": op.get("location", "office"),
+                      "enabled": op.get("enabled", True)}
+            error = schedule_field_error(fields) or (None if days else "Missing days")
+            for day in days:
+                error = error or schedule_field_error({"day": day})
+            if error:
+                errors.append({"index": index, "error": error})
+                continue
+            for day in days:
+                plan.append(("add", dict(fields, day=day)))
+            continue
+        row_id = op.get("id") if isinstance(op, dict) else None
+        if kind not in ("update", "toggle", "remove"):
+            errors.append({"index": index, "error": f"Unknown op: {kind!r}"})
+        elif not is_row_id(row_id) or row_id not in schedule_model or row_id in removed:
+            errors.append({"index": index, "error": f"Row not found: {row_id!r}"})
+        elif kind == "remove":
+            removed.add(row_id)
+            plan.append(("remove", row_id))
+        elif kind == "toggle":
+            plan.append(("toggle", row_id, {}))
+        else:
+            changes = {k: op[k] for k in ("time", "action", "location", "day", "enabled") if k in op}
+            error = schedule_field_error(changes) or (None if changes else "Nothing to update")
+            if error:
+                errors.append({"index": index, "error": error})
+            else:
+                plan.append(("update", row_id, changes))
+    return plan, errors
+
+@app.route("/api/schedule/batch", methods=["POST"])
+def schedule_batch():
+    operations = (request.json or {}).get("operations")
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"success": False, "error": "Missing operations"}), 400
+    if len(operations) > SCHEDULE_BATCH_LIMIT:
+        return jsonify({"success": False, "error": f"At most {SCHEDULE_BATCH_LIMIT} operations per batch"}), 400
+
+    with state_lock:
+        plan, errors = plan_schedule_batch(operations)
+        if errors:
+            return jsonify({"success": False, "error": "Invalid operations", "errors": errors}), 400
+
+        # One transaction for the whole batch; each step writes only its own fields
+        done = []
+        try:
+            with store.transaction() as conn:
+                for step in plan:
+                    if step[0] == "add":
+                        row = store.add_row(step[1], conn)
+                        done.append(("add", row["id"], row))
+                    elif step[0] == "remove":
+                        if not store.delete_row(step[1], conn):
+                            raise KeyError(step[1])
+                        done.append(("remove", step[1], None))
+                    else:
+                        kind, row_id, changes = step
+                        row = store.toggle_row(row_id, conn) if kind == "toggle" else store.update_row(row_id, changes, conn)
+                        if row is None:
+                            raise KeyError(row_id)
+                        done.append((kind, row_id, row))
+        except KeyError as missing:
+            # Another process removed the row since our last reload; nothing was written
+            sync_state()
+            return jsonify({"success": False, "error": f"Row not found: {missing.args[0]!r}"}), 404
+
+        added = [row for kind, _, row in done if kind == "add"]
+        if not sync_state():
+            for kind, row_id, row in done:
+                if kind == "add":
+                    schedule_model.add(row)
+                elif kind == "remove":
+                    schedule_model.remove(row_id)
+                else:
+                    schedule_model.update(row_id, **row)
+        version = schedule_model.version
+    scheduler.wake()
+    return jsonify({
+        "success": True,
+        "version": version,
+        "added": added,
+        "updated": sum(1 for step in plan if step[0] in ("update", "toggle")),
+        "removed": sum(1 for step in plan if step[0] == "remove"),
+    })
+
 from flask import request, jsonify
 
 import pathlib
@@ -207,153 +409,151 @@ import pathlib
 # Track status for UI
 state["_scheduler_status"] = {
     "upcoming_action": None,
-    "last_action_result": None
+    "last_action_result": store.get_meta("last_action_result")
 }
 
 def update_upcoming_action():
-    # Find next enabled action after current time on any day (wrapping)
-    from datetime import datetime, timedelta, time as dt_time
-
-    def day_to_num(d):
-        days = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
-        try:
-            return days.index(d)
-        except Exception:
-            return -1
-
-    def to_time(tstr):
-        # Normalize and parse times like "9:00" and "09:00"
-        parts = tstr.strip().split(':')
-        hour = int(parts[0])
-        minute = int(parts[1]) if len(parts) > 1 else 0
-        return dt_time(hour, minute)
-
-    now = datetime.now()
-    today_str = now.strftime("%A")
-    now_time = now.time()
-    schedule = state["schedule"]
-
-    # Prepare all schedule entries by weekday number and time
-    items = []
-    for row in schedule:
-        if not row.get("enabled"):
-            continue
-        row_day = row.get("day", today_str)
-        day_num = day_to_num(row_day)
-        norm_time = to_time(row.get("time", "00:00"))
-        items.append({
-            "day": row_day,
-            "day_num": day_num,
-            "time": norm_time,
-            "action": row.get("action", ""),
-            "row": row
-        })
-
-    result = None
-    # Find earliest action for today, and for today after now
-    todays = [it for it in items if it["day"] == today_str]
-    if todays:
-        todays_sorted = sorted(todays, key=lambda x: x["time"])
-        # 1. If current time is before earliest scheduled action, pick the earliest
-        if now_time < todays_sorted[0]["time"]:
-            result = todays_sorted[0]
-        else:
-            # 2. Otherwise, pick first after now
-            after = [x for x in todays_sorted if x["time"] > now_time]
-            if after:
-                result = after[0]
-    # 3. If not today or no more today, look to future
-    if not result:
-        for i in range(1, 8):  # next 7 days
-            check_date = now + timedelta(days=i)
-            check_day_str = check_date.strftime("%A")
-            future = [it for it in items if it["day"] == check_day_str]
-            if future:
-                result = sorted(future, key=lambda x: x["time"])[0]
-                break
-
-    # Debug output
-    print(f"[SchedulerStatus] Now: {now_time} Today: {today_str}")
-    actions_times = [f"{x['action']}@{x['time']}" for x in todays]
-    print(f"[SchedulerStatus] Todays actions: {actions_times}")
-    print(f"[SchedulerStatus] Selected result: {result}")
-
-    if result:
-        human_time = result["time"].strftime("%H:%M")
+    # Next enabled action from now on, wrapping around the week
+    with state_lock:
+        upcoming = schedule_model.next_action()
+    if upcoming:
+        due, row = upcoming
         state["_scheduler_status"]["upcoming_action"] = (
-            f'{result["action"].replace("_"," ").capitalize()} at {human_time} ({result["day"]})'
+            f'{row["action"].replace("_"," ").capitalize()} at {due:%H:%M} ({due:%A})'
         )
     else:
         state["_scheduler_status"]["upcoming_action"] = None
 
-def run_eportem_action(action, location, telegram=None, slack=None, slack_status=None):
-    # Call eportem_action.py as a subprocess for isolation
-    import copy, os
-
-    # Prepare environment overrides for notification toggles
-    env = copy.deepcopy(os.environ)
-    if telegram is not None:
-        env["TELEGRAM_NOTIFY"] = "YES" if telegram else "NO"
-    if slack is not None:
-        env["SLACK_NOTIFY"] = "YES" if slack else "NO"
-    if slack_status is not None:
-        env["SLACK_STATUS"] = "YES" if slack_status else "NO"
-
-    script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'eportem_action.py'))
-    try:
-        result = subprocess.run(
-            ["python3", script_path, action, "--location", location],
-            capture_output=True, text=True, check=True, env=env
-        )
-        print(f"eportem_action output: {result.stdout}")
-        state["_scheduler_status"]["last_action_result"] = (
-            f'OK: {action} at {location} &mdash; '
-            + (result.stdout.strip() or "No output")
-        )
-        return {"success": True, "result": result.stdout.strip()}
-    except subprocess.CalledProcessError as e:
-        print(f"Error running eportem_action: {e.stderr}")
-        state["_scheduler_status"]["last_action_result"] = (
-            f'FAILED: {action} at {location} &mdash; '
-            + (e.stderr.strip() or "No error details")
-        )
-        return {"success": False, "error": e.stderr.strip()}
-
-def scheduler_loop():
-    while True:
-        now = time.strftime("%H:%M")
-        today_str = time.strftime("%A")
-        update_upcoming_action()
-        for row in state["schedule"]:
-            if (
-                row.get("enabled")
-                and row.get("time", "") == now
-                and state.get("updates_enabled")
-                and ("day" not in row or row["day"] == today_str)
-            ):
-                run_eportem_action(row["action"], row.get("location", state.get("location", "office")))
-        time.sleep(60)
+def record_action_result(job):
+    # Jobs are shared through the store, so every worker (and the scheduler service) can list them
+    store.save_job(job, keep=executor.max_history)
+    if job["status"] == "running":
+        metrics.JOB_WAIT_SECONDS.observe(job["wait"], source=job["source"])
+        return
+    if job["status"] == "succeeded":
+        result = f'OK: {job["action"]} at {job["location"]} &mdash; ' + (job["output"] or "No output")
+    elif job["status"] == "failed":
+        result = f'FAILED: {job["action"]} at {job["location"]} &mdash; ' + (job["error"] or "No error details")
+    else:
+        return
+    metrics.JOBS_TOTAL.inc(source=job["source"], status=job["status"])
+    with state_lock:
+        state["_scheduler_status"]["last_action_result"] = result
+        store.set_meta("last_action_result", result)
+        # Part of /api/state, so cached copies must be refreshed
+        schedule_model.touch()
+
+# Runs actions on ACTION_WORKERS threads (or as subprocesses with ACTION_EXECUTION_MODE=subprocess)
+executor = ActionExecutor()
+executor.add_listener(record_action_result)
+
+def run_eportem_action(action, location, telegram=None, slack=None, slack_status=None, source="manual"):
+    # Queue the action and return right away; the result lands in last_action_result
+    job_id = executor.submit(action, location, telegram=telegram, slack=slack,
+                             slack_status=slack_status, source=source)
+    print(f"Queued {action} at {location} as job {job_id}")
+    return {"success": True, "job_id": job_id}
+
+def fire_scheduled_row(row, due):
+    # The toggle may have been flipped by another process
+    sync_state()
+    if not state.get("updates_enabled"):
+        print(f"[Scheduler] Updates disabled, skipping {row['action']} due at {due:%H:%M}")
+        return
+    run_eportem_action(row["action"], row.get("location", state.get("location", "office")), source="schedule")
+
+# Sleeps until the next enabled row is due; woken by the /api/schedule/* endpoints
+def schedule_snapshot():
+    with state_lock:
+        return [dict(row) for row in schedule_model.rows()]
+
+scheduler = Scheduler(schedule_snapshot, fire_scheduled_row)
+
+def read_action_request():
+    data = request.json if request.is_json else request.form
+    flags = {}
+    for key in ("telegram", "slack", "slack_status"):
+        value = data.get(key)
+        # Convert to bool if sent as string
+        if isinstance(value, str):
+            value = value.lower() in ("yes", "true", "1", "on")
+        flags[key] = value
+    return data.get("action"), data.get("location"), flags
 
 @app.route("/api/trigger_now", methods=["POST"])
 def trigger_now():
-    data = request.json if request.is_json else request.form
-    action = data.get("action")
-    location = data.get("location")
-    telegram = data.get("telegram")
-    slack = data.get("slack")
-    slack_status = data.get("slack_status")
-    # Convert to bool if sent as string
-    if isinstance(telegram, str):
-        telegram = telegram.lower() in ("yes", "true", "1", "on")
-    if isinstance(slack, str):
-        slack = slack.lower() in ("yes", "true", "1", "on")
-    if isinstance(slack_status, str):
-        slack_status = slack_status.lower() in ("yes", "true", "1", "on")
-
-    print(f"[Manual Trigger] Action={action} Location={location} Flags: telegram={telegram}, slack={slack}, slack_status={slack_status}")
+    action, location, flags = read_action_request()
+    print(f"[Manual Trigger] Action={action} Location={location} Flags: telegram={flags['telegram']}, slack={flags['slack']}, slack_status={flags['slack_status']}")
     if not action or not location:
         return {"success": False, "error": "Missing parameters"}, 400
-    return run_eportem_action(action, location, telegram=telegram, slack=slack, slack_status=slack_status)
+    return run_eportem_action(action, location, **flags)
+
+############################
+# Jobs API
+############################
+
+ACTIONS = ["start_day", "lunch_break", "after_lunch", "stop_day"]
+LOCATIONS = ["office", "home"]
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    action, location, flags = read_action_request()
+    if action not in ACTIONS or location not in LOCATIONS:
+        return jsonify({"success": False, "error": "Invalid action or location"}), 400
+    job_id = run_eportem_action(action, location, source="api", **flags)["job_id"]
+    return jsonify({"success": True, "job_id": job_id, "job": executor.get(job_id)}), 202
+
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    limit = request.args.get("limit", type=int)
+    return jsonify({"success": True, "jobs": store.list_jobs(limit)})
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = executor.get(job_id) or store.get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job})
+
+# A stream ends after JOB_STREAM_SECONDS and the browser reconnects, so it never holds a
+# request thread for good; at most JOB_STREAMS streams are open at once
+JOB_STREAM_SECONDS = float(os.getenv("JOB_STREAM_SECONDS", "60"))
+JOB_STREAM_POLL = float(os.getenv("JOB_STREAM_POLL", "0.5"))
+JOB_STREAMS = threading.BoundedSemaphore(int(os.getenv("JOB_STREAMS", "4")))
+
+@app.route("/api/jobs/stream", methods=["GET"])
+def stream_jobs():
+    """
+    Server-Sent Events: one "job" event per job state change, from the store's
+    job events, so jobs run by other workers and the scheduler service show up
+    too. The event id lets a reconnecting browser resume where it left off.
+    """
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = store.last_job_event()
+    if not JOB_STREAMS.acquire(blocking=False):
+        # Too many open streams: tell the browser to come back later
+        return Response("retry: 30000\n\n", mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    def events(since):
+        try:
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + JOB_STREAM_SECONDS
+            last_sent = time.monotonic()
+            while time.monotonic() < deadline:
+                for seq, job in store.job_events(since):
+                    since = seq
+                    last_sent = time.monotonic()
+                    yield f"event: job\nid: {seq}\ndata: {json.dumps(job)}\n\n"
+                if time.monotonic() - last_sent > 15:
+                    last_sent = time.monotonic()
+                    yield ": keepalive\n\n"
+                time.sleep(JOB_STREAM_POLL)
+        finally:
+            JOB_STREAMS.release()
+
+    return Response(events(since), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route("/api/scheduler_status", methods=["GET"])
 def get_scheduler_status():
@@ -366,8 +566,47 @@ def get_scheduler_status():
     })
 
 def start_scheduler():
-    t = threading.Thread(target=scheduler_loop, daemon=True)
-    t.start()
+    scheduler.start()
+
+def start_outbox():
+    """With NOTIFY_OUTBOX=YES, deliver queued notifications from startup on, not only after the first action"""
+    from utility.outbox import get_default_outbox
+    get_default_outbox()
+
+class StoreTraceExporter:
+    """Keeps the last WEB_UI_TRACES action traces in the state store, shared by all processes"""
+
+    def __init__(self, keep):
+        self.keep = keep
+
+    def export(self, trace):
+        store.save_trace(trace, keep=self.keep)
+
+WEB_UI_TRACES = int(os.getenv("WEB_UI_TRACES", "20"))
+if WEB_UI_TRACES > 0:
+    tracing.add_exporter(StoreTraceExporter(WEB_UI_TRACES))
+
+@app.route("/api/traces", methods=["GET"])
+def list_traces():
+    limit = request.args.get("limit", type=int)
+    return jsonify({"success": True, "traces": store.list_traces(limit)})
+
+@app.route("/api/traces/<trace_id>", methods=["GET"])
+def get_trace(trace_id):
+    trace = store.get_trace(trace_id)
+    if trace is None:
+        return jsonify({"success": False, "error": "Trace not found"}), 404
+    if request.args.get("format") == "chrome":
+        # Load in chrome://tracing or Perfetto
+        response = jsonify(tracing.chrome_events(trace))
+        response.headers["Content-Disposition"] = f'attachment; filename="trace-{trace_id}.json"'
+        return response
+    return jsonify({"success": True, "trace": trace})
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Prometheus text format: action phases, notifications, scheduler lag and jobs of this process
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 ############################
 # Settings (.env) Endpoints
@@ -474,20 +713,6 @@ SETTING_SCHEMA = [
     }
 ]
 
-def parse_env_file(env_path):
-    values = {}
-    try:
-        with open(env_path, "r") as f:
-            for line in f:
-                s = line.strip()
-                if not s or s.startswith("#") or "=" not in s:
-                    continue
-                k, v = s.split("=", 1)
-                values[k.strip()] = v.strip()
-    except Exception:
-        pass
-    return values
-
 def write_env_file(new_values, env_path):
     # Compose new .env file with comments preserved where possible.
     orig_lines = []
@@ -521,39 +746,19 @@ def write_env_file(new_values, env_path):
 
 @app.route("/api/env_schema", methods=["GET"])
 def env_schema():
-    env_vals = parse_env_file(ENV_PATH)
-    schema = []
-    for entry in SETTING_SCHEMA:
-        current_val = env_vals.get(entry["key"])
-        typ = entry["type"]
-        if typ == "toggle":
-            normalized = (current_val or "").upper()
-            value = normalized == "YES"
-        elif typ == "number":
-            try:
-                value = int(current_val)
-            except Exception:
-                value = ""
-        else:
-            value = current_val or ""
-        with_info = entry.copy()
-        with_info["value"] = value
-        schema.append(with_info)
-    return jsonify({"success": True, "schema": schema})
+    # Rendered once per version of the .env file
+    return Response(env_settings.load(ENV_PATH).schema_json, mimetype="application/json")
 
 @app.route("/api/env", methods=["GET"])
 def get_env_struct():
     # for backward UI-compat, get raw if "?raw=1"
+    snapshot = env_settings.load(ENV_PATH)
     if request.args.get("raw"):
-        try:
-            with open(ENV_PATH, "r") as f:
-                content = f.read()
-            return jsonify({"success": True, "content": content})
-        except Exception as e:
-            return jsonify({"success": False, "error": str(e)}), 500
+        if snapshot.text is None:
+            return jsonify({"success": False, "error": f"Could not read {ENV_PATH}"}), 500
+        return jsonify({"success": True, "content": snapshot.text})
     # else JSON schema
-    env_vals = parse_env_file(ENV_PATH)
-    return jsonify({"success": True, "env": env_vals})
+    return jsonify({"success": True, "env": snapshot.values})
 
 @app.route("/api/env", methods=["POST"])
 def save_env_struct():
@@ -589,9 +794,9 @@ def save_env_struct():
         if entry.get("required") and (real_val is None or real_val == "" or (typ=="toggle" and real_val not in ["YES","NO"])):
             err.append(f"{entry['label']}: is required")
         # Pattern validation
-        pat = entry.get("pattern")
+        pat = env_settings.patterns.get(k)
         if pat and real_val:
-            if not re.match(pat, real_val):
+            if not pat.match(real_val):
                 err.append(f"{entry['label']}: format invalid")
         to_save[k] = real_val
 
@@ -606,6 +811,8 @@ def save_env_struct():
     # Write new values
     try:
         write_env_file(to_save, ENV_PATH)
+        # Do not rely on the mtime alone for a write in the same clock tick
+        env_settings.invalidate()
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -651,8 +858,6 @@ def get_server_info():
         "uptime_minutes": int(minutes)
     })
 
-# Global variable to communicate config validity to UI
-CONFIG_ERROR = None
 MIN_REQUIRED_KEYS = [
     "EPORTEM_USERNAME",
     "EPORTEM_PASSWORD",
@@ -661,28 +866,51 @@ MIN_REQUIRED_KEYS = [
     "WEB_UI_PORT"
 ]
 
+# Parsed .env, settings schema and config error, refreshed when the file changes
+env_settings = EnvSettings(SETTING_SCHEMA, MIN_REQUIRED_KEYS)
+
 def validate_basic_config():
-    # Check if .env file exists, and key fields are present/non-empty
-    if not os.path.exists(ENV_PATH):
-        return "Configuration file not found (.env missing)."
-    vals = parse_env_file(ENV_PATH)
-    missing = [k for k in MIN_REQUIRED_KEYS if not vals.get(k)]
-    if missing:
-        return f"Configuration incomplete. Missing required: {', '.join(missing)}"
-    if vals.get("EPORTEM_ENABLED", "").upper() != "YES":
-        return "EPORTEM_ENABLED is not set to YES."
-    return None
+    # Config validity for the UI: None, or what is wrong with the .env file
+    return env_settings.load(ENV_PATH).config_error
+
+def serve(host="0.0.0.0", port=PORT, threads=None):
+    """
+    Serve the app for production: waitress if it is installed, otherwise
+    Werkzeug's threaded server. No debugger, no reloader.
+    """
+    threads = threads or int(os.getenv("WEB_UI_THREADS", "8"))
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        from werkzeug.serving import make_server
+        print(f"[web_ui] waitress not installed, serving on port {port} with the threaded Werkzeug server")
+        make_server(host, port, app, threaded=True).serve_forever()
+    else:
+        print(f"[web_ui] Serving on port {port} with waitress ({threads} threads)")
+        waitress_serve(app, host=host, port=port, threads=threads)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run ePortem Web UI server")
     parser.add_argument("--mock", action="store_true", help="Use the mock server for ePortem actions (sets USE_MOCK_SERVER=YES) for this session.")
+    parser.add_argument("--production", action="store_true", help="Serve with a production WSGI server instead of the Flask debug server (or set WEB_UI_PRODUCTION=YES).")
+    parser.add_argument("--threads", type=int, help="Request threads in production mode (default WEB_UI_THREADS or 8).")
+    parser.add_argument("--no-scheduler", action="store_true", help="Do not run the scheduler here; run web_ui/scheduler_service.py instead (or set WEB_UI_SCHEDULER=external).")
     args = parser.parse_args()
     if args.mock:
         os.environ["USE_MOCK_SERVER"] = "YES"
         print("[web_ui] Running in MOCK SERVER mode: USE_MOCK_SERVER=YES")
     else:
         print("[web_ui] Running in normal (real) mode.")
-    # Validate config
-    CONFIG_ERROR = validate_basic_config()
-    start_scheduler()
-    app.run(host="0.0.0.0", port=PORT, debug=True)
+    # Validate config; the UI re-checks whenever the .env file changes
+    config_error = validate_basic_config()
+    if config_error:
+        print(f"[web_ui] {config_error}")
+    start_outbox()
+    if args.no_scheduler or os.getenv("WEB_UI_SCHEDULER", "").lower() == "external":
+        print("[web_ui] Scheduler runs in a separate process")
+    else:
+        start_scheduler()
+    if args.production or os.getenv("WEB_UI_PRODUCTION", "NO").upper() == "YES":
+        serve(threads=args.threads)
+    else:
+        app.run(host="0.0.0.0", port=PORT, debug=True)
@@ -0,0 +1,300 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web_ui_state.db')
+
+ROW_FIELDS = ("id", "day", "time", "action", "location", "enabled")
+
+# Job changes kept for /api/jobs/stream clients that fall behind or reconnect
+JOB_EVENTS_KEPT = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule (
+    id INTEGER PRIMARY KEY,
+    day TEXT,
+    time TEXT NOT NULL,
+    action TEXT NOT NULL,
+    location TEXT,
+    enabled INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS schedule_day_time ON schedule (day, time);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    submitted_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_submitted_at ON jobs (submitted_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS traces (
+    id TEXT PRIMARY KEY,
+    start REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS traces_start ON traces (start);
+"""
+
+
+class StateStore:
+    """
+    Web UI state in SQLite (WAL mode).
+
+    Settings are key/value rows and every schedule row is its own table
+    row, so a change writes only what changed. Writes are serialized by a
+    lock; readers see the last committed state.
+
+    Several processes (web workers, the scheduler service) can share one
+    database. Every write transaction bumps a version in the meta table,
+    and changed_elsewhere() tells whether another process wrote since
+    this one last loaded or wrote.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('WEB_UI_DB_PATH') or DEFAULT_DB_PATH
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        # Version this process has seen (-1 before the first load),
+        # and whether a write of ours skipped over someone else's
+        self._seen = -1
+        self._stale = False
+        # The journal mode cannot change inside a transaction; executescript commits on its own
+        with self._lock:
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, reused for all its reads and writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self, bump=True):
+        """Run several writes as one atomic commit"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Take the write lock up front so reads inside the transaction (like the next row id)
+                # cannot go stale before the writes land
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                if bump:
+                    conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+                    version = self._version(conn)
+            if bump:
+                if version - 1 != self._seen:
+                    self._stale = True
+                self._seen = version
+
+    def version(self):
+        """Return the version of the last committed write, from any process"""
+        return self._version(self._connection())
+
+    def seen_version(self):
+        """Return the version of the state this process last loaded or wrote"""
+        return self._seen
+
+    def changed_elsewhere(self):
+        """True if another process wrote since this store last loaded"""
+        with self._lock:
+            return self._stale or self.version() != self._seen
+
+    @staticmethod
+    def _version(conn):
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    def is_empty(self):
+        conn = self._connection()
+        return (conn.execute("SELECT COUNT(*) FROM settings").fetchone()[0] == 0
+                and conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0] == 0)
+
+    def import_state(self, state):
+        """Replace everything with a state dict in the web_ui_config.json format"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM settings")
+            conn.execute("DELETE FROM schedule")
+            for key, value in state.items():
+                if key != "schedule" and not key.startswith("_"):
+                    self.set_setting(key, value, conn)
+            for row in state.get("schedule", []):
+                self.save_row(row, conn)
+
+    def load(self):
+        """Return the state dict (settings plus "schedule" ordered by id)"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # One transaction, so the version matches what was read
+                if self._stale:
+                    # A write of ours skipped over another process's, so our version did not cover all
+                    # of the state; the merged state gets a version of its own
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+                else:
+                    conn.execute("BEGIN")
+                version = self._version(conn)
+                state = {row["key"]: json.loads(row["value"]) for row in conn.execute("SELECT key, value FROM settings")}
+                state["schedule"] = [self._row_to_dict(row) for row in conn.execute("SELECT * FROM schedule ORDER BY id")]
+            self._seen, self._stale = version, False
+        return state
+
+    def rows_for_day(self, day):
+        """Return the schedule rows of one day, ordered by time"""
+        conn = self._connection()
+        return [self._row_to_dict(row) for row in
+                conn.execute("SELECT * FROM schedule WHERE day = ? ORDER BY time", (day,))]
+
+    def set_setting(self, key, value, conn=None):
+        with self._write(conn) as conn:
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def save_row(self, row, conn=None):
+        """Insert or update one schedule row"""
+        with self._write(conn) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO schedule (id, day, time, action, location, enabled) VALUES (?, ?, ?, ?, ?, ?)",
+                (row["id"], row.get("day"), row["time"], row["action"], row.get("location"), int(bool(row.get("enabled", True))))
+            )
+
+    def add_row(self, row, conn=None):
+        """Insert a new schedule row under the next free id; returns the row with its id"""
+        with self._write(conn) as conn:
+            cursor = conn.execute(
+                "INSERT INTO schedule (id, day, time, action, location, enabled) "
+                "SELECT COALESCE(MAX(id), 0) + 1, ?, ?, ?, ?, ? FROM schedule",
+                (row.get("day"), row["time"], row["action"], row.get("location"), int(bool(row.get("enabled", True))))
+            )
+            return self._get_row(conn, cursor.lastrowid)
+
+    def update_row(self, row_id, changes, conn=None):
+        """Change only the given fields of a row; returns the updated row, or None if it does not exist"""
+        unknown = set(changes) - set(ROW_FIELDS[1:])
+        if unknown:
+            raise ValueError(f"Unknown schedule fields: {sorted(unknown)}")
+        values = [int(bool(value)) if field == "enabled" else value for field, value in changes.items()]
+        assignments = ", ".join(f"{field} = ?" for field in changes)
+        with self._write(conn) as conn:
+            cursor = conn.execute(f"UPDATE schedule SET {assignments} WHERE id = ?", (*values, row_id))
+            return self._get_row(conn, row_id) if cursor.rowcount else None
+
+    def toggle_row(self, row_id, conn=None):
+        """Flip a row's enabled flag; returns the updated row, or None if it does not exist"""
+        with self._write(conn) as conn:
+            cursor = conn.execute("UPDATE schedule SET enabled = NOT enabled WHERE id = ?", (row_id,))
+            return self._get_row(conn, row_id) if cursor.rowcount else None
+
+    def delete_row(self, row_id, conn=None):
+        """Delete a row; returns False if it did not exist"""
+        with self._write(conn) as conn:
+            return conn.execute("DELETE FROM schedule WHERE id = ?", (row_id,)).rowcount > 0
+
+    def _get_row(self, conn, row_id):
+        return self._row_to_dict(conn.execute("SELECT * FROM schedule WHERE id = ?", (row_id,)).fetchone())
+
+    def get_meta(self, key, default=None):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, key, value, conn=None):
+        """Store a shared status value (e.g. the last action result); bumps the version like any write"""
+        with self._write(conn) as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def save_job(self, job, keep=None):
+        """
+        Insert or update a job record and keep only the newest `keep` jobs.
+
+        Every call is also appended to the job events (see job_events()).
+        Jobs do not bump the version: they are not part of /api/state.
+        """
+        data = json.dumps(job)
+        with self.transaction(bump=False) as conn:
+            conn.execute("INSERT OR REPLACE INTO jobs (id, submitted_at, data) VALUES (?, ?, ?)",
+                         (job["id"], job["submitted_at"], data))
+            seq = conn.execute("INSERT INTO job_events (data) VALUES (?)", (data,)).lastrowid
+            conn.execute("DELETE FROM job_events WHERE seq <= ?", ((seq or 0) - JOB_EVENTS_KEPT,))
+            if keep:
+                conn.execute("DELETE FROM jobs WHERE id NOT IN "
+                             "(SELECT id FROM jobs ORDER BY submitted_at DESC LIMIT ?)", (keep,))
+
+    def get_job(self, job_id):
+        row = self._connection().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def job_events(self, since=0, limit=100):
+        """[(seq, job)] for the job changes of all processes after `since`, oldest first"""
+        rows = self._connection().execute("SELECT seq, data FROM job_events WHERE seq > ? ORDER BY seq LIMIT ?",
+                                          (since, limit))
+        return [(row["seq"], json.loads(row["data"])) for row in rows]
+
+    def last_job_event(self):
+        """The seq of the newest job change, 0 if there is none"""
+        return self._connection().execute("SELECT COALESCE(MAX(seq), 0) FROM job_events").fetchone()[0]
+
+    def list_jobs(self, limit=None):
+        """Return the stored jobs of all processes, newest first"""
+        rows = self._connection().execute("SELECT data FROM jobs ORDER BY submitted_at DESC LIMIT ?",
+                                          (limit or -1,))
+        return [json.loads(row["data"]) for row in rows]
+
+    def save_trace(self, trace, keep=None):
+        """Store a finished action trace and keep only the newest `keep`; like jobs, no version bump"""
+        with self.transaction(bump=False) as conn:
+            conn.execute("INSERT OR REPLACE INTO traces (id, start, data) VALUES (?, ?, ?)",
+                         (trace["trace_id"], trace["start"], json.dumps(trace, default=str)))
+            if keep:
+                conn.execute("DELETE FROM traces WHERE id NOT IN "
+                             "(SELECT id FROM traces ORDER BY start DESC LIMIT ?)", (keep,))
+
+    def get_trace(self, trace_id):
+        row = self._connection().execute("SELECT data FROM traces WHERE id = ?", (trace_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def list_traces(self, limit=None):
+        """Return the stored traces, newest first"""
+        rows = self._connection().execute("SELECT data FROM traces ORDER BY start DESC LIMIT ?", (limit or -1,))
+        return [json.loads(row["data"]) for row in rows]
+
+    @contextmanager
+    def _write(self, conn):
+        # Join the caller's transaction, or commit on our own
+        if conn is not None:
+            yield conn
+        else:
+            with self.transaction() as conn:
+                yield conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _row_to_dict(row):
+        data = {field: row[field] for field in ROW_FIELDS}
+        data["enabled"] = bool(data["enabled"])
+        # Rows without a day run every day; keep them without the key like before
+        if data["day"] is None:
+            del data["day"]
+        if data["location"] is None:
+            del data["location"]
+        return data
@@ -0,0 +1,21 @@
+"""
+WSGI entry point for the web UI, e.g.
+
+    waitress-serve --port=8010 --threads=8 web_ui.wsgi:app
+    gunicorn -w 1 --threads 8 -b 0.0.0.0:8010 web_ui.wsgi:app
+
+The scheduler starts here unless WEB_UI_SCHEDULER=external. With more
+than one worker process, set WEB_UI_SCHEDULER=external and run
+web_ui/scheduler_service.py once, so schedules do not fire per worker.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from web_ui import server
+
+server.start_outbox()
+if os.getenv("WEB_UI_SCHEDULER", "").lower() != "external":
+    server.start_scheduler()
+
+app = server.app